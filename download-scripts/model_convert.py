@@ -17,6 +17,38 @@ from ultralytics.utils.metrics import ConfusionMatrix
 from openvino import Core, serialize
 from pathlib import Path
 
+# Input size of the default export, saved as <precision>/<model>.xml
+YOLO_DEFAULT_IMGSZ = 640
+# Name of the per-model manifest listing the exported input-size variants
+VARIANTS_MANIFEST = "variants.json"
+
+def yolo_export_sizes():
+    """Input sizes to export from YOLO_EXPORT_SIZES (comma-separated); the default size is always included."""
+    sizes = {YOLO_DEFAULT_IMGSZ}
+    for item in os.getenv("YOLO_EXPORT_SIZES", "320,416,640").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if not item.isdigit() or int(item) % 32:
+            print(f"[WARN] Ignoring YOLO export size '{item}': must be a multiple of 32")
+            continue
+        sizes.add(int(item))
+    return sorted(sizes)
+
+def variant_stem(model_name, size):
+    return model_name if size == YOLO_DEFAULT_IMGSZ else f"{model_name}_{size}"
+
+def load_variants_manifest(model_dir, model_name):
+    try:
+        with open(os.path.join(model_dir, VARIANTS_MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"model": model_name, "default": YOLO_DEFAULT_IMGSZ, "variants": {}}
+
+def save_variants_manifest(model_dir, manifest):
+    with open(os.path.join(model_dir, VARIANTS_MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+
 def get_model_type(model_name, mapping_path=None):  
     if mapping_path is None:
         mapping_path = os.path.join(os.path.dirname(__file__), "../configs/yolo_model_type_mapping.json")
@@ -42,6 +74,11 @@ def get_model_type(model_name, mapping_path=None):
     return None
 
 def export_yolo(model_name, output_dir):
+    """
+    Export the model once per input size of yolo_export_sizes(). The default size keeps the
+    <precision>/<model>.xml name, others are saved as <precision>/<model>_<size>.xml, and all
+    are listed in variants.json so the pipeline generator can pick one per camera ROI.
+    """
     model_type = get_model_type(model_name)
     print(f"############ Exporting model_name == {model_name} of type model_type == {model_type} to {output_dir} ############")
     model_dir = os.path.join(output_dir, "object_detection", model_name)
@@ -49,19 +86,26 @@ def export_yolo(model_name, output_dir):
     weights = model_name + ".pt"
     model = YOLO(weights)
     model.info()
-    converted_path = model.export(format='openvino')
-    converted_model = os.path.join(converted_path, model_name + '.xml')
-    core = openvino.Core()
-    ov_model = core.read_model(model=converted_model)
-    if model_type in ["YOLOv8-SEG", "yolo_v11_seg"]:
-        ov_model.output(0).set_names({"boxes"})
-        ov_model.output(1).set_names({"masks"})
-    ov_model.set_rt_info(model_type, ['model_info', 'model_type'])
     os.makedirs(os.path.join(model_dir, "FP32"), exist_ok=True)
     os.makedirs(os.path.join(model_dir, "FP16"), exist_ok=True)
-    openvino.save_model(ov_model, os.path.join(model_dir, "FP32", model_name + ".xml"), compress_to_fp16=False)
-    openvino.save_model(ov_model, os.path.join(model_dir, "FP16", model_name + ".xml"), compress_to_fp16=True)
-    shutil.rmtree(converted_path)
+    manifest = load_variants_manifest(model_dir, model_name)
+    core = openvino.Core()
+    for size in yolo_export_sizes():
+        print(f"[INFO] Exporting {model_name} at {size}x{size}")
+        converted_path = model.export(format='openvino', imgsz=size)
+        converted_model = os.path.join(converted_path, model_name + '.xml')
+        ov_model = core.read_model(model=converted_model)
+        if model_type in ["YOLOv8-SEG", "yolo_v11_seg"]:
+            ov_model.output(0).set_names({"boxes"})
+            ov_model.output(1).set_names({"masks"})
+        ov_model.set_rt_info(model_type, ['model_info', 'model_type'])
+        stem = variant_stem(model_name, size)
+        openvino.save_model(ov_model, os.path.join(model_dir, "FP32", stem + ".xml"), compress_to_fp16=False)
+        openvino.save_model(ov_model, os.path.join(model_dir, "FP16", stem + ".xml"), compress_to_fp16=True)
+        shutil.rmtree(converted_path)
+        variant = manifest["variants"].setdefault(str(size), {})
+        variant.update({"FP32": f"FP32/{stem}.xml", "FP16": f"FP16/{stem}.xml"})
+    save_variants_manifest(model_dir, manifest)
     if os.path.exists(weights):
         os.remove(weights)
 
@@ -128,11 +172,31 @@ def quantize_age_gender_face_detection(model_name, output_dir):
         raise
 
 def quantize_yolo(model_name, dataset_manifest, output_dir):
+    """Quantize every exported input-size variant of the model to INT8 and record it in variants.json."""
     model_dir = os.path.join(output_dir, "object_detection", model_name)
-    fp16_xml = os.path.join(model_dir, "FP16", model_name + ".xml")
+    manifest = load_variants_manifest(model_dir, model_name)
+    sizes = sorted(int(size) for size in manifest["variants"]) or [YOLO_DEFAULT_IMGSZ]
+    for size in sizes:
+        stem = variant_stem(model_name, size)
+        print(f"[INFO] Quantizing {stem} ({size}x{size}) to INT8")
+        quantize_yolo_variant(model_dir, stem, size, dataset_manifest)
+        manifest["variants"].setdefault(str(size), {})["INT8"] = f"INT8/{stem}.xml"
+    save_variants_manifest(model_dir, manifest)
+    for d in ["datasets", "runs"]:
+        p = os.path.join(output_dir, d)
+        if os.path.exists(p):
+            shutil.rmtree(p)
+        p2 = os.path.join(model_dir, d)
+        if os.path.exists(p2):
+            shutil.rmtree(p2)
+
+def quantize_yolo_variant(model_dir, stem, imgsz, dataset_manifest):
+    fp16_xml = os.path.join(model_dir, "FP16", stem + ".xml")
     int8_dir = os.path.join(model_dir, "INT8")
     os.makedirs(int8_dir, exist_ok=True)
     validator = DetectionValidator()
+    # Calibration images are letterboxed to the variant's input size
+    validator.args.imgsz = imgsz
     validator.data = check_det_dataset(dataset_manifest)
     validator.stride = 32
     validator.is_coco = True
@@ -186,19 +250,12 @@ def quantize_yolo(model_name, dataset_manifest, output_dir):
     except Exception as e:
         print(f"[WARN] Could not compute accuracy drop: {e}")
     quantized_model.set_rt_info(ov.get_version(), "Runtime_version")
-    xml_path = os.path.join(int8_dir, model_name + ".xml")
-    bin_path = os.path.join(int8_dir, model_name + ".bin")
+    xml_path = os.path.join(int8_dir, stem + ".xml")
+    bin_path = os.path.join(int8_dir, stem + ".bin")
     ov.save_model(quantized_model, xml_path, compress_to_fp16=False)
-    fp16_bin = os.path.join(model_dir, "FP16", model_name + ".bin")
+    fp16_bin = os.path.join(model_dir, "FP16", stem + ".bin")
     if os.path.exists(fp16_bin) and not os.path.exists(bin_path):
         shutil.copy(fp16_bin, bin_path)
-    for d in ["datasets", "runs"]:
-        p = os.path.join(output_dir, d)
-        if os.path.exists(p):
-            shutil.rmtree(p)
-        p2 = os.path.join(model_dir, d)
-        if os.path.exists(p2):
-            shutil.rmtree(p2)
 
 
 
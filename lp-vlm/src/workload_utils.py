@@ -6,7 +6,15 @@ import os
 from pathlib import Path
 from urllib.parse import urlparse
 import socket
-import subprocess
+import sys
+
+try:
+    # Mounted next to this file in the containers
+    from rtsp_probe import probe_rtsp_streams
+except ImportError:
+    # Running from a repository checkout
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src"))
+    from rtsp_probe import probe_rtsp_streams
 
 # -------------------- Logger Setup --------------------
 logging.basicConfig(
@@ -24,47 +32,16 @@ RTSP_DEFAULT_PORT = os.getenv("RTSP_STREAM_PORT", "8554")
 # -------------------- Stream Validation --------------------
 def check_rtsp_stream_exists(stream_uri: str, timeout: int = 3) -> bool:
     """
-    Check if a specific RTSP stream path is available using GStreamer.
-    Returns True if the stream is accessible, False otherwise.
+    Check if a specific RTSP stream path is available with an RTSP OPTIONS/DESCRIBE
+    probe (see rtsp_probe.py). Returns True if the stream is accessible, False otherwise.
     """
-    try:
-        import subprocess
-        
-        # Use gst-launch to test if stream exists with a very short timeout
-        # This will fail quickly if the stream doesn't exist (404 Not Found)
-        cmd = [
-            'timeout', '5',  # Kill after 5 seconds
-            'gst-launch-1.0',
-            'rtspsrc', f'location={stream_uri}',
-            'protocols=tcp',
-            'latency=200',
-            'timeout=2000000',  # 2 second RTSP timeout
-            '!', 'fakesink'
-        ]
-        
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.PIPE,
-            timeout=6,
-            text=True
-        )
-        
-        # Check if stderr contains "Not Found" or "404"
-        if result.stderr and ('Not Found' in result.stderr or '404' in result.stderr or 'Not found' in result.stderr):
-            logger.warning(f"RTSP stream not found: {stream_uri}")
-            return False
-            
-        # If command succeeded or timed out (stream exists but we didn't wait), it's available
-        return True
-        
-    except subprocess.TimeoutExpired:
-        # Timeout means stream connected successfully
-        return True
-    except Exception as e:
-        logger.warning(f"Could not check RTSP stream {stream_uri}: {e}")
+    result = probe_rtsp_streams([stream_uri], timeout=timeout)[stream_uri]
+    if not result["available"]:
+        logger.warning(f"RTSP stream not found: {stream_uri}")
+    elif result["result"] != "available":
         # If we can't check, assume it exists to avoid false negatives
-        return True
+        logger.warning(f"Could not check RTSP stream {stream_uri}: {result['detail']}")
+    return result["available"]
 
 # -------------------- Load JSON --------------------
 def load_config(camera_cfg_path: str) -> dict:
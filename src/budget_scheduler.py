@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Cross-lane inference budget for the in-process launcher.
+
+Every gvadetect of a pipeline is a lane. The launcher counts the frames each
+lane receives and the regions it adds (detections) with pad probes, and once
+per reporting interval re-plans the inference-interval of every lane within a
+global budget of detections per second:
+
+    idle lanes    no detection for BUDGET_IDLE_SECONDS: throttled to
+                  BUDGET_IDLE_INTERVAL (or their configured interval if larger)
+    active lanes  share the rest of the budget at the smallest common interval
+                  that fits it, down to 1 when there is room and never
+                  throttled beyond the idle lanes
+
+INFERENCE_BUDGET is the budget in detections/s for one gst-launch process
+(shard); "auto" uses what the lanes' configured intervals would spend, so the
+detections an idle lane saves go to the busy ones. Empty disables it.
+"""
+
+import math
+import os
+import sys
+import time
+
+INFERENCE_BUDGET = os.getenv("INFERENCE_BUDGET", "").strip().lower()
+if INFERENCE_BUDGET not in ("", "auto"):
+    try:
+        if float(INFERENCE_BUDGET) <= 0:
+            raise ValueError
+    except ValueError:
+        print(f"Warning: Invalid INFERENCE_BUDGET value '{INFERENCE_BUDGET}', budget scheduler disabled", file=sys.stderr)
+        INFERENCE_BUDGET = ""
+
+try:
+    BUDGET_IDLE_SECONDS = float(os.getenv("BUDGET_IDLE_SECONDS", "10"))
+except ValueError:
+    print(f"Warning: Invalid BUDGET_IDLE_SECONDS value '{os.getenv('BUDGET_IDLE_SECONDS')}', using default 10", file=sys.stderr)
+    BUDGET_IDLE_SECONDS = 10.0
+
+try:
+    BUDGET_IDLE_INTERVAL = max(1, int(os.getenv("BUDGET_IDLE_INTERVAL", "15")))
+except ValueError:
+    print(f"Warning: Invalid BUDGET_IDLE_INTERVAL value '{os.getenv('BUDGET_IDLE_INTERVAL')}', using default 15", file=sys.stderr)
+    BUDGET_IDLE_INTERVAL = 15
+
+
+class Lane:
+    """Frames and detections of one gvadetect, from probes on its sink and src pads."""
+
+    def __init__(self, name, element, base_interval, count_regions, probe_return):
+        self.name = name
+        self.element = element
+        self.base_interval = max(1, int(base_interval))
+        self.interval = self.base_interval
+        self.count_regions = count_regions
+        self.probe_return = probe_return
+        self.frames = 0
+        self.reported = 0
+        self.fps = 0.0
+        self.last_detection = None
+        # Regions on each frame entering the element, by pts, until it leaves again
+        self.pending = {}
+
+    def sink_probe(self, pad, info):
+        buffer = info.get_buffer()
+        self.frames += 1
+        self.pending[buffer.pts] = self.count_regions(buffer)
+        return self.probe_return
+
+    def src_probe(self, pad, info):
+        buffer = info.get_buffer()
+        before = self.pending.pop(buffer.pts, None)
+        if before is not None and self.count_regions(buffer) > before:
+            self.last_detection = time.monotonic()
+        return self.probe_return
+
+    def sample(self, elapsed):
+        frames = self.frames - self.reported
+        self.reported = self.frames
+        if elapsed > 0:
+            self.fps = frames / elapsed
+        if len(self.pending) > 256:
+            # Frames dropped inside the element never reach the src pad
+            self.pending.clear()
+
+    def active(self, now, started):
+        seen = self.last_detection if self.last_detection is not None else started
+        return now - seen < BUDGET_IDLE_SECONDS
+
+
+def plan_intervals(lanes, budget, idle_interval=None):
+    """
+    inference-interval per lane for {"name", "fps", "active", "base_interval"} dicts
+    within budget detections/s. Idle lanes get idle_interval (at least their base
+    interval); active lanes the smallest common interval the remaining budget allows,
+    at most the idle interval.
+    """
+    idle_interval = idle_interval or BUDGET_IDLE_INTERVAL
+    intervals = {}
+    remaining = budget
+    for lane in lanes:
+        if not lane["active"]:
+            intervals[lane["name"]] = max(lane["base_interval"], idle_interval)
+            remaining -= lane["fps"] / intervals[lane["name"]]
+    active = [lane for lane in lanes if lane["active"]]
+    demand = sum(lane["fps"] for lane in active)
+    for lane in active:
+        ceiling = max(lane["base_interval"], idle_interval)
+        if demand <= 0:
+            # No frames measured yet
+            intervals[lane["name"]] = lane["base_interval"]
+        elif remaining <= 0:
+            intervals[lane["name"]] = ceiling
+        else:
+            intervals[lane["name"]] = min(ceiling, max(1, math.ceil(demand / remaining)))
+    return intervals
+
+
+class BudgetScheduler:
+    """Re-plans the inference-interval of every lane once per interval."""
+
+    def __init__(self, lanes, started):
+        self.lanes = lanes
+        self.started = started
+
+    def budget(self):
+        if INFERENCE_BUDGET == "auto":
+            return sum(lane.fps / lane.base_interval for lane in self.lanes)
+        return float(INFERENCE_BUDGET)
+
+    def update(self, now, elapsed):
+        """Apply the new intervals. Returns a one-line summary."""
+        for lane in self.lanes:
+            lane.sample(elapsed)
+        states = [{"name": lane.name, "fps": lane.fps, "active": lane.active(now, self.started),
+                   "base_interval": lane.base_interval} for lane in self.lanes]
+        budget = self.budget()
+        intervals = plan_intervals(states, budget)
+        spent = 0.0
+        for lane, state in zip(self.lanes, states):
+            interval = intervals[lane.name]
+            if interval != lane.interval:
+                lane.element.set_property("inference-interval", interval)
+                lane.interval = interval
+            spent += lane.fps / interval
+        active = sum(1 for state in states if state["active"])
+        return (f"budget={budget:.1f} inf/s spent={spent:.1f} inf/s active={active}/{len(self.lanes)} "
+                f"intervals=({', '.join(f'{lane.name}={lane.interval}' for lane in self.lanes)})")
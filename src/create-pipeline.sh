@@ -78,11 +78,41 @@ fi
 # Create pipeline.sh
 pipeline_file="$pipelines_dir/$pipeline_file_name"
 echo "################# Creating pipeline file: $pipeline_file ###################"
-echo "#!/bin/bash" > "$pipeline_file"
-echo "# Generated GStreamer pipeline command" >> "$pipeline_file"
-echo "# Generated on: $(date)" >> "$pipeline_file"
-echo "" >> "$pipeline_file"
-echo "$gst_cmd" >> "$pipeline_file"
+# With PIPELINE_SHARDS/PIPELINE_SHARD_PLAN the generator emits one command per shard,
+# each starting with a "# shard <n> ..." line. Every shard gets its own script, listed in
+# the .shards manifest that run-pipeline.sh reads; pipeline.sh then launches all shards.
+shard_base="${pipeline_file%.sh}"
+shard_manifest="${shard_base}.shards"
+rm -f "$shard_manifest" "${shard_base}"_shard*.sh
+if grep -q "^# shard [0-9]" <<< "$gst_cmd"; then
+    awk -v base="$shard_base" -v generated="$(date)" '
+        /^# shard [0-9]+/ {
+            file = base "_shard" $3 ".sh"
+            print file > (base ".shards")
+            print "#!/bin/bash" > file
+            print "# Generated GStreamer pipeline shard" > file
+            print "# Generated on: " generated > file
+            print "" > file
+        }
+        file { print > file }' <<< "$gst_cmd"
+    echo "#!/bin/bash" > "$pipeline_file"
+    echo "# Generated GStreamer pipeline launcher for $(wc -l < "$shard_manifest") shards" >> "$pipeline_file"
+    echo "# Generated on: $(date)" >> "$pipeline_file"
+    echo "" >> "$pipeline_file"
+    echo "pids=()" >> "$pipeline_file"
+    while IFS= read -r shard_file; do
+        chmod +x "$shard_file"
+        echo "bash \"$shard_file\" & pids+=(\$!)" >> "$pipeline_file"
+        echo "################# Created pipeline shard: $shard_file ($(head -5 "$shard_file" | grep "^# shard")) ###################"
+    done < "$shard_manifest"
+    echo 'status=0; for pid in "${pids[@]}"; do wait "$pid" || status=$?; done; exit $status' >> "$pipeline_file"
+else
+    echo "#!/bin/bash" > "$pipeline_file"
+    echo "# Generated GStreamer pipeline command" >> "$pipeline_file"
+    echo "# Generated on: $(date)" >> "$pipeline_file"
+    echo "" >> "$pipeline_file"
+    echo "$gst_cmd" >> "$pipeline_file"
+fi
 chmod +x "$pipeline_file"
 
 if [ -f "$pipeline_file" ]; then
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Device placement planner for hetero CPU/GPU/NPU workloads.
+
+Takes a workload_to_pipeline map (the device of gvadetect/gvaclassify steps is
+ignored and may be left out), the camera config that says how many streams run
+each workload at what cadence, and a per-device cost table:
+
+    {
+      "devices": {"CPU": {"capacity": 1.0}, "GPU": {"capacity": 1.0}, "NPU": {"capacity": 1.0}},
+      "costs": {
+        "gvadetect": {"yolo11n": {"CPU": 9.5, "GPU": 3.1, "NPU": {"ms": 4.2, "precision": "INT8"}}},
+        "gvaclassify": {"efficientnet-b0": {"CPU": 2.4, "GPU": 1.2, "NPU": 1.1}}
+      }
+    }
+
+Costs are device milliseconds per inference (e.g. measured with benchmark_app);
+a capacity of 1.0 is one fully busy device. A model missing for a device cannot
+be placed there. The planner assigns every detect/classify step to the device
+that lets the config run the most pipeline copies (streams) before any device
+exceeds its capacity, and writes a normal workload_to_pipeline JSON.
+"""
+
+import argparse
+import itertools
+import json
+import math
+import sys
+
+from instance_scheduler import OBJECTS_PER_FRAME, load_generator
+
+PLACED_STEPS = ("gvadetect", "gvaclassify")
+# Above this many combinations the planner switches from exhaustive search to greedy + local search
+EXHAUSTIVE_LIMIT = 200000
+
+
+def load_cost_table(path):
+    """Return ({device: capacity}, {(step type, model): {device: {"ms": .., "precision": ..}}})."""
+    with open(path) as f:
+        data = json.load(f)
+    devices = {}
+    for device, spec in (data.get("devices") or {}).items():
+        capacity = spec.get("capacity", 1.0) if isinstance(spec, dict) else spec
+        if not isinstance(capacity, (int, float)) or capacity <= 0:
+            raise ValueError(f"{path}: capacity of {device} must be a positive number")
+        devices[device.upper()] = float(capacity)
+    if not devices:
+        raise ValueError(f"{path}: no devices defined")
+    costs = {}
+    for step_type, models in (data.get("costs") or {}).items():
+        for model, per_device in models.items():
+            entry = {}
+            for device, cost in per_device.items():
+                device = device.upper()
+                if device not in devices:
+                    raise ValueError(f"{path}: cost for {step_type}/{model} on unknown device {device}")
+                spec = cost if isinstance(cost, dict) else {"ms": cost}
+                if not isinstance(spec.get("ms"), (int, float)) or spec["ms"] <= 0:
+                    raise ValueError(f"{path}: cost for {step_type}/{model} on {device} must be a positive number of ms")
+                entry[device] = spec
+            costs[(step_type, model)] = entry
+    return devices, costs
+
+
+def workload_demand(camera_config, workload_map, generator, workload_settings=None):
+    """
+    Inference requests per second each (workload, step index) receives from one
+    pipeline copy, and the number of streams in one copy.
+    """
+    rates = {}
+    streams = 0
+    for camera in camera_config["lane_config"]["cameras"]:
+        workloads = camera.get("workloads", [])
+        if isinstance(workloads, str):
+            workloads = [workloads]
+        for workload in workloads:
+            steps = workload_map.get(workload.lower())
+            if not steps:
+                continue
+            streams += 1
+            analysis_fps = generator.workload_analysis_fps(camera, workload, workload_settings)
+            if analysis_fps:
+                fps = float(analysis_fps)
+                interval = generator.derive_inference_interval(dict(camera, fps=analysis_fps), workload, default=1)
+            else:
+                fps = float(camera.get("fps", 15))
+                interval = generator.derive_inference_interval(camera, workload)
+            for idx, step in enumerate(steps):
+                if step.get("type") == "gvadetect":
+                    rate = fps / interval
+                else:
+                    rate = fps * OBJECTS_PER_FRAME
+                    reclassify_interval = generator.workload_reclassify_interval(workload, workload_settings, step)
+                    if step.get("type") == "gvaclassify" and reclassify_interval is not None:
+                        # Tracked objects are only reclassified every reclassify_interval frames
+                        # (0: once per track, estimated as once per second)
+                        rate = OBJECTS_PER_FRAME * min(fps, 1.0) if reclassify_interval == 0 else rate / reclassify_interval
+                rates[(workload.lower(), idx)] = rates.get((workload.lower(), idx), 0.0) + rate
+    return rates, streams
+
+
+def build_tasks(workload_map, rates, costs, same_device):
+    """
+    Group the placeable steps into tasks: one per step, or one per workload with
+    same_device. Each task lists its steps with their rate and the devices it can use.
+    """
+    tasks = []
+    for workload, steps in workload_map.items():
+        group = []
+        for idx, step in enumerate(steps):
+            if step.get("type") not in PLACED_STEPS or (workload, idx) not in rates:
+                continue
+            cost = costs.get((step["type"], step.get("model")))
+            if not cost:
+                raise ValueError(f"No cost entry for {step['type']}/{step.get('model')} used by {workload}")
+            group.append({"workload": workload, "index": idx, "rate": rates[(workload, idx)], "costs": cost})
+        if not group:
+            continue
+        for chunk in ([group] if same_device else [[s] for s in group]):
+            options = set(chunk[0]["costs"])
+            for step in chunk[1:]:
+                options &= set(step["costs"])
+            if not options:
+                raise ValueError(f"No device can run all steps of {workload}")
+            tasks.append({"steps": chunk, "options": sorted(options)})
+    return tasks
+
+
+def task_load(task, device):
+    """Device seconds per second one pipeline copy of the task needs on device."""
+    return sum(step["rate"] * step["costs"][device]["ms"] / 1000.0 for step in task["steps"])
+
+
+def evaluate(tasks, assignment, devices):
+    loads = {device: 0.0 for device in devices}
+    for task, device in zip(tasks, assignment):
+        loads[device] += task_load(task, device)
+    worst = max(loads[d] / devices[d] for d in devices)
+    return (worst, sum(loads.values())), loads
+
+
+def place(tasks, devices):
+    """
+    Assign every task to a device, minimizing the highest device utilization (which
+    maximizes the pipeline copies that fit), then the total device time.
+    """
+    combinations = 1
+    for task in tasks:
+        combinations *= len(task["options"])
+    if combinations <= EXHAUSTIVE_LIMIT:
+        best = min(itertools.product(*(task["options"] for task in tasks)),
+                   key=lambda assignment: evaluate(tasks, assignment, devices)[0])
+        return list(best)
+
+    # Greedy: heaviest task first onto the device that keeps the worst utilization lowest
+    order = sorted(range(len(tasks)), key=lambda i: -max(task_load(tasks[i], d) for d in tasks[i]["options"]))
+    assignment = [None] * len(tasks)
+    loads = {device: 0.0 for device in devices}
+    for i in order:
+        def after(device):
+            trial = dict(loads)
+            trial[device] += task_load(tasks[i], device)
+            return (max(trial[d] / devices[d] for d in devices), sum(trial.values()))
+        device = min(tasks[i]["options"], key=after)
+        assignment[i] = device
+        loads[device] += task_load(tasks[i], device)
+    # Local search: move single tasks while that improves the score
+    score = evaluate(tasks, assignment, devices)[0]
+    improved = True
+    while improved:
+        improved = False
+        for i, task in enumerate(tasks):
+            for device in task["options"]:
+                if device == assignment[i]:
+                    continue
+                trial = assignment[:i] + [device] + assignment[i + 1:]
+                trial_score = evaluate(tasks, trial, devices)[0]
+                if trial_score < score:
+                    assignment, score, improved = trial, trial_score, True
+    return assignment
+
+
+def apply_placement(workload_config, tasks, assignment):
+    """Write the chosen devices (and per-device precision) into a copy of the workload config."""
+    config = json.loads(json.dumps(workload_config))
+    workload_map = {k.lower(): v for k, v in config["workload_pipeline_map"].items()}
+    for task, device in zip(tasks, assignment):
+        for step in task["steps"]:
+            target = workload_map[step["workload"]][step["index"]]
+            target["device"] = device
+            precision = step["costs"][device].get("precision")
+            if precision:
+                target["precision"] = precision
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Place detect/classify steps on CPU/GPU/NPU from a cost table")
+    parser.add_argument("--camera-config", default="configs/camera_to_workload.json",
+                        help="Path to camera_to_workload.json")
+    parser.add_argument("--pipeline-config", default="configs/workload_to_pipeline.json",
+                        help="Workload map to place (devices of detect/classify steps are ignored)")
+    parser.add_argument("--costs", required=True, help="Per-device cost table JSON")
+    parser.add_argument("--same-device", action="store_true",
+                        help="Run all detect/classify steps of a workload on one device")
+    parser.add_argument("--output", default="", help="Write the placed workload_to_pipeline JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    try:
+        devices, costs = load_cost_table(args.costs)
+        with open(args.camera_config) as f:
+            camera_config = json.load(f)
+        with open(args.pipeline_config) as f:
+            workload_config = json.load(f)
+        workload_map = {k.lower(): v for k, v in workload_config["workload_pipeline_map"].items()}
+        generator = load_generator()
+        rates, streams = workload_demand(camera_config, workload_map, generator, workload_config.get("workload_settings"))
+        tasks = build_tasks(workload_map, rates, costs, args.same_device)
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not tasks:
+        print("Error: No detect/classify steps used by the camera config", file=sys.stderr)
+        sys.exit(1)
+
+    assignment = place(tasks, devices)
+    (worst, _), loads = evaluate(tasks, assignment, devices)
+    copies = math.floor(1.0 / worst) if worst > 0 else 0
+    print(f"Placement for {streams} streams per pipeline copy:", file=sys.stderr)
+    for task, device in zip(tasks, assignment):
+        names = ", ".join(f"{s['workload']}[{s['index']}]" for s in task["steps"])
+        print(f"  {names} -> {device} ({task_load(task, device) * 1000:.1f} ms/s)", file=sys.stderr)
+    for device, capacity in devices.items():
+        print(f"  {device}: {loads[device]:.3f} device-s/s per copy, "
+              f"{100.0 * loads[device] * max(copies, 1) / capacity:.0f}% of capacity at {max(copies, 1)} copies", file=sys.stderr)
+    print(f"Max pipeline copies: {copies} ({copies * streams} streams)", file=sys.stderr)
+
+    output = json.dumps(apply_placement(workload_config, tasks, assignment), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        print(f"Placed workload config written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
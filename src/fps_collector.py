@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Per-stream FPS logs for pipelines run through gst-launch.
+
+run-pipeline.sh follows a gst-launch log with tail -F and pipes it here. Every
+FpsCounter(last ...) line whose number of streams matches the script is split
+into per-stream values and appended to pipeline_stream<i>_<cid>.log, starting
+at the script's first stream index, as the in-process launcher does.
+
+Streams behind an analysis_* videorate or a motion gate are logged at the
+source rate with the same source_equivalent_fps the launcher uses: videorates
+count with the nominal ratio the generator noted in the script, gates with the
+frames/passed counters they print every MOTION_GATE_REPORT_INTERVAL seconds.
+
+Usage: ... | fps_collector.py --results-dir DIR --cid CID --first-stream N --stream-count N SCRIPT [SCRIPT ...]
+"""
+
+import argparse
+import os
+import re
+import sys
+
+from pipeline_script import read_pipeline_script, source_equivalent_fps, stream_names, stream_stages
+
+FPS_COUNTER_RE = re.compile(r"FpsCounter\(last.*number-streams=(\d+)")
+PER_STREAM_RE = re.compile(r"per-stream=(\d+\.\d+)")
+MULTI_STREAM_RE = re.compile(r"fps\s*\(([^)]+)\)")
+GATE_RE = re.compile(r"\[motion_gate\] ([^:]+): frames=(\d+) passed=(\d+) seconds=([0-9.]+)")
+
+
+def stream_values(line, stream_count):
+    """Per-stream fps of an FpsCounter(last ...) line for stream_count streams, or None."""
+    match = FPS_COUNTER_RE.search(line)
+    if not match or int(match.group(1)) != stream_count:
+        return None
+    if stream_count == 1:
+        match = PER_STREAM_RE.search(line)
+        return [float(match.group(1))] if match else None
+    match = MULTI_STREAM_RE.search(line)
+    if not match:
+        return None
+    try:
+        return [float(value) for value in match.group(1).replace(" ", "").split(",")]
+    except ValueError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append per-stream FPS from a gst-launch log on stdin")
+    parser.add_argument("scripts", nargs="+", help="All pipeline scripts of the run, in stream order")
+    parser.add_argument("--results-dir", required=True, help="Directory of the pipeline_stream<i> logs")
+    parser.add_argument("--cid", required=True, help="Run id in the log names")
+    parser.add_argument("--first-stream", type=int, default=0, help="Index of the log's first stream")
+    parser.add_argument("--stream-count", type=int, required=True, help="Streams of the log's script")
+    args = parser.parse_args()
+
+    names = []
+    stages = {}
+    try:
+        for script in args.scripts:
+            names += stream_names(read_pipeline_script(script)[2])
+            stages.update(stream_stages(script))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    # Latest (frames, passed, seconds) of every gate
+    gates = {}
+    for line in sys.stdin:
+        match = GATE_RE.search(line)
+        if match:
+            gates[match.group(1)] = (int(match.group(2)), int(match.group(3)), float(match.group(4)))
+            continue
+        values = stream_values(line, args.stream_count)
+        if values is None:
+            continue
+        for idx, fps in enumerate(values):
+            stream = args.first_stream + idx
+            if stream >= len(names):
+                continue
+            counts = []
+            for stage, ratio in stages.get(names[stream], []):
+                if ratio is not None:
+                    counts.append((ratio, 1, 1.0))
+                elif stage in gates:
+                    counts.append(gates[stage])
+            fps = source_equivalent_fps(fps, counts)
+            with open(os.path.join(args.results_dir, f"pipeline_stream{stream}_{args.cid}.log"), "a") as f:
+                f.write(f"{fps:.2f}\n")
+
+
+if __name__ == "__main__":
+    main()
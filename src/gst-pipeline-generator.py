@@ -8,6 +8,13 @@ from dotenv import dotenv_values
 import sys
 import socket
 import time
+import hashlib
+from instance_scheduler import OBJECTS_PER_FRAME, SCHEDULED_ELEMENTS, estimate_load, format_schedule, inference_rate, schedule_model_instances
+from rtsp_probe import probe_rtsp_streams
+from pipeline_graph import DEFAULT_PASSES, Element, PipelineGraph, optimize, parse_chain, parse_properties, parse_value, share_sources
+from pipeline_script import queue_limits, stage_key
+from shard_plan import assign_units, launch_prefix, plan_shards, topology_signature
+from synthetic_source import SYNTHETIC_MODES, SYNTHETIC_PATTERN, camera_format, clip_path, ensure_clip, is_decoder, raw_caps
 
 WORKLOAD_DIST = os.environ.get("WORKLOAD_DIST", "workload_to_pipeline.json")
 CAMERA_STREAM = os.environ.get("CAMERA_STREAM", "camera_to_workload.json")
@@ -21,6 +28,8 @@ MODELSERVER_VIDEOS_DIR = "/home/pipeline-server/sample-media"
 RTSP_DEFAULT_HOST = os.getenv("RTSP_STREAM_HOST", "rtsp-streamer")
 RTSP_DEFAULT_PORT = os.getenv("RTSP_STREAM_PORT", "8554")
 RTSP_DEFAULT_LATENCY = os.getenv("RTSP_LATENCY", "200")
+# Opt-in: check the camera streams on the RTSP server before generating (warnings only)
+RTSP_PROBE_ENABLED = os.getenv("RTSP_PROBE", "0") == "1"
 
 # Configurable round robin count for model instance sharing
 try:
@@ -32,6 +41,176 @@ except ValueError:
     print(f"Warning: Invalid ROUND_ROBIN_COUNT value '{os.getenv('ROUND_ROBIN_COUNT')}', using default 4", file=sys.stderr)
     ROUND_ROBIN_COUNT = 4
 
+# gvadetect inference-interval used when a camera sets no inference_hz / max_detection_latency_ms
+DEFAULT_INFERENCE_INTERVAL = 3
+
+# gvaclassify reclassify-interval for tracked objects: 1 classifies every frame (the DLStreamer
+# default), N every Nth frame of a track, 0 once per track. Overridden per workload by
+# "reclassify_interval" in the workload_settings or a gvaclassify step of workload_to_pipeline.json
+try:
+    RECLASSIFY_INTERVAL = int(os.getenv("RECLASSIFY_INTERVAL", "1"))
+    if RECLASSIFY_INTERVAL < 0:
+        raise ValueError
+except ValueError:
+    print(f"Warning: Invalid RECLASSIFY_INTERVAL value '{os.getenv('RECLASSIFY_INTERVAL')}', using default 1", file=sys.stderr)
+    RECLASSIFY_INTERVAL = 1
+
+QUEUE_PROPS = {"max-size-buffers": 3, "max-size-time": 100000000, "leaky": "downstream"}
+
+# Decode each distinct stream URI / file once per pipeline copy and fan it out to all workloads through a tee
+SHARE_SOURCES = os.getenv("SHARE_SOURCES", "0") == "1"
+
+# Run the leading steps that workloads on a camera have in common (e.g. the same gvadetect) only once
+SHARE_INFERENCE_PREFIX = os.getenv("SHARE_INFERENCE_PREFIX", "1") != "0"
+
+# Crop decoded frames to the union of the camera's regions of interest before any inference;
+# a camera can override this with "roi_crop": true/false
+ROI_CROP = os.getenv("ROI_CROP", "0") == "1"
+# gvapython module that moves gvametaconvert coordinates from the crop back to the full frame
+ROI_CROP_MODULE = "/home/pipeline-server/src/roi_crop.py"
+
+# Metadata file format of the workload branches: "json" (gvametapublish json-lines) or "binary"
+# (length-delimited MessagePack records, see metadata_sink.py); a camera can override this with
+# "metadata_format", per workload if needed
+METADATA_FORMATS = ("json", "binary")
+METADATA_FORMAT = os.getenv("METADATA_FORMAT", "json").strip().lower()
+if METADATA_FORMAT not in METADATA_FORMATS:
+    print(f"Warning: Invalid METADATA_FORMAT value '{METADATA_FORMAT}', using default json", file=sys.stderr)
+    METADATA_FORMAT = "json"
+METADATA_SINK_MODULE = "/home/pipeline-server/src/metadata_sink.py"
+
+# gvapython module behind the "motion_gate" step type: drops frames whose ROI did not change
+MOTION_GATE_MODULE = "/home/pipeline-server/src/motion_gate.py"
+MOTION_GATE_OPTIONS = ("threshold", "pixel_delta", "scale", "hold_frames", "max_skip_frames")
+
+# gvapython module that drops regions below a gvaclassify step's min_area/min_confidence before it
+REGION_GATE_MODULE = "/home/pipeline-server/src/region_gate.py"
+
+# Decimate the render branch (gvawatermark and display with RENDER_MODE=1, the fakesink
+# fpsdisplaysink otherwise) with videorate: RENDER_FPS caps it at that many fps and
+# RENDER_FRAME_INTERVAL keeps about every Nth frame of the camera fps. 0 keeps every frame.
+def _render_rate_env(key):
+    try:
+        value = float(os.getenv(key, "0"))
+        if value < 0:
+            raise ValueError
+        return value
+    except ValueError:
+        print(f"Warning: Invalid {key} value '{os.getenv(key)}', using default 0", file=sys.stderr)
+        return 0
+RENDER_FPS = _render_rate_env("RENDER_FPS")
+RENDER_FRAME_INTERVAL = _render_rate_env("RENDER_FRAME_INTERVAL")
+# RENDER_BRANCH=0 leaves the render branch out entirely when RENDER_MODE is off (benchmark mode)
+RENDER_BRANCH = os.getenv("RENDER_BRANCH", "1") != "0"
+
+# Replace every camera source with a synthetic one for hardware-free benchmarks: "pattern"
+# (videotestsrc) or "clip" (a locally generated H.264 clip), see synthetic_source.py
+SYNTHETIC_SOURCE = os.getenv("SYNTHETIC_SOURCE", "").strip().lower()
+if SYNTHETIC_SOURCE in ("", "0"):
+    SYNTHETIC_SOURCE = ""
+elif SYNTHETIC_SOURCE not in SYNTHETIC_MODES:
+    print(f"Warning: Invalid SYNTHETIC_SOURCE value '{SYNTHETIC_SOURCE}', using the configured sources", file=sys.stderr)
+    SYNTHETIC_SOURCE = ""
+
+# Shared OpenVINO compiled-model cache passed to every inference element as ie-config CACHE_DIR,
+# so restarts load compiled blobs instead of compiling the IR again (empty disables it)
+OV_CACHE_DIR = os.getenv("OV_CACHE_DIR", "/home/pipeline-server/models/ov_cache").strip()
+
+# Pick the smallest exported input-size variant of a detection model (object_detection/<model>/variants.json,
+# written by model_convert.py export_yolo) that still covers the camera's region of interest
+MODEL_VARIANTS = os.getenv("MODEL_VARIANTS", "1") != "0"
+MODEL_VARIANTS_MANIFEST = "variants.json"
+
+# Optional path to write the optimized pipeline graph as JSON
+PIPELINE_GRAPH_JSON = os.getenv("PIPELINE_GRAPH_JSON", "")
+
+# "cost" bin-packs streams onto model instances by estimated inference load (up to ROUND_ROBIN_COUNT
+# instances per model and device); "round_robin" assigns instances by counter % ROUND_ROBIN_COUNT
+MODEL_INSTANCE_SCHEDULER = os.getenv("MODEL_INSTANCE_SCHEDULER", "cost").strip().lower()
+if MODEL_INSTANCE_SCHEDULER not in ("cost", "round_robin"):
+    print(f"Warning: Invalid MODEL_INSTANCE_SCHEDULER value '{MODEL_INSTANCE_SCHEDULER}', using default cost", file=sys.stderr)
+    MODEL_INSTANCE_SCHEDULER = "cost"
+
+# Split the cameras over several gst-launch processes pinned to CPU ranges: a number of shards,
+# or "auto" for one shard per NUMA node. PIPELINE_SHARD_PLAN names a JSON topology plan instead.
+PIPELINE_SHARDS = os.getenv("PIPELINE_SHARDS", "1").strip().lower()
+if PIPELINE_SHARDS != "auto":
+    try:
+        PIPELINE_SHARDS = int(PIPELINE_SHARDS)
+        if PIPELINE_SHARDS < 1:
+            raise ValueError
+    except ValueError:
+        print(f"Warning: Invalid PIPELINE_SHARDS value '{os.getenv('PIPELINE_SHARDS')}', using default 1", file=sys.stderr)
+        PIPELINE_SHARDS = 1
+PIPELINE_SHARD_PLAN = os.getenv("PIPELINE_SHARD_PLAN", "")
+
+# Learned ROIs (roi_learner.py output) that replace the configured region_of_interest of the
+# cameras they list; a camera keeps its configured ROI with "adaptive_roi": false
+ADAPTIVE_ROI_FILE = os.getenv("ADAPTIVE_ROI_FILE", "").strip()
+if ADAPTIVE_ROI_FILE and not os.path.isabs(ADAPTIVE_ROI_FILE):
+    ADAPTIVE_ROI_FILE = f"/home/pipeline-server/configs/{ADAPTIVE_ROI_FILE}"
+
+# Per-stage latency profile (queue_profile.py output of a QUEUE_CALIBRATE=1 run); queues in
+# front of profiled stages are sized from the stage latency instead of QUEUE_PROPS
+QUEUE_PROFILE_FILE = os.getenv("QUEUE_PROFILE_FILE", "").strip()
+if QUEUE_PROFILE_FILE and not os.path.isabs(QUEUE_PROFILE_FILE):
+    QUEUE_PROFILE_FILE = f"/home/pipeline-server/configs/{QUEUE_PROFILE_FILE}"
+try:
+    QUEUE_HEADROOM = float(os.getenv("QUEUE_HEADROOM", "2"))
+    if QUEUE_HEADROOM < 1:
+        raise ValueError
+except ValueError:
+    print(f"Warning: Invalid QUEUE_HEADROOM value '{os.getenv('QUEUE_HEADROOM')}', using default 2", file=sys.stderr)
+    QUEUE_HEADROOM = 2.0
+SHARDING_ENABLED = PIPELINE_SHARDS != 1 or bool(PIPELINE_SHARD_PLAN)
+
+# Content-addressed cache of generated pipeline commands, keyed on every generator input
+PIPELINE_CACHE_ENABLED = os.getenv("PIPELINE_CACHE", "1") != "0"
+PIPELINE_CACHE_DIR = os.getenv("PIPELINE_CACHE_DIR", "/home/pipeline-server/pipelines/.cache")
+# Placeholder written into cached commands in place of the per-run TIMESTAMP
+TIMESTAMP_PLACEHOLDER = "@TIMESTAMP@"
+
+DEVICE_ENV_FILES = {
+    "CPU": "/res/all-cpu.env",
+    "NPU": "/res/all-npu.env",
+    "GPU": "/res/all-gpu.env"
+}
+
+# Environment variables that change the generated pipeline and therefore the cache key
+PIPELINE_CACHE_ENV_KEYS = [
+    "ROUND_ROBIN_COUNT",
+    "BATCH_SIZE_DETECT",
+    "BATCH_SIZE_CLASSIFY",
+    "RENDER_MODE",
+    "RENDER_FPS",
+    "RENDER_FRAME_INTERVAL",
+    "RENDER_BRANCH",
+    "SHARE_SOURCES",
+    "SHARE_INFERENCE_PREFIX",
+    "ROI_CROP",
+    "METADATA_FORMAT",
+    "MODEL_INSTANCE_SCHEDULER",
+    "SCHEDULER_OBJECTS_PER_FRAME",
+    "RECLASSIFY_INTERVAL",
+    "BATCH_LATENCY_MS",
+    "MAX_BATCH_SIZE",
+    "PIPELINE_SHARDS",
+    "PIPELINE_SHARD_PLAN",
+    "ADAPTIVE_ROI_FILE",
+    "QUEUE_PROFILE_FILE",
+    "QUEUE_HEADROOM",
+    "SYNTHETIC_SOURCE",
+    "OV_CACHE_DIR",
+    "MODEL_VARIANTS",
+    "SYNTHETIC_PATTERN",
+    "SYNTHETIC_CLIP_DIR",
+    "GST_DEBUG",
+    "GST_TRACERS",
+    "RTSP_STREAM_HOST",
+    "RTSP_STREAM_PORT",
+    "RTSP_LATENCY",
+]
+
 
 def download_video_if_missing(video_name, width=None, fps=None):
     # Use default width and fps if not provided
@@ -56,50 +235,6 @@ def sanitize_gst_name(raw: str) -> str:
     return cleaned
 
 
-def check_rtsp_stream_exists(stream_uri: str, timeout: int = 3) -> bool:
-    """
-    Check if a specific RTSP stream path is available using GStreamer.
-    Returns True if the stream is accessible, False otherwise.
-    """
-    try:
-        import subprocess
-        
-        # Use gst-launch to test if stream exists with a very short timeout
-        # This will fail quickly if the stream doesn't exist (404 Not Found)
-        cmd = [
-            'timeout', '5',  # Kill after 5 seconds
-            'gst-launch-1.0',
-            'rtspsrc', f'location={stream_uri}',
-            'protocols=tcp',
-            'latency=200',
-            'timeout=2000000',  # 2 second RTSP timeout
-            '!', 'fakesink'
-        ]
-        
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.PIPE,
-            timeout=6,
-            text=True
-        )
-        
-        # Check if stderr contains "Not Found" or "404"
-        if result.stderr and ('Not Found' in result.stderr or '404' in result.stderr or 'Not found' in result.stderr):
-            return False
-            
-        # If command succeeded or timed out (stream exists but we didn't wait), it's available
-        return True
-        
-    except subprocess.TimeoutExpired:
-        # Timeout means stream connected successfully
-        return True
-    except Exception as e:
-        print(f"Warning: Could not check RTSP stream {stream_uri}: {e}", file=sys.stderr)
-        # If we can't check, assume it exists to avoid false negatives
-        return True
-
-
 def derive_stream_uri(camera: dict) -> str:
     """
     Derive the RTSP stream URI from the camera config.
@@ -151,9 +286,45 @@ def derive_stream_name(camera: dict, stream_uri: str) -> str:
 
     return "stream"
 
-def download_model_if_missing(model_name, model_type=None, precision=None):
+_model_variants = {}
+
+def load_model_variants(model_name):
+    """Input-size variants manifest of a detection model, or None when the model has none."""
+    if model_name not in _model_variants:
+        path = os.path.join(MODELSERVER_MODELS_DIR, "object_detection", model_name, MODEL_VARIANTS_MANIFEST)
+        try:
+            with open(path) as f:
+                _model_variants[model_name] = json.load(f)
+        except (OSError, ValueError):
+            _model_variants[model_name] = None
+    return _model_variants[model_name]
+
+def select_model_variant(model_name, precision, roi):
+    """
+    (input size, relative model path) of the smallest variant whose input is at least the
+    long side of the ROI, else the largest one; None without an ROI, a manifest or a
+    variant for this precision, or when the pick is the default export. ROIs at least as
+    large as the default export's input (both shipped camera ROIs are) keep the default.
+    """
+    if not MODEL_VARIANTS or not roi:
+        return None
+    manifest = load_model_variants(model_name)
+    if not manifest:
+        return None
+    sizes = sorted(int(size) for size, paths in manifest.get("variants", {}).items() if precision in paths)
+    if not sizes:
+        return None
+    long_side = max(roi.get("x2", 0) - roi.get("x", 0), roi.get("y2", 0) - roi.get("y", 0))
+    size = next((s for s in sizes if s >= long_side), sizes[-1])
+    if size == manifest.get("default"):
+        return None
+    return size, manifest["variants"][str(size)][precision]
+
+def download_model_if_missing(model_name, model_type=None, precision=None, variant=None):
     if model_type == "gvadetect":
         precision_lower = precision.lower()
+        if variant:
+            return f"{MODELSERVER_MODELS_DIR}/object_detection/{model_name}/{variant[1]}"
         return f"{MODELSERVER_MODELS_DIR}/object_detection/{model_name}/{precision}/{model_name}.xml"
     elif model_type == "gvainference":
         base_path = f"{MODELSERVER_MODELS_DIR}/object_classification/{model_name}"
@@ -191,16 +362,23 @@ def pipeline_cfg_signature(cfg):
     return json.dumps(sig, sort_keys=True)
 
 def get_env_vars_for_device(device):
-    device_env_map = {
-        "CPU": "/res/all-cpu.env",
-        "NPU": "/res/all-npu.env",
-        "GPU": "/res/all-gpu.env"
-    }
-    env_file = device_env_map.get(device.upper())
+    env_file = DEVICE_ENV_FILES.get(device.upper())
     if not env_file or not os.path.exists(env_file):
         return {}
     return dotenv_values(env_file)
 
+def add_ie_config(props, key, value):
+    """Set one KEY=VALUE entry in the comma-separated ie-config property, keeping the others."""
+    items = [item for item in str(props.get("ie-config", "")).split(",") if item and not item.startswith(f"{key}=")]
+    props["ie-config"] = ",".join(items + [f"{key}={value}"])
+
+def parse_batch_size(value):
+    """Return "auto" or the batch size as an int; raises ValueError for anything else."""
+    text = str(value).strip()
+    if text.lower() == "auto":
+        return "auto"
+    return int(text)
+
 def build_gst_element(cfg):
     model = cfg.get("model")
     device = cfg.get("device")
@@ -209,21 +387,20 @@ def build_gst_element(cfg):
     camera_id = cfg.get("camera_id", "")
     # Load env vars for this device
     env_vars = get_env_vars_for_device(device) if device else {}
-    DECODE = env_vars.get("DECODE") or "decodebin"
     PRE_PROCESS = env_vars.get("PRE_PROCESS", "")
     DETECTION_OPTIONS = env_vars.get("DETECTION_OPTIONS", "")
     PRE_PROCESS_CONFIG = env_vars.get("PRE_PROCESS_CONFIG", "")
 
     try:
-        BATCH_SIZE_DETECT = int(os.environ.get("BATCH_SIZE_DETECT", 
-                                              env_vars.get("BATCH_SIZE_DETECT", 1)))
+        BATCH_SIZE_DETECT = parse_batch_size(os.environ.get("BATCH_SIZE_DETECT", 
+                                                            env_vars.get("BATCH_SIZE_DETECT", 1)))
     except ValueError:
         print(f"Warning: Invalid BATCH_SIZE_DETECT value, using default 1", file=sys.stderr)
         BATCH_SIZE_DETECT = 1
         
     try:
-        BATCH_SIZE_CLASSIFY = int(os.environ.get("BATCH_SIZE_CLASSIFY", 
-                                                env_vars.get("BATCH_SIZE_CLASSIFY", 1)))
+        BATCH_SIZE_CLASSIFY = parse_batch_size(os.environ.get("BATCH_SIZE_CLASSIFY", 
+                                                              env_vars.get("BATCH_SIZE_CLASSIFY", 1)))
     except ValueError:
         print(f"Warning: Invalid BATCH_SIZE_CLASSIFY value, using default 1", file=sys.stderr)
         BATCH_SIZE_CLASSIFY = 1
@@ -233,77 +410,266 @@ def build_gst_element(cfg):
     print("******************************************", file=sys.stderr)
     
     CLASSIFICATION_PRE_PROCESS = env_vars.get("CLASSIFICATION_PRE_PROCESS", "")
-    # Add inference-region=1 if region_of_interest is present in cfg (from camera_to_workload.json)
-    inference_region = ""
-    name_index = cfg.get("name_idx", "")  
-    name_str = f"name={camera_id}_{workload_name}_{name_index}" if workload_name and camera_id and cfg["type"] == "gvadetect" else ""
-    if cfg["type"] == "gvadetect" and cfg.get("region_of_interest") is not None:
-        inference_region = " inference-region=1"
+    props = {}
+    meta = {}
+    # "auto" batch sizes start at 1 and are sized per model instance by the scheduler
+    if (cfg["type"] == "gvadetect" and BATCH_SIZE_DETECT == "auto") or (cfg["type"] == "gvaclassify" and BATCH_SIZE_CLASSIFY == "auto"):
+        meta["auto_batch"] = True
+    BATCH_SIZE_DETECT = 1 if BATCH_SIZE_DETECT == "auto" else BATCH_SIZE_DETECT
+    BATCH_SIZE_CLASSIFY = 1 if BATCH_SIZE_CLASSIFY == "auto" else BATCH_SIZE_CLASSIFY
+    if workload_name and camera_id and cfg["type"] == "gvadetect":
+        props["name"] = f"{camera_id}_{workload_name}_{cfg.get('name_idx', '')}"
 
     if cfg["type"] == "gvadetect":
         # Always use the precision from the current step config
-        model_path = download_model_if_missing(model, "gvadetect", cfg.get("precision", ""))
-        elem = f"gvadetect {name_str} batch-size={BATCH_SIZE_DETECT} inference-interval=3 scale-method=fast {inference_region} model={model_path} device={device} {PRE_PROCESS} {DETECTION_OPTIONS} {PRE_PROCESS_CONFIG}"
+        roi = cfg.get("region_of_interest")
+        variant = select_model_variant(model, cfg.get("precision", ""), roi)
+        model_path = download_model_if_missing(model, "gvadetect", cfg.get("precision", ""), variant)
+        if variant:
+            meta["input_size"] = variant[0]
+            print(f"Model variant for {camera_id}: {model} {variant[0]}x{variant[0]} for a "
+                  f"{roi['x2'] - roi['x']}x{roi['y2'] - roi['y']} ROI", file=sys.stderr)
+        props.update({"batch-size": BATCH_SIZE_DETECT, "inference-interval": cfg.get("inference_interval", DEFAULT_INFERENCE_INTERVAL), "scale-method": "fast"})
+        # Add inference-region=1 if region_of_interest is present in cfg (from camera_to_workload.json)
+        if cfg.get("region_of_interest") is not None:
+            props["inference-region"] = 1
+        props.update({"model": model_path, "device": device})
+        for options in (PRE_PROCESS, DETECTION_OPTIONS, PRE_PROCESS_CONFIG):
+            props.update(parse_properties(options))
     elif cfg["type"] == "gvaclassify":
         # Always use the precision from the current step config
         model_path, label_path, proc_path = download_model_if_missing(model, "gvaclassify", cfg.get("precision", "")) 
-        elem = f"gvaclassify {name_str} batch-size={BATCH_SIZE_CLASSIFY} inference-region=1 scale-method=fast model={model_path} device={device} model-proc={proc_path} {CLASSIFICATION_PRE_PROCESS}"
+        props.update({"batch-size": BATCH_SIZE_CLASSIFY, "inference-region": 1, "scale-method": "fast",
+                      "model": model_path, "device": device, "model-proc": proc_path})
+        if cfg.get("reclassify_interval") is not None:
+            props["reclassify-interval"] = cfg["reclassify_interval"]
+        labels = classify_labels(cfg)
+        if labels:
+            props["object-class"] = ",".join(labels)
+        props.update(parse_properties(CLASSIFICATION_PRE_PROCESS))
     elif cfg["type"] == "gvainference":
         model_path = download_model_if_missing(model, "gvainference", cfg.get("precision", ""))
-        elem = f"gvainference  model={model_path} device={device} "
+        props.update({"model": model_path, "device": device})
     elif cfg["type"] == "gvapython":
         # Try to get module and function from cfg (populated from camera_to_workload.json)
-        module = cfg.get("module", "")
-        function = cfg.get("function", "")
-        elem = f"gvapython module=/home/pipeline-server/src/{module} function={function}  "
-    elif cfg["type"] in ["gvatrack", "gvaattachroi", "gvametaconvert", "gvametapublish", "gvawatermark", "gvafpscounter", "fpsdisplaysink", "queue", "videoconvert", "decodebin", "filesrc", "fakesink"]:
-        elem = cfg["type"]
-    else:
+        props.update({"module": f"/home/pipeline-server/src/{cfg.get('module', '')}", "function": cfg.get("function", "")})
+    elif cfg["type"] not in ["gvatrack", "gvaattachroi", "gvametaconvert", "gvametapublish", "gvawatermark", "gvafpscounter", "fpsdisplaysink", "queue", "videoconvert", "decodebin", "filesrc", "fakesink"]:
         # Log warning but allow unknown types to pass through
         print(f"Warning: Unknown or unsupported GStreamer element type: {cfg['type']}", file=sys.stderr)
-        elem = cfg["type"]
-    return elem, DECODE
+    if cfg["type"] in INFERENCE_STEP_TYPES and OV_CACHE_DIR:
+        add_ie_config(props, "CACHE_DIR", OV_CACHE_DIR)
+    elem = Element(cfg["type"], props)
+    elem.meta.update(meta)
+    return elem
+
+INFERENCE_STEP_TYPES = ("gvadetect", "gvaclassify", "gvainference")
+
+def camera_setting(camera, key, workload):
+    """
+    Read a per-camera setting that may be a single value for the whole camera or an
+    object keyed by workload name (with an optional "default" entry).
+    """
+    value = camera.get(key)
+    if isinstance(value, dict):
+        lowered = {str(k).lower(): v for k, v in value.items()}
+        value = lowered.get(workload.lower(), lowered.get("default"))
+    return value
+
+def render_max_rate(camera):
+    """videorate max-rate for the camera's render branch from RENDER_FPS / RENDER_FRAME_INTERVAL, or None."""
+    fps = float(camera.get("fps", 15))
+    rates = []
+    if RENDER_FPS:
+        rates.append(RENDER_FPS)
+    if RENDER_FRAME_INTERVAL:
+        rates.append(fps / RENDER_FRAME_INTERVAL)
+    if not rates or min(rates) >= fps:
+        return None
+    return max(1, round(min(rates)))
+
+# Step fields that change which objects a gvaclassify runs on
+CLASSIFY_GATING_KEYS = ("reclassify_interval", "labels", "min_area", "min_confidence")
+
+def classify_labels(step):
+    """Detection labels a classification step is limited to ("labels": list or comma-separated string)."""
+    labels = step.get("labels") or []
+    if isinstance(labels, str):
+        labels = labels.split(",")
+    return [str(label).strip() for label in labels if str(label).strip()]
+
+def region_gate(step):
+    """RegionGate kwargs of a classification step with "min_area"/"min_confidence", else None."""
+    gate = {key: step[key] for key in ("min_area", "min_confidence") if step.get(key)}
+    if not gate:
+        return None
+    labels = classify_labels(step)
+    if labels:
+        gate["labels"] = labels
+    return gate
+
+def derive_inference_interval(camera, workload, default=DEFAULT_INFERENCE_INTERVAL):
+    """
+    Turn the camera's inference_hz / max_detection_latency_ms settings into a gvadetect
+    inference-interval for its fps. inference_hz asks for that many detections per second;
+    max_detection_latency_ms caps the time between two detections. Without either the
+    default interval is kept.
+    """
+    fps = float(camera.get("fps", 15))
+    inference_hz = camera_setting(camera, "inference_hz", workload)
+    max_latency_ms = camera_setting(camera, "max_detection_latency_ms", workload)
+    if inference_hz is None and max_latency_ms is None:
+        return default
+    interval = None
+    try:
+        if inference_hz is not None:
+            interval = max(1, round(fps / float(inference_hz)))
+        if max_latency_ms is not None:
+            latency_interval = max(1, int(fps * float(max_latency_ms) / 1000))
+            interval = latency_interval if interval is None else min(interval, latency_interval)
+    except (TypeError, ValueError, ZeroDivisionError):
+        print(f"Warning: Invalid inference cadence for camera {camera.get('camera_id', 'unknown')}/{workload}, using inference-interval={DEFAULT_INFERENCE_INTERVAL}", file=sys.stderr)
+        return DEFAULT_INFERENCE_INTERVAL
+    print(f"Inference cadence for {camera.get('camera_id', 'unknown')}/{workload}: inference-interval={interval} ({fps / interval:.1f} detections/s at {fps:g} fps)", file=sys.stderr)
+    return interval
+
+def step_signature(step):
+    """Identity of a workload step, ignoring the per-camera/per-workload bookkeeping fields."""
+    sig = {k: v for k, v in step.items() if k not in ("workload_name", "camera_id", "name_idx")}
+    return json.dumps(sig, sort_keys=True)
+
+def build_step_tree(step_lists, indices=None):
+    """
+    Build a prefix tree over the step lists selected by indices. Each node is
+    {"step", "children": {signature: node}, "ends": [index of a step list ending here]},
+    so workloads with the same leading steps (e.g. the same gvadetect) share those nodes.
+    """
+    root = {"step": None, "children": {}, "ends": []}
+    for idx in (range(len(step_lists)) if indices is None else indices):
+        node = root
+        for step in step_lists[idx]:
+            node = node["children"].setdefault(step_signature(step), {"step": step, "children": {}, "ends": []})
+        node["ends"].append(idx)
+    return root
+
+def count_inference_steps(tree_or_lists, indices=None):
+    """Count inference elements in a step tree, or in the selected step lists when run unshared."""
+    if isinstance(tree_or_lists, dict):
+        own = 1 if tree_or_lists["step"] and tree_or_lists["step"].get("type") in INFERENCE_STEP_TYPES else 0
+        return own + sum(count_inference_steps(child) for child in tree_or_lists["children"].values())
+    return sum(
+        1 for idx in indices for step in tree_or_lists[idx] if step.get("type") in INFERENCE_STEP_TYPES
+    )
 
-def build_dynamic_gstlaunch_command(camera, workloads, workload_map, branch_idx=0, model_instance_map=None, detect_counter=None, classify_counter=None, inference_counter=None, name_idx_counter=None, timestamp=None):
+def workload_analysis_fps(camera, workload, workload_settings):
+    """
+    Frames per second a workload analyzes, from "analysis_fps" in the workload_settings
+    of workload_to_pipeline.json. None when unset or not below the camera fps.
+    """
+    settings = {str(k).lower(): v for k, v in (workload_settings or {}).items()}.get(workload.lower()) or {}
+    value = settings.get("analysis_fps")
+    if value is None:
+        return None
+    fps = float(camera.get("fps", 15))
+    try:
+        rate = max(1, round(float(value)))
+    except (TypeError, ValueError):
+        print(f"Warning: Invalid analysis_fps value '{value}' for {workload}, analyzing every frame", file=sys.stderr)
+        return None
+    return rate if rate < fps else None
+
+def workload_reclassify_interval(workload, workload_settings, step=None):
+    """
+    reclassify-interval of a workload's gvaclassify from the step, the workload_settings or
+    RECLASSIFY_INTERVAL. None for 1 (classify every frame), which is the element default.
+    """
+    settings = {str(k).lower(): v for k, v in (workload_settings or {}).items()}.get(workload.lower()) or {}
+    value = (step or {}).get("reclassify_interval", settings.get("reclassify_interval", RECLASSIFY_INTERVAL))
+    try:
+        interval = int(value)
+        if interval < 0 or isinstance(value, bool):
+            raise ValueError
+    except (TypeError, ValueError):
+        print(f"Warning: Invalid reclassify_interval value '{value}' for {workload}, classifying every frame", file=sys.stderr)
+        return None
+    return interval if interval != 1 else None
+
+def roi_crop_box(camera, rois):
+    """
+    Union of the ROIs clamped to the camera frame and aligned to even pixels (for
+    4:2:0 chroma), as {"x", "y", "x2", "y2", "width", "height"} with the full frame
+    size. None if the union covers the whole frame.
+    """
+    width = int(camera.get("width", 1920))
+    height = int(camera.get("height", 1080))
+    x = max(0, min(int(r.get("x", 0)) for r in rois)) // 2 * 2
+    y = max(0, min(int(r.get("y", 0)) for r in rois)) // 2 * 2
+    x2 = min(width, (max(int(r.get("x2", width)) for r in rois) + 1) // 2 * 2)
+    y2 = min(height, (max(int(r.get("y2", height)) for r in rois) + 1) // 2 * 2)
+    if x2 <= x or y2 <= y or (x, y, x2, y2) == (0, 0, width, height):
+        return None
+    return {"x": x, "y": y, "x2": x2, "y2": y2, "width": width, "height": height}
+
+def get_decode_chain(device):
+    env_vars = get_env_vars_for_device(device) if device else {}
+    DECODE = (env_vars.get("DECODE") or "decodebin").strip()
+    if not DECODE:
+        DECODE = "decodebin"
+    return parse_chain(DECODE)
+
+def steps_device(steps):
+    """Device of a workload's first step that has one (a leading motion_gate runs on the decoded frames)."""
+    return next((step["device"] for step in steps if step.get("device")), None)
+
+def build_dynamic_gstlaunch_command(camera, workloads, workload_map, graph, branch_idx=0, model_instance_map=None, detect_counter=None, classify_counter=None, inference_counter=None, name_idx_counter=None, timestamp=None, pipeline_instance=0, inference_stats=None, workload_settings=None):
+    """
+    Add the branches for one camera to the pipeline graph.
+    Returns the source elements that were added, one per distinct workload signature.
+    """
     if model_instance_map is None:
         model_instance_map = {}
     if detect_counter is None:
-        detect_counter = [0]  # Use list for mutability in nested scope
+        detect_counter = {}  # per-device counters: {device: count}
     if classify_counter is None:
-        classify_counter = [0]  # Use list for mutability in nested scope
+        classify_counter = {}  # per-device counters: {device: count}
     if inference_counter is None:
-        inference_counter = [0]  # Use list for mutability in nested scope
+        inference_counter = {}  # per-device counters: {device: count}
     if name_idx_counter is None:
         name_idx_counter = [0]  # Use list for mutability in nested scope
-    # For each workload, build its steps and signature
-    workload_steps = []
-    workload_signatures = []
-    video_files = []
     camera_id = camera.get("camera_id", f"cam{branch_idx+1}")
     stream_uri = derive_stream_uri(camera)
     source_name = derive_stream_name(camera, stream_uri)
     signature_to_steps = {}
     signature_to_source = {}
-    queue_params = "max-size-buffers=3 max-size-time=100000000 leaky=downstream"
+    signature_to_rate = {}
     for w in workloads:
         if w in workload_map:
+            # Workloads with an analysis_fps see a decimated stream; their detection cadence
+            # and scheduler load follow that rate instead of the camera fps, and without an
+            # explicit cadence every analyzed frame is detected
+            analysis_fps = workload_analysis_fps(camera, w, workload_settings)
+            analysis_camera = dict(camera, fps=analysis_fps) if analysis_fps else camera
             steps = []
+            tracked = False
             for step in workload_map[w]:
                 roi = camera.get("region_of_interest")
+                reclassify_interval = workload_reclassify_interval(w, workload_settings, step)
                 step = step.copy()
                 if roi:
                     step["region_of_interest"] = roi
+                if analysis_fps:
+                    step["analysis_fps"] = analysis_fps
+                if step.get("type") == "gvadetect":
+                    step["inference_interval"] = derive_inference_interval(
+                        analysis_camera, w, default=1 if analysis_fps else DEFAULT_INFERENCE_INTERVAL)
+                    # gvatrack follows every gvadetect and gives the object ids reclassification relies on
+                    tracked = True
+                step.pop("reclassify_interval", None)
+                if step.get("type") == "gvaclassify" and tracked and reclassify_interval is not None:
+                    step["reclassify_interval"] = reclassify_interval
                 # Add workload_name and camera_id to step for later use in gvadetect name
                 step["workload_name"] = w
                 step["camera_id"] = camera_id
                 steps.append(step)
-            # Normalize steps for signature (remove workload_name, camera_id)
-            norm_steps = []
-            for s in steps:
-                s_norm = s.copy()
-                s_norm.pop('workload_name', None)
-                s_norm.pop('camera_id', None)
-                norm_steps.append(s_norm)
             # Build a unique signature that includes model and precision for all steps
             # This ensures that if any step has a different model or precision, it will be a new stream
             model_prec_signature = json.dumps([
@@ -311,13 +677,27 @@ def build_dynamic_gstlaunch_command(camera, workloads, workload_map, branch_idx=
                     'type': s.get('type'),
                     'model': s.get('model'),
                     'precision': s.get('precision'),
-                    'device': s.get('device')
+                    'device': s.get('device'),
+                    **{k: s[k] for k in CLASSIFY_GATING_KEYS if k in s}
                 } for s in steps
-            ], sort_keys=True)
+            ] + ([{'analysis_fps': analysis_fps}] if analysis_fps else []), sort_keys=True)
             sig = model_prec_signature
             if sig not in signature_to_steps:
                 signature_to_steps[sig] = steps
-                if stream_uri:
+                signature_to_rate[sig] = analysis_fps
+                if SYNTHETIC_SOURCE == "pattern":
+                    signature_to_source[sig] = {
+                        "type": "pattern",
+                        "caps": raw_caps(*camera_format(camera)),
+                        "name": source_name,
+                    }
+                elif SYNTHETIC_SOURCE == "clip":
+                    signature_to_source[sig] = {
+                        "type": "file",
+                        "path": clip_path(*camera_format(camera)),
+                        "name": source_name,
+                    }
+                elif stream_uri:
                     signature_to_source[sig] = {
                         "type": "rtsp",
                         "uri": stream_uri,
@@ -333,113 +713,276 @@ def build_dynamic_gstlaunch_command(camera, workloads, workload_map, branch_idx=
                         "path": video_file,
                         "name": source_name,
                     }
-    pipelines = []
-    for idx, (sig, steps) in enumerate(signature_to_steps.items()):
-        source_info = signature_to_source[sig]
-        # Get DECODE for the first step's device, if present
-        first_device = steps[0].get("device")
-        
-        # Determine if vapostproc should be used based on device type
-        vapostproc_elem = "vapostproc !" if first_device and first_device.upper() in ["NPU", "GPU"] else ""
-        
-        first_env_vars = get_env_vars_for_device(first_device) if first_device else {}
-        DECODE = (first_env_vars.get("DECODE") or "decodebin").strip()
-        if not DECODE:
-            DECODE = "decodebin"
+    def add_source(first_device, crop=None):
+        source_info = next(iter(signature_to_source.values()))
         if source_info.get("type") == "rtsp":
             name_idx_counter[0] += 1
-            pipeline = (
-                f"rtspsrc name={source_info['name']}_{name_idx_counter[0]} location=\"{source_info['uri']}\" "
-                f"protocols=tcp latency={RTSP_DEFAULT_LATENCY} "
-                f"timeout=5000000 retry=3 drop-on-latency=true ! "
-                f"rtph264depay ! h264parse config-interval=-1 ! queue {queue_params} ! "
-                f"{DECODE} "
-            )
+            source = graph.add("rtspsrc", {
+                "name": f"{source_info['name']}_{name_idx_counter[0]}",
+                "location": source_info["uri"],
+                "protocols": "tcp",
+                "latency": parse_value(RTSP_DEFAULT_LATENCY),
+                "timeout": 5000000,
+                "retry": 3,
+                "drop-on-latency": True,
+            })
+            tail = graph.append(source, "rtph264depay")
+            tail = graph.append(tail, "h264parse", {"config-interval": -1})
+            tail = graph.append(tail, "queue", QUEUE_PROPS)
+        elif source_info.get("type") == "pattern":
+            source = graph.add("videotestsrc", {"name": source_info["name"], "is-live": True, "pattern": SYNTHETIC_PATTERN})
+            tail = graph.append(source, Element("capsfilter", {"caps": source_info["caps"]}))
         else:
-            pipeline = (
-                f"filesrc name={source_info['name']} location={source_info['path']} ! "
-                f"{DECODE} "
-            )
-        rois = []
-        seen_rois = set()
-        for step in steps:
-            roi = step.get("region_of_interest")
-            if roi:
-                roi_tuple = (roi.get('x', 0), roi.get('y', 0), roi.get('x2', 1), roi.get('y2', 1))
-                if roi_tuple not in seen_rois:
-                    seen_rois.add(roi_tuple)
-                    rois.append(roi)
-        if rois:
-            roi_strs = [f"roi={r['x']},{r['y']},{r['x2']},{r['y2']}" for r in rois]
-            gvaattachroi_elem = "gvaattachroi " + " ".join(roi_strs)
-            pipeline += f" ! {gvaattachroi_elem} ! queue {queue_params}"
-        # Only add gvaattachroi if region_of_interest is present (i.e., rois is not empty)
-        # Remove unconditional gvaattachroi for first inference step
-        inference_types = {"gvadetect", "gvaclassify", "gvainference"}
-        detect_count = 1
-        classify_count = 1
-        for i, step in enumerate(steps):
-            # Get env vars for each step's device, if present
-            step_env_vars = get_env_vars_for_device(step["device"]) if "device" in step else {}
-            if step["type"] == "gvadetect":
-                # Use round robin model instance sharing per device (configurable count)
-                step_device = step.get("device", "CPU").upper()
-                detect_counter.setdefault(step_device, 0)
-                model_instance_id = f"detect_shared_{step_device.lower()}{detect_counter[step_device] % ROUND_ROBIN_COUNT}"
-                detect_counter[step_device] += 1
-                name_idx_counter[0] += 1
-                step["name_idx"] = name_idx_counter[0]
-                elem, _ = build_gst_element(step)
-                elem = elem.replace("gvadetect", f"gvadetect model-instance-id={model_instance_id} threshold=0.5")
-                pipeline += f" ! {elem} ! gvatrack tracking-type=zero-term-imageless ! queue {queue_params}"
-                last_added_queue = True
-            elif step["type"] == "gvaclassify":
-                # Use round robin model instance sharing per device (configurable count)
-                step_device = step.get("device", "CPU").upper()
-                classify_counter.setdefault(step_device, 0)
-                model_instance_id = f"classify_shared_{step_device.lower()}{classify_counter[step_device] % ROUND_ROBIN_COUNT}"
-                classify_counter[step_device] += 1
-                elem, _ = build_gst_element(step)
-                elem = elem.replace("gvaclassify", f"gvaclassify model-instance-id={model_instance_id}")
-                pipeline += f" ! {elem} ! queue {queue_params}"
-                last_added_queue = True
-            elif step["type"] == "gvainference":
-                # Use round robin model instance sharing per device (configurable count)
-                step_device = step.get("device", "CPU").upper()
-                inference_counter.setdefault(step_device, 0)
-                model_instance_id = f"inference_shared_{step_device.lower()}{inference_counter[step_device] % ROUND_ROBIN_COUNT}"
-                inference_counter[step_device] += 1
-                elem, _ = build_gst_element(step)
-                elem = elem.replace("gvainference", f"gvainference model-instance-id={model_instance_id}")
-                pipeline += f" ! {elem} "    
-                last_added_queue = True
-            elif step["type"] == "gvapython":
-                elem, _ = build_gst_element(step)
-                pipeline += f" ! {elem} ! queue {queue_params}"
-                last_added_queue = False            
-            # Only add queue if not just added by gvadetect/gvatrack
-            if i < len(steps) - 1:
-                if not (step["type"] == "gvadetect"):
-                    pipeline += f" ! queue {queue_params}"
+            source = graph.add("filesrc", {"name": source_info["name"], "location": source_info["path"]})
+            tail = source
+        source.meta.update({"camera_id": camera_id, "pipeline_instance": pipeline_instance, "fps": camera.get("fps", 15)})
+        sources.append(source)
+        chain = get_decode_chain(first_device)
+        if source_info.get("type") == "pattern":
+            # Raw test frames only need the post-processing part of the decode chain
+            chain = [e for e in chain if not is_decoder(e.factory)]
+        if crop:
+            videocrop = Element("videocrop", {
+                "left": crop["x"],
+                "top": crop["y"],
+                "right": crop["width"] - crop["x2"],
+                "bottom": crop["height"] - crop["y2"],
+            })
+            # In VA memory the crop is applied by vapostproc (as crop meta); in system memory
+            # it follows the decoder directly
+            position = next((i for i, e in enumerate(chain) if e.factory == "vapostproc"), len(chain))
+            chain.insert(position, videocrop)
+        return graph.append_chain(tail, chain)
+
+    def describe(elem, step):
+        # Per-stream inputs for the model-instance scheduler
+        elem.meta.update({
+            "stream": f"{camera_id}/{step.get('workload_name', '')}" + (f"#{pipeline_instance}" if pipeline_instance else ""),
+            "fps": step.get("analysis_fps") or camera.get("fps", 15),
+            "width": camera.get("width", 1920),
+            "height": camera.get("height", 1080),
+            "region_of_interest": step.get("region_of_interest"),
+        })
+        return elem
+
+    def add_step(tail, step, has_next):
+        if step["type"] == "gvadetect":
+            # Round robin model instance sharing per device; reassigned by the cost scheduler by default
+            step_device = step.get("device", "CPU").upper()
+            detect_counter.setdefault(step_device, 0)
+            model_instance_id = f"detect_shared_{step_device.lower()}{detect_counter[step_device] % ROUND_ROBIN_COUNT}"
+            detect_counter[step_device] += 1
+            name_idx_counter[0] += 1
+            step["name_idx"] = name_idx_counter[0]
+            elem = describe(build_gst_element(step), step)
+            if "input_size" in elem.meta:
+                # Instances are shared only between elements loading the same input-size variant
+                model_instance_id += f"_{elem.meta['input_size']}"
+            elem.props.update({"model-instance-id": model_instance_id, "threshold": 0.5})
+            tail = graph.append(tail, elem)
+            tail = graph.append(tail, "gvatrack", {"tracking-type": "zero-term-imageless"})
+            tail = graph.append(tail, "queue", QUEUE_PROPS)
+        elif step["type"] == "gvaclassify":
+            # Round robin model instance sharing per device; reassigned by the cost scheduler by default
+            step_device = step.get("device", "CPU").upper()
+            classify_counter.setdefault(step_device, 0)
+            model_instance_id = f"classify_shared_{step_device.lower()}{classify_counter[step_device] % ROUND_ROBIN_COUNT}"
+            classify_counter[step_device] += 1
+            gate = region_gate(step)
+            if gate:
+                # Tiny, partial or uncertain boxes leave the branch before the classifier sees them
+                tail = graph.append(tail, "gvapython", {
+                    "module": REGION_GATE_MODULE,
+                    "class": "RegionGate",
+                    "function": "process_frame",
+                    "kwarg": json.dumps(gate, separators=(",", ":")),
+                })
+            elem = describe(build_gst_element(step), step)
+            elem.props["model-instance-id"] = model_instance_id
+            tail = graph.append(tail, elem)
+            tail = graph.append(tail, "queue", QUEUE_PROPS)
+        elif step["type"] == "gvainference":
+            # Round robin model instance sharing per device; reassigned by the cost scheduler by default
+            step_device = step.get("device", "CPU").upper()
+            inference_counter.setdefault(step_device, 0)
+            model_instance_id = f"inference_shared_{step_device.lower()}{inference_counter[step_device] % ROUND_ROBIN_COUNT}"
+            inference_counter[step_device] += 1
+            elem = describe(build_gst_element(step), step)
+            elem.props["model-instance-id"] = model_instance_id
+            tail = graph.append(tail, elem)
+        elif step["type"] == "gvapython":
+            tail = graph.append(tail, build_gst_element(step))
+            tail = graph.append(tail, "queue", QUEUE_PROPS)
+        elif step["type"] == "motion_gate":
+            tail = add_motion_gate(tail, step)
+        # Separate consecutive inference stages; duplicate queues are removed by the graph passes
+        if has_next and step["type"] != "gvadetect":
+            tail = graph.append(tail, "queue", QUEUE_PROPS)
+        return tail
+
+    def add_sinks(tail, idx, steps):
         name_idx_counter[0] += 1
         tee_name = f"t{branch_idx+1}_{idx+1}_{name_idx_counter[0]}"
         stream_id = f"stream{branch_idx+1}_{idx+1}_{name_idx_counter[0]}"
         has_gvapython = any(step.get("type") == "gvapython" for step in steps)
         if not has_gvapython:
-            pipeline += f" ! gvametaconvert ! tee name={tee_name} "
+            tail = graph.append(tail, "gvametaconvert")
+            crop = crop_state["box"]
+            if crop:
+                # Report coordinates in full-frame space as if the frame had not been cropped
+                tail = graph.append(tail, "gvapython", {
+                    "module": ROI_CROP_MODULE,
+                    "class": "RoiOffset",
+                    "function": "process_frame",
+                    "kwarg": json.dumps({k: crop[k] for k in ("x", "y", "width", "height")}, separators=(",", ":")),
+                })
+            tee = graph.append(tail, "tee", {"name": tee_name})
             results_dir = "/home/pipeline-server/results"
-            out_file = f"{results_dir}/rs-{branch_idx+1}_{idx+1}__{name_idx_counter[0]}_{timestamp}.jsonl"
-            pipeline += f"    {tee_name}. ! queue {queue_params} ! gvametapublish file-format=json-lines file-path={out_file} ! gvafpscounter name={stream_id} ! fakesink sync=false async=false "
+            out_name = f"{results_dir}/rs-{branch_idx+1}_{idx+1}__{name_idx_counter[0]}_{timestamp}"
+            branch = graph.append(tee, "queue", QUEUE_PROPS)
+            metadata_format = camera_setting(camera, "metadata_format", steps[0]["workload_name"]) or METADATA_FORMAT
+            if metadata_format == "binary":
+                branch = graph.append(branch, "gvapython", {
+                    "module": METADATA_SINK_MODULE,
+                    "class": "MetadataWriter",
+                    "function": "process_frame",
+                    "kwarg": json.dumps({"path": f"{out_name}.mpk"}, separators=(",", ":")),
+                })
+            else:
+                branch = graph.append(branch, "gvametapublish", {"file-format": "json-lines", "file-path": f"{out_name}.jsonl"})
         else:
-            pipeline += f" ! tee name={tee_name}  {tee_name}. ! queue {queue_params} ! gvafpscounter name={stream_id} ! fakesink sync=false async=false "
-            #pipeline += f"    {tee_name}. ! queue ! gvafpscounter ! fakesink sync=false async=false "
+            tee = graph.append(tail, "tee", {"name": tee_name})
+            branch = graph.append(tee, "queue", QUEUE_PROPS)
+        branch = graph.append(branch, "gvafpscounter", {"name": stream_id})
+        graph.append(branch, "fakesink", {"sync": False, "async": False})
         render_mode = os.environ.get("RENDER_MODE", "0")
+        if render_mode != "1" and not RENDER_BRANCH:
+            return
+        branch = graph.append(tee, "queue", QUEUE_PROPS)
+        max_rate = render_max_rate(camera)
+        if max_rate:
+            branch = graph.append(branch, "videorate", {"drop-only": True, "max-rate": max_rate})
+        first_device = steps_device(steps)
         if render_mode == "1":
-            pipeline += f"    {tee_name}. ! queue {queue_params} ! gvawatermark ! {vapostproc_elem} fpsdisplaysink video-sink=autovideosink text-overlay=true signal-fps-measurements=true"
+            branch = graph.append(branch, "gvawatermark")
+            # Determine if vapostproc should be used based on device type
+            if first_device and first_device.upper() in ["NPU", "GPU"]:
+                branch = graph.append(branch, "vapostproc")
+            graph.append(branch, "fpsdisplaysink", {"video-sink": "autovideosink", "text-overlay": True, "signal-fps-measurements": True})
         else:
-            pipeline += f"    {tee_name}. ! queue {queue_params} ! fpsdisplaysink video-sink=fakesink signal-fps-measurements=true"
-        pipelines.append(pipeline)
-    return pipelines
+            graph.append(branch, "fpsdisplaysink", {"video-sink": "fakesink", "signal-fps-measurements": True})
+
+    def add_step_tree(tail, node):
+        # A node with several children (or a workload ending here plus children) fans out through a tee
+        outputs = len(node["children"]) + len(node["ends"])
+        tee = graph.append(tail, "tee") if outputs > 1 else None
+        for child in node["children"].values():
+            branch = graph.append(tee, "queue", QUEUE_PROPS) if tee else tail
+            branch = add_step(branch, child["step"], bool(child["children"]))
+            add_step_tree(branch, child)
+        for idx in node["ends"]:
+            branch = graph.append(tee, "queue", QUEUE_PROPS) if tee else tail
+            add_sinks(branch, idx, step_lists[idx])
+
+    def add_motion_gate(tail, step):
+        # Named so the in-process launcher can count the frames the gate skips
+        name_idx_counter[0] += 1
+        name = sanitize_gst_name(f"motion_{camera_id}_{name_idx_counter[0]}")
+        rois = crop_state["rois"]
+        kwarg = {"name": name, **{k: step[k] for k in MOTION_GATE_OPTIONS if k in step}}
+        if len(rois) == 1:
+            kwarg["roi"] = {k: rois[0][k] for k in ("x", "y", "x2", "y2")}
+        elif rois:
+            kwarg["roi"] = {"x": min(r["x"] for r in rois), "y": min(r["y"] for r in rois),
+                            "x2": max(r["x2"] for r in rois), "y2": max(r["y2"] for r in rois)}
+        print(f"Motion gate for {camera_id}/{step.get('workload_name', '')}: {name}", file=sys.stderr)
+        tail = graph.append(tail, "gvapython", {
+            "name": name,
+            "module": MOTION_GATE_MODULE,
+            "class": "MotionGate",
+            "function": "process_frame",
+            "kwarg": json.dumps(kwarg, separators=(",", ":")),
+        })
+        return graph.append(tail, "queue", QUEUE_PROPS)
+
+    def add_analysis_rate(tail, rate):
+        # Named so the in-process launcher can count the source frames in front of it
+        name_idx_counter[0] += 1
+        print(f"Analysis rate for {camera_id}: {rate} of {camera.get('fps', 15)} fps", file=sys.stderr)
+        return graph.append(tail, "videorate", {
+            "name": sanitize_gst_name(f"analysis_{camera_id}_{name_idx_counter[0]}"),
+            "drop-only": True,
+            "max-rate": rate,
+        })
+
+    sources = []
+    step_lists = list(signature_to_steps.values())
+    step_rates = list(signature_to_rate.values())
+    # Workloads whose first step uses the same decode chain share one source; with
+    # SHARE_INFERENCE_PREFIX disabled every workload signature keeps its own source.
+    groups = {}
+    for idx, steps in enumerate(step_lists):
+        decode_key = json.dumps([e.signature() for e in get_decode_chain(steps_device(steps))])
+        groups.setdefault(decode_key if SHARE_INFERENCE_PREFIX else idx, []).append(idx)
+    crop_state = {"box": None, "rois": []}
+    for indices in groups.values():
+        first_device = steps_device(step_lists[indices[0]])
+        rois = []
+        seen_rois = set()
+        for idx in indices:
+            for step in step_lists[idx]:
+                roi = step.get("region_of_interest")
+                if roi:
+                    roi_tuple = (roi.get('x', 0), roi.get('y', 0), roi.get('x2', 1), roi.get('y2', 1))
+                    if roi_tuple not in seen_rois:
+                        seen_rois.add(roi_tuple)
+                        rois.append(roi)
+        crop = None
+        if rois and camera.get("roi_crop", ROI_CROP):
+            if any(step.get("type") == "gvapython" for idx in indices for step in step_lists[idx]):
+                # gvapython workloads read region coordinates themselves and publish no gvametaconvert output
+                print(f"Warning: ROI crop skipped for {camera_id}: gvapython workloads need full-frame coordinates", file=sys.stderr)
+            else:
+                crop = roi_crop_box(camera, rois)
+        if crop:
+            crop_pixels = (crop["x2"] - crop["x"]) * (crop["y2"] - crop["y"])
+            print(f"ROI crop for {camera_id}: {crop['x2'] - crop['x']}x{crop['y2'] - crop['y']} of "
+                  f"{crop['width']}x{crop['height']} ({100.0 * crop_pixels / (crop['width'] * crop['height']):.0f}% of pixels)", file=sys.stderr)
+            # Regions are attached in the coordinates of the cropped frame
+            crop_w, crop_h = crop["x2"] - crop["x"], crop["y2"] - crop["y"]
+            rois = [{
+                "x": max(0, r["x"] - crop["x"]), "y": max(0, r["y"] - crop["y"]),
+                "x2": min(crop_w, r["x2"] - crop["x"]), "y2": min(crop_h, r["y2"] - crop["y"]),
+            } for r in rois]
+        crop_state["box"] = crop
+        crop_state["rois"] = rois
+        # Workloads with an analysis_fps drop frames right after decode; the trunk runs at the
+        # highest rate a workload of the group needs and lower rates branch off after it
+        by_rate = {}
+        for idx in indices:
+            by_rate.setdefault(step_rates[idx], []).append(idx)
+        trunk_rate = None if None in by_rate else max(by_rate)
+        tail = add_source(first_device, crop)
+        if trunk_rate:
+            tail = add_analysis_rate(tail, trunk_rate)
+        # Only add gvaattachroi if region_of_interest is present (i.e., rois is not empty)
+        if rois:
+            roi_values = [f"{r['x']},{r['y']},{r['x2']},{r['y2']}" for r in rois]
+            tail = graph.append(tail, "gvaattachroi", {"roi": roi_values if len(roi_values) > 1 else roi_values[0]})
+            tail = graph.append(tail, "queue", QUEUE_PROPS)
+        rate_tee = graph.append(tail, "tee") if len(by_rate) > 1 else None
+        for rate, rate_indices in by_rate.items():
+            branch = graph.append(rate_tee, "queue", QUEUE_PROPS) if rate_tee else tail
+            if rate != trunk_rate:
+                branch = add_analysis_rate(branch, rate)
+            step_tree = build_step_tree(step_lists, rate_indices)
+            saved = count_inference_steps(step_lists, rate_indices) - count_inference_steps(step_tree)
+            if saved:
+                print(f"Shared inference prefix for {camera_id}: {saved} inference(s) saved per frame", file=sys.stderr)
+            if inference_stats is not None:
+                inference_stats["saved"] = inference_stats.get("saved", 0) + saved
+            add_step_tree(branch, step_tree)
+    return sources
 
 def format_pipeline_multiline(pipeline):
     # Split pipeline into elements
@@ -463,22 +1006,118 @@ def format_pipeline_branch(pipeline):
     # Wrap in parentheses for GStreamer parallel branches
     return f'({pipeline})'
 
-def main(num_of_pipelines=1):
-    # Ensure results directory exists at project root before running pipeline
-    results_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "results"))
-    os.makedirs(results_dir, exist_ok=True)
-    
-    # Generate timestamp for all files
-    timestamp = os.environ.get("TIMESTAMP")
-  
+def compute_pipeline_cache_key(num_of_pipelines):
+    """
+    Hash the real inputs of the generator: both config JSONs, the device env files,
+    the environment variables that shape the pipeline, the pipeline count and the
+    generator sources themselves. Missing files hash as empty so they still take part in the key.
+    """
+    digest = hashlib.sha256()
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    input_files = [CONFIG_CAMERA_TO_WORKLOAD, CONFIG_WORKLOAD_TO_PIPELINE]
+    input_files += [DEVICE_ENV_FILES[device] for device in sorted(DEVICE_ENV_FILES)]
+    if PIPELINE_SHARD_PLAN:
+        input_files.append(PIPELINE_SHARD_PLAN)
+    if ADAPTIVE_ROI_FILE:
+        input_files.append(ADAPTIVE_ROI_FILE)
+    if QUEUE_PROFILE_FILE:
+        input_files.append(QUEUE_PROFILE_FILE)
+    # The generator and its helper modules
+    input_files += sorted(str(p) for p in Path(script_dir).glob("*.py"))
+    # Exported input-size variants change which model a detector loads
+    input_files += sorted(str(p) for p in Path(MODELSERVER_MODELS_DIR).glob(f"object_detection/*/{MODEL_VARIANTS_MANIFEST}"))
+    for path in input_files:
+        digest.update(path.encode())
+        try:
+            with open(path, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        except OSError:
+            digest.update(b"<missing>")
+    for key in PIPELINE_CACHE_ENV_KEYS:
+        digest.update(f"{key}={os.environ.get(key, '')}".encode())
+    if SHARDING_ENABLED:
+        # An automatic shard plan depends on the CPUs and NUMA nodes of the host
+        digest.update(topology_signature().encode())
+    digest.update(f"num_of_pipelines={num_of_pipelines}".encode())
+    return digest.hexdigest()
+
+def load_cached_pipeline(cache_key, suffix=".sh"):
+    cache_file = os.path.join(PIPELINE_CACHE_DIR, f"{cache_key}{suffix}")
+    try:
+        with open(cache_file, "r") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def store_cached_pipeline(cache_key, content, suffix=".sh"):
+    cache_file = os.path.join(PIPELINE_CACHE_DIR, f"{cache_key}{suffix}")
+    try:
+        os.makedirs(PIPELINE_CACHE_DIR, exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            f.write(content)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        print(f"Warning: Could not write pipeline cache {cache_file}: {e}", file=sys.stderr)
+
+def load_adaptive_rois():
+    """{camera_id: region_of_interest} from ADAPTIVE_ROI_FILE, empty when unset or unreadable."""
+    if not ADAPTIVE_ROI_FILE:
+        return {}
+    try:
+        with open(ADAPTIVE_ROI_FILE) as f:
+            learned = json.load(f)
+        return {camera_id: entry["region_of_interest"] for camera_id, entry in learned.items()}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        print(f"Warning: Could not load adaptive ROIs from {ADAPTIVE_ROI_FILE}: {e}, using the configured ROIs", file=sys.stderr)
+        return {}
+
+def apply_adaptive_roi(cam, learned):
+    """Camera config with its learned ROI in place of the configured one."""
+    roi = learned.get(cam.get("camera_id"))
+    if not roi or cam.get("adaptive_roi") is False:
+        return cam
+    width, height = int(cam.get("width", 1920)), int(cam.get("height", 1080))
+    try:
+        roi = {k: int(roi[k]) for k in ("x", "y", "x2", "y2")}
+    except (KeyError, TypeError, ValueError):
+        print(f"Warning: Invalid adaptive ROI for {cam.get('camera_id')}, using the configured ROI", file=sys.stderr)
+        return cam
+    if not (0 <= roi["x"] < roi["x2"] <= width and 0 <= roi["y"] < roi["y2"] <= height):
+        print(f"Warning: Adaptive ROI for {cam.get('camera_id')} is outside the {width}x{height} frame, using the configured ROI", file=sys.stderr)
+        return cam
+    old = cam.get("region_of_interest")
+    old_pixels = (old["x2"] - old["x"]) * (old["y2"] - old["y"]) if old else width * height
+    pixels = (roi["x2"] - roi["x"]) * (roi["y2"] - roi["y"])
+    print(f"Adaptive ROI for {cam.get('camera_id')}: {roi['x2'] - roi['x']}x{roi['y2'] - roi['y']} "
+          f"({100.0 * pixels / old_pixels:.0f}% of the configured ROI pixels)", file=sys.stderr)
+    return dict(cam, region_of_interest=roi)
+
+def load_queue_profile():
+    """{stage key: latency_ms} from QUEUE_PROFILE_FILE, empty when unset or unreadable."""
+    if not QUEUE_PROFILE_FILE:
+        return {}
+    try:
+        with open(QUEUE_PROFILE_FILE) as f:
+            stages = json.load(f)["stages"]
+        return {key: float(stage["latency_ms"]) for key, stage in stages.items()}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        print(f"Warning: Could not load queue profile from {QUEUE_PROFILE_FILE}: {e}, using the default queue sizes", file=sys.stderr)
+        return {}
+
+def build_pipeline_graph(num_of_pipelines, timestamp):
+    """Build the unoptimized pipeline graph for all cameras and pipeline copies."""
     camera_config = load_json(CONFIG_CAMERA_TO_WORKLOAD)
-    workload_map = load_json(CONFIG_WORKLOAD_TO_PIPELINE)["workload_pipeline_map"]
-    pipelines = []
+    workload_config = load_json(CONFIG_WORKLOAD_TO_PIPELINE)
+    workload_map = workload_config["workload_pipeline_map"]
+    workload_settings = workload_config.get("workload_settings", {})
+    graph = PipelineGraph()
     model_instance_map = {}
     detect_counter = {}  # per-device counters: {device: count}
     classify_counter = {}  # per-device counters: {device: count}
     inference_counter = {}  # per-device counters: {device: count}
     name_idx_counter = [0]
+    inference_stats = {"saved": 0}
     
     # Filter out cameras with lp_vlm workload and validate streams
     cameras = camera_config["lane_config"]["cameras"]
@@ -500,20 +1139,304 @@ def main(num_of_pipelines=1):
         
         filtered_cameras.append(cam)
     
+    learned_rois = load_adaptive_rois()
+    if learned_rois:
+        adapted = [apply_adaptive_roi(cam, learned_rois) for cam in filtered_cameras]
+        # Noted in the script, so roi_learner.py can tell which runs did not use the configured ROI
+        graph.meta["adaptive_rois"] = {cam.get("camera_id"): new["region_of_interest"]
+                                       for cam, new in zip(filtered_cameras, adapted) if new is not cam}
+        filtered_cameras = adapted
+
     # Process only filtered cameras
     for pipeline_instance in range(num_of_pipelines):
         for idx, cam in enumerate(filtered_cameras):
             workloads = [w.lower() for w in cam["workloads"]]
             norm_workload_map = {k.lower(): v for k, v in workload_map.items()}
-            cam_pipelines = build_dynamic_gstlaunch_command(cam, workloads, norm_workload_map, branch_idx=idx, model_instance_map=model_instance_map, detect_counter=detect_counter, classify_counter=classify_counter, inference_counter=inference_counter, name_idx_counter=name_idx_counter, timestamp=timestamp)
-            pipelines.extend([p.strip() for p in cam_pipelines])
-    # Print gst-launch-1.0 --verbose and all pipelines, each filesrc on a new line, with a backslash at the end except the last
+            build_dynamic_gstlaunch_command(cam, workloads, norm_workload_map, graph, branch_idx=idx, model_instance_map=model_instance_map, detect_counter=detect_counter, classify_counter=classify_counter, inference_counter=inference_counter, name_idx_counter=name_idx_counter, timestamp=timestamp, pipeline_instance=pipeline_instance, inference_stats=inference_stats, workload_settings=workload_settings)
+    graph.meta["inferences_saved_per_frame"] = inference_stats["saved"]
+    graph.meta["classify_calls_per_second"] = classify_call_rates(graph)
+    return graph
+
+def classify_call_rates(graph):
+    """Estimated gvaclassify calls per second without and with tracking-aware reclassification."""
+    elements = graph.find("gvaclassify")
+    every_frame = sum(inference_rate(elem, reclassify=False) for elem in elements)
+    reclassified = sum(inference_rate(elem) for elem in elements)
+    return {"every_frame": round(every_frame, 1), "reclassified": round(reclassified, 1)}
+
+def shard_units(graph):
+    """
+    Group the graph sources into the units that have to run in one process: the
+    sources of a camera in one pipeline copy, or with SHARE_SOURCES every source that
+    the source-sharing pass may merge.
+    """
+    units = {}
+    for source in graph.sources():
+        instance = source.meta.get("pipeline_instance")
+        key = (instance, source.signature()) if SHARE_SOURCES else (instance, source.meta.get("camera_id"))
+        units.setdefault(key, []).append(source)
+    return list(units.values())
+
+def unit_load(graph, sources):
+    return sum(estimate_load(e) for e in graph.reachable(sources).values() if e.factory in SCHEDULED_ELEMENTS)
+
+def build_shard_graphs(graph):
+    """Split the graph into one subgraph per shard. Returns [(shard, subgraph, load)]."""
+    if not SHARDING_ENABLED:
+        return [(None, graph, None)]
+    try:
+        shards = plan_shards(PIPELINE_SHARDS, PIPELINE_SHARD_PLAN)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not load shard plan: {e}, running a single gst-launch process", file=sys.stderr)
+        return [(None, graph, None)]
+    units = shard_units(graph)
+    unit_lists, loads = assign_units([(unit, unit_load(graph, unit)) for unit in units], shards)
+    parts = []
+    for shard, shard_units_, load in zip(shards, unit_lists, loads):
+        if not shard_units_:
+            print(f"Warning: Shard {shard['index']} (cpus {shard['cpus']}) has no cameras, skipping it", file=sys.stderr)
+            continue
+        parts.append((shard, graph.subgraph([source for unit in shard_units_ for source in unit]), load))
+    return parts
+
+def stream_fps(element):
+    """Frame rate reaching an element: the nearest analysis rate, inference stream or source upstream of it."""
+    while element is not None:
+        if element.factory == "videorate" and str(element.name or "").startswith("analysis_"):
+            return float(element.props["max-rate"])
+        if element.meta.get("fps"):
+            return float(element.meta["fps"])
+        element = element.parents[0] if element.parents else None
+    return 15.0
+
+def request_rate(element):
+    """Inference requests per second of an element at the rate that reaches it (after analysis_fps)."""
+    return inference_rate(element) * stream_fps(element) / float(element.meta.get("fps") or 15)
+
+def size_queues(graph, profile):
+    """
+    Size every queue in front of a profiled stage from the stage latency (queue_limits).
+    An inference stage keeps up when its model instance serves the requests of all the
+    streams sharing it; its capacity is nireq * batch-size. Queues that block instead of
+    leaking drop their time and byte limits, so only the buffer count bounds them.
+    Returns (queues sized, of which leaky).
+    """
+    instance_rates = {}
+    for element in graph.nodes.values():
+        instance = element.props.get("model-instance-id") if element.factory in SCHEDULED_ELEMENTS else None
+        if instance:
+            instance_rates[instance] = instance_rates.get(instance, 0.0) + request_rate(element)
+    sized = leaky_queues = 0
+    for queue in graph.find("queue"):
+        if len(queue.children) != 1:
+            continue
+        stage = queue.children[0]
+        latency_ms = profile.get(stage_key(stage.factory, stage.props))
+        if latency_ms is None:
+            continue
+        try:
+            parallel = max(1, int(stage.props.get("nireq", 1)))
+            batch = max(1, int(stage.props.get("batch-size", 1)))
+        except (TypeError, ValueError):
+            parallel = batch = 1
+        load_fps = None
+        if stage.factory in SCHEDULED_ELEMENTS:
+            load_fps = instance_rates.get(stage.props.get("model-instance-id")) or request_rate(stage)
+        buffers, leaky = queue_limits(latency_ms, stream_fps(queue), parallel * batch, batch, QUEUE_HEADROOM, load_fps)
+        queue.props = {"max-size-buffers": buffers, "max-size-bytes": 0, "max-size-time": 0}
+        if leaky:
+            queue.props["leaky"] = "downstream"
+            leaky_queues += 1
+        sized += 1
+    return sized, leaky_queues
+
+def stream_rate_comments(graph):
+    """
+    "# stream <name> stages=<stage>[:<ratio>],..." for every stream behind an analysis_*
+    videorate or a motion gate, nearest stage first; a videorate carries its nominal frames
+    in per frame out. Both launch modes scale the stream fps back to the source rate with
+    them (pipeline_script.source_equivalent_fps).
+    """
+    lines = []
+    for counter in graph.find("gvafpscounter"):
+        stages = []
+        element = counter
+        while element.parents:
+            element = element.parents[0]
+            name = str(element.name or "")
+            if element.factory == "videorate" and name.startswith("analysis_"):
+                stages.append([name, float(element.props["max-rate"])])
+            elif element.factory == "gvapython" and name.startswith("motion_"):
+                stages.append([name, None])
+        if not stages:
+            continue
+        # Nominal rate after each videorate, from the source down
+        rate = float(element.meta.get("fps") or 15)
+        for stage in reversed(stages):
+            if stage[1] is not None:
+                max_rate = stage[1]
+                stage[1] = max(1.0, rate / max_rate)
+                rate = min(rate, max_rate)
+        items = [name if ratio is None else f"{name}:{round(ratio, 4):g}" for name, ratio in stages]
+        lines.append(f"# stream {counter.name} stages={','.join(items)}")
+    return lines
+
+def adaptive_roi_comments(graph):
+    """"# adaptive_roi <camera_id> x,y,x2,y2" for every camera that runs with a learned ROI."""
+    return [f"# adaptive_roi {camera_id} {roi['x']},{roi['y']},{roi['x2']},{roi['y2']}"
+            for camera_id, roi in graph.meta.get("adaptive_rois", {}).items()]
+
+def render_gst_command(graph, shard=None, queue_profile=None):
+    """Schedule model instances, optimize and render one gst-launch command. Returns (command, plan)."""
+    label = f"Shard {shard['index']}: " if shard else ""
+    if MODEL_INSTANCE_SCHEDULER == "cost":
+        instances = schedule_model_instances(graph, ROUND_ROBIN_COUNT)
+        print(f"{label}Model instance schedule:\n" + format_schedule(instances), file=sys.stderr)
+        graph.meta["model_instances"] = [
+            {k: v for k, v in inst.items() if k != "elements"} for inst in instances
+        ]
+    elif any(e.meta.get("auto_batch") for e in graph.nodes.values()):
+        print("Warning: BATCH_SIZE_*=auto needs MODEL_INSTANCE_SCHEDULER=cost, using batch-size=1", file=sys.stderr)
+
+    passes = DEFAULT_PASSES
+    if SHARE_SOURCES:
+        # Sharing stays within one pipeline copy so PIPELINE_COUNT still scales the decoded streams
+        def share_sources_per_instance(g):
+            return share_sources(g, QUEUE_PROPS, group_key=lambda src: src.meta.get("pipeline_instance"))
+        passes = (share_sources_per_instance,) + tuple(DEFAULT_PASSES)
+    source_count = len(graph.sources())
+    pass_stats = optimize(graph, passes)
+    if SHARE_SOURCES:
+        print(f"{label}Source sharing: {source_count} source chains decoded as {len(graph.sources())}", file=sys.stderr)
+    print(f"{label}Pipeline graph passes: " + ", ".join(f"{name}={count}" for name, count in pass_stats.items()), file=sys.stderr)
+    if queue_profile:
+        sized, leaky = size_queues(graph, queue_profile)
+        print(f"{label}Queue sizing: {sized} of {len(graph.find('queue'))} queues sized from {QUEUE_PROFILE_FILE}, "
+              f"{leaky} of them leaky", file=sys.stderr)
+    pipelines = graph.render_branches()
+
+    # gst-launch-1.0 --verbose and all pipelines, each source on a new line, with a backslash at the end except the last
     gst_debug = os.getenv('GST_DEBUG', 'GST_TRACER:7,gvafpscounter:4')
     gst_tracers = os.getenv('GST_TRACERS', 'latency_tracer(flags=pipeline)')
-    print(f"GST_DEBUG={gst_debug} GST_TRACERS=\"{gst_tracers}\" gst-launch-1.0 --verbose \\")
+    lines = []
+    launcher = "gst-launch-1.0"
+    if shard:
+        streams = len(graph.find("gvafpscounter"))
+        numa_node = shard["numa_node"] if shard["numa_node"] is not None else "-"
+        lines.append(f"# shard {shard['index']} cpus={shard['cpus']} numa_node={numa_node} streams={streams}")
+        launcher = f"{launch_prefix(shard)} gst-launch-1.0"
+    lines += adaptive_roi_comments(graph)
+    lines += stream_rate_comments(graph)
+    lines.append(f"GST_DEBUG={gst_debug} GST_TRACERS=\"{gst_tracers}\" {launcher} --verbose \\")
     for idx, p in enumerate(pipelines):
         end = " \\" if idx < len(pipelines) - 1 else ""
-        print(f"  {p}{end}")
+        lines.append(f"  {p}{end}")
+
+    plan = graph.to_dict()
+    plan["optimizations"] = pass_stats
+    return "\n".join(lines), plan
+
+def generate_gst_command(num_of_pipelines, timestamp):
+    """Build the pipeline graph for all cameras, split it into shards, optimize and render the gst-launch command(s)."""
+    graph = build_pipeline_graph(num_of_pipelines, timestamp)
+    print(f"Shared inference prefix: {graph.meta['inferences_saved_per_frame']} inference(s) saved per frame", file=sys.stderr)
+    calls = graph.meta["classify_calls_per_second"]
+    if calls["reclassified"] != calls["every_frame"]:
+        print(f"Classify calls/s (estimated, {OBJECTS_PER_FRAME:g} object(s) per frame): {calls['every_frame']:g} "
+              f"classifying every frame, {calls['reclassified']:g} with reclassify-interval", file=sys.stderr)
+    queue_profile = load_queue_profile()
+    parts = build_shard_graphs(graph)
+    if parts[0][0] is None:
+        gst_cmd, plan = render_gst_command(graph, queue_profile=queue_profile)
+        plan["num_of_pipelines"] = num_of_pipelines
+        return gst_cmd, json.dumps(plan, indent=2)
+
+    commands = []
+    plan = {"meta": graph.meta, "num_of_pipelines": num_of_pipelines, "shards": []}
+    for shard, subgraph, load in parts:
+        gst_cmd, shard_plan = render_gst_command(subgraph, shard, queue_profile)
+        commands.append(gst_cmd)
+        print(f"Shard {shard['index']}: cpus={shard['cpus']} streams={len(subgraph.find('gvafpscounter'))} "
+              f"load={load:.2f} inf/s", file=sys.stderr)
+        plan["shards"].append(dict(shard, load=load, **shard_plan))
+    return "\n".join(commands), json.dumps(plan, indent=2)
+
+def warn_missing_rtsp_streams():
+    """Probe every camera's RTSP stream concurrently and warn about the ones the server does not have."""
+    try:
+        cameras = load_json(CONFIG_CAMERA_TO_WORKLOAD)["lane_config"]["cameras"]
+    except (OSError, KeyError, ValueError):
+        return
+    uris = [uri for uri in (derive_stream_uri(cam) for cam in cameras) if uri and uri.startswith("rtsp://")]
+    if not uris:
+        return
+    start = time.perf_counter()
+    results = probe_rtsp_streams(uris)
+    for uri, entry in results.items():
+        if not entry["available"]:
+            print(f"Warning: RTSP stream not available: {uri} ({entry['detail']})", file=sys.stderr)
+    counts = {}
+    for entry in results.values():
+        counts[entry["result"]] = counts.get(entry["result"], 0) + 1
+    print(f"RTSP probe: {len(results)} streams ({', '.join(f'{k}={v}' for k, v in sorted(counts.items()))}) "
+          f"in {(time.perf_counter() - start) * 1000:.0f}ms", file=sys.stderr)
+
+def prepare_synthetic_sources():
+    """Report the synthetic source mode and create the clips it needs (cached commands assume they exist)."""
+    try:
+        cameras = load_json(CONFIG_CAMERA_TO_WORKLOAD)["lane_config"]["cameras"]
+    except (OSError, KeyError, ValueError):
+        return
+    formats = sorted({camera_format(cam) for cam in cameras})
+    print(f"Synthetic sources ({SYNTHETIC_SOURCE}): {', '.join(f'{w}x{h}@{fps}' for w, h, fps in formats)}", file=sys.stderr)
+    if SYNTHETIC_SOURCE != "clip":
+        return
+    for fmt in formats:
+        try:
+            ensure_clip(*fmt)
+        except RuntimeError as e:
+            print(f"Warning: Synthetic clip not available: {e}", file=sys.stderr)
+
+def write_graph_json(path, graph_json):
+    try:
+        with open(path, "w") as f:
+            f.write(graph_json)
+        print(f"Pipeline graph written to {path}", file=sys.stderr)
+    except OSError as e:
+        print(f"Warning: Could not write pipeline graph {path}: {e}", file=sys.stderr)
+
+def main(num_of_pipelines=1):
+    # Ensure results directory exists at project root before running pipeline
+    results_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "results"))
+    os.makedirs(results_dir, exist_ok=True)
+    
+    # Generate timestamp for all files
+    timestamp = os.environ.get("TIMESTAMP")
+    if SYNTHETIC_SOURCE:
+        prepare_synthetic_sources()
+    start = time.perf_counter()
+
+    cache_key = compute_pipeline_cache_key(num_of_pipelines) if PIPELINE_CACHE_ENABLED else None
+    gst_cmd = load_cached_pipeline(cache_key) if cache_key else None
+    graph_json = load_cached_pipeline(cache_key, ".graph.json") if cache_key else None
+    if gst_cmd is not None and graph_json is not None:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"Pipeline cache hit: key={cache_key[:16]} time={elapsed_ms:.1f}ms", file=sys.stderr)
+    else:
+        # Only a fresh generation probes the cameras: a restart that hits the cache does not
+        # wait out the probe timeout of a camera that is down
+        if RTSP_PROBE_ENABLED and not SYNTHETIC_SOURCE:
+            warn_missing_rtsp_streams()
+        # Generate with a placeholder timestamp so the cached command is reusable across runs
+        gst_cmd, graph_json = generate_gst_command(num_of_pipelines, TIMESTAMP_PLACEHOLDER)
+        if cache_key:
+            store_cached_pipeline(cache_key, gst_cmd)
+            store_cached_pipeline(cache_key, graph_json, ".graph.json")
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            print(f"Pipeline cache miss: key={cache_key[:16]} time={elapsed_ms:.1f}ms", file=sys.stderr)
+    if PIPELINE_GRAPH_JSON:
+        write_graph_json(PIPELINE_GRAPH_JSON, graph_json.replace(TIMESTAMP_PLACEHOLDER, str(timestamp)))
+    print(gst_cmd.replace(TIMESTAMP_PLACEHOLDER, str(timestamp)))
 
 if __name__ == "__main__":
     # Parse command line argument for number of pipelines
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+In-process launcher for generated pipeline scripts.
+
+Instead of running the script through bash and scraping gst-launch's
+FpsCounter lines from a log, the launcher builds the same pipeline with
+Gst.parse_launchv, counts buffers with a pad probe on every gvafpscounter
+sink pad and appends each stream's FPS to its own pipeline_stream<i> log.
+Streams are the gvafpscounter elements in the order they appear in the
+script, so the logs line up with the stream names run-pipeline.sh extracts.
+
+Because it holds the elements, the launcher also reports per interval what
+gst-launch cannot show (frames around analysis_* videorates and motion gates,
+queue overruns) and hosts the runtime controllers that change element
+properties: budget_scheduler.py (INFERENCE_BUDGET) and slo_controller.py
+(target_fps, FPS_SLO).
+
+Usage: gst_launcher.py SCRIPT [--results-dir DIR] [--cid CID] [--first-stream N]
+"""
+
+import argparse
+import os
+import shutil
+import signal
+import sys
+import time
+
+from budget_scheduler import INFERENCE_BUDGET, BudgetScheduler, Lane
+from pipeline_script import read_pipeline_script, source_equivalent_fps, stream_names, stream_stages
+from shard_plan import parse_cpulist
+from slo_controller import Knob, RenderSwitch, SloController, StreamSlo, stream_targets
+
+# Set once the launcher has re-executed itself under numactl
+PINNED_ENV = "GST_LAUNCHER_PINNED"
+
+
+def element_props(args, factory):
+    """(name, props) of the factory's named elements in pipeline order."""
+    elements = []
+    current = None
+    for arg in args:
+        if arg == "!":
+            current = None
+        elif arg == factory:
+            current = {}
+            elements.append(current)
+        elif current is not None and "=" in arg:
+            key, value = arg.split("=", 1)
+            current[key] = value
+    return [(props["name"], props) for props in elements if "name" in props]
+
+
+def factory_name(element):
+    factory = element.get_factory()
+    return factory.get_name() if factory else ""
+
+
+def upstream_elements(element):
+    """Elements linked upstream of an element, nearest first, up to the first unlinked (dynamic) pad."""
+    chain = []
+    pad = element.get_static_pad("sink")
+    while pad is not None and pad.get_peer() is not None:
+        element = pad.get_peer().get_parent_element()
+        chain.append(element)
+        pad = element.get_static_pad("sink")
+    return chain
+
+
+def render_pad(tee):
+    """Tee src pad whose branch ends in an fpsdisplaysink without another tee on the way, or None."""
+    result = []
+
+    def check(pad):
+        peer = pad.get_peer()
+        element = peer.get_parent_element() if peer else None
+        while element is not None:
+            if factory_name(element) == "fpsdisplaysink":
+                result.append(pad)
+                return
+            src = element.get_static_pad("src")
+            peer = src.get_peer() if src else None
+            element = peer.get_parent_element() if peer else None
+
+    tee.iterate_src_pads().foreach(check)
+    return result[0] if result else None
+
+
+def apply_prefix(prefix):
+    """
+    Honour the shard's launch prefix: pin this process to the taskset CPUs, or
+    re-execute the launcher under numactl so the memory binding applies too.
+    """
+    if not prefix:
+        return
+    if prefix[0] == "numactl":
+        if os.environ.get(PINNED_ENV) != "1" and shutil.which("numactl"):
+            os.environ[PINNED_ENV] = "1"
+            os.execvp("numactl", prefix + [sys.executable] + sys.argv)
+        return
+    if prefix[0] == "taskset" and len(prefix) >= 3 and prefix[1] == "-c":
+        try:
+            os.sched_setaffinity(0, parse_cpulist(prefix[2]))
+        except (AttributeError, OSError, ValueError) as e:
+            print(f"Warning: Could not pin launcher to CPUs {prefix[2]}: {e}", file=sys.stderr)
+        return
+    print(f"Warning: Ignoring unknown launch prefix: {' '.join(prefix)}", file=sys.stderr)
+
+
+class StreamMeter:
+    """Counts the buffers reaching one gvafpscounter and appends the FPS of every interval to its log."""
+
+    def __init__(self, name, log_path, probe_return):
+        self.name = name
+        self.log_path = log_path
+        self.frames = 0
+        self.reported = 0
+        self.started = None
+        self.probe_return = probe_return
+
+    def probe(self, pad, info):
+        if self.started is None:
+            self.started = time.monotonic()
+        self.frames += 1
+        return self.probe_return
+
+    def sample(self, elapsed):
+        frames = self.frames - self.reported
+        self.reported = self.frames
+        if self.started is None:
+            return None
+        return frames / elapsed if elapsed > 0 else 0.0
+
+    def record(self, fps):
+        if self.log_path:
+            with open(self.log_path, "a") as f:
+                f.write(f"{fps:.2f}\n")
+
+    def average(self, now):
+        if self.started is None or now <= self.started:
+            return 0.0
+        return self.frames / (now - self.started)
+
+
+class RateStage:
+    """Frames entering and leaving an element that drops frames on purpose (analysis videorate, motion gate)."""
+
+    def __init__(self, name, probe_return):
+        self.name = name
+        self.received = StreamMeter(name, None, probe_return)
+        self.passed = StreamMeter(name, None, probe_return)
+        self.interval = (0, 0)
+
+    def sample(self):
+        """(frames in, frames out) since the last sample."""
+        self.interval = (self.received.frames - self.received.reported, self.passed.frames - self.passed.reported)
+        self.received.reported, self.passed.reported = self.received.frames, self.passed.frames
+        return self.interval
+
+
+class QueueWatch:
+    """Overruns of one queue: a dropped buffer for a leaky queue, a stall of its upstream otherwise."""
+
+    def __init__(self, name, stage, leaky):
+        self.name = name
+        self.stage = stage
+        self.leaky = leaky
+        self.overruns = 0
+        self.reported = 0
+
+    def on_overrun(self, queue):
+        self.overruns += 1
+
+    def sample(self):
+        overruns = self.overruns - self.reported
+        self.reported = self.overruns
+        return overruns
+
+
+def run(args):
+    env, prefix, launch_args = read_pipeline_script(args.script)
+    apply_prefix(prefix)
+    # Tracer and debug settings must be in place before Gst.init; like in the shell the
+    # assignments on the command line win over the inherited environment
+    os.environ.update(env)
+    # Motion gates print their counters for the gst-launch log collector; the launcher meters them itself
+    os.environ["MOTION_GATE_REPORT_INTERVAL"] = "0"
+
+    import gi
+    gi.require_version("Gst", "1.0")
+    from gi.repository import GLib, Gst
+
+    Gst.init(None)
+    try:
+        pipeline = Gst.parse_launchv(launch_args)
+    except GLib.Error as e:
+        print(f"ERROR: Could not construct pipeline from {args.script}: {e.message}", file=sys.stderr)
+        return 1
+
+    meters = []
+    for idx, name in enumerate(stream_names(launch_args)):
+        element = pipeline.get_by_name(name)
+        if element is None:
+            print(f"Warning: gvafpscounter {name} not found in the pipeline", file=sys.stderr)
+            continue
+        log_path = None
+        if args.results_dir:
+            log_path = os.path.join(args.results_dir, f"pipeline_stream{args.first_stream + idx}_{args.cid}.log")
+        meter = StreamMeter(name, log_path, Gst.PadProbeReturn.OK)
+        element.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, meter.probe)
+        meters.append(meter)
+    # Frames entering and leaving the analysis_fps decimation and every motion gate
+    rate_stages = {}
+    for factory, prefix in (("videorate", "analysis_"), ("gvapython", "motion_")):
+        for name in stream_names(launch_args, factory, prefix):
+            element = pipeline.get_by_name(name)
+            if element is None:
+                continue
+            stage = RateStage(name, Gst.PadProbeReturn.OK)
+            element.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, stage.received.probe)
+            element.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, stage.passed.probe)
+            rate_stages[name] = stage
+    # Rate stages in front of each stream, nearest first, as the generator noted them
+    stages_of = stream_stages(args.script)
+
+    def stage_counts(name, elapsed):
+        """(frames_in, frames_out, seconds) of the stages of a stream: nominal videorates, measured gates."""
+        counts = []
+        for stage, ratio in stages_of.get(name, []):
+            if ratio is not None:
+                counts.append((ratio, 1, elapsed))
+            elif stage in rate_stages:
+                counts.append(rate_stages[stage].interval + (elapsed,))
+        return counts
+    # Overruns of every queue, named after the stage it feeds
+    queue_watches = []
+
+    def watch_queue(element):
+        factory = element.get_factory()
+        if factory is None or factory.get_name() != "queue":
+            return
+        peer = element.get_static_pad("src").get_peer()
+        stage = peer.get_parent_element().get_name() if peer else "-"
+        watch = QueueWatch(element.get_name(), stage, int(element.get_property("leaky")) != 0)
+        element.connect("overrun", watch.on_overrun)
+        queue_watches.append(watch)
+
+    pipeline.iterate_elements().foreach(watch_queue)
+    # Detection rate of every lane re-planned within the global inference budget
+    scheduler = None
+    if INFERENCE_BUDGET:
+        gi.require_version("GstVideo", "1.0")
+        from gi.repository import GstVideo
+        roi_api = GstVideo.video_region_of_interest_meta_api_get_type()
+        lanes = []
+        for name, props in element_props(launch_args, "gvadetect"):
+            element = pipeline.get_by_name(name)
+            if element is None:
+                continue
+            lane = Lane(name, element, props.get("inference-interval", 1),
+                        lambda buffer: buffer.get_n_meta(roi_api), Gst.PadProbeReturn.OK)
+            element.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, lane.sink_probe)
+            element.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, lane.src_probe)
+            lanes.append(lane)
+        if lanes:
+            scheduler = BudgetScheduler(lanes, time.monotonic())
+            print(f"Inference budget {INFERENCE_BUDGET} over {len(lanes)} detection lanes", flush=True)
+    # Streams held at their target fps by degrading and restoring inference at runtime
+    controller = None
+    targets = stream_targets([meter.name for meter in meters])
+    if targets:
+        streams = []
+        knobs = {}
+        for meter in meters:
+            if meter.name not in targets:
+                continue
+            chain = upstream_elements(pipeline.get_by_name(meter.name))
+            render = None
+            tee = next((e for e in chain if factory_name(e) == "tee"), None)
+            pad = render_pad(tee) if tee else None
+            if pad:
+                render = RenderSwitch(f"render:{tee.get_name()}", Gst.PadProbeReturn.OK, Gst.PadProbeReturn.DROP)
+                pad.add_probe(Gst.PadProbeType.BUFFER, render.probe)
+            classify, detect = [], []
+            tracked = any(factory_name(e) == "gvatrack" for e in chain)
+            for element in chain:
+                factory = factory_name(element)
+                if factory == "gvaclassify":
+                    prop = "reclassify-interval" if tracked else "inference-interval"
+                    if element.get_property(prop) > 0:
+                        key = (element.get_name(), prop)
+                        knobs.setdefault(key, Knob(element.get_name(), element, prop, element.get_property(prop)))
+                        classify.append(knobs[key])
+                elif factory == "gvadetect" and not scheduler:
+                    # With INFERENCE_BUDGET the budget scheduler owns the detection intervals
+                    key = (element.get_name(), "inference-interval")
+                    knobs.setdefault(key, Knob(element.get_name(), element, "inference-interval",
+                                               element.get_property("inference-interval")))
+                    detect.append(knobs[key])
+            streams.append(StreamSlo(meter.name, targets[meter.name], render, classify, detect))
+        controller = SloController(streams)
+        print(f"FPS SLO for {len(streams)} streams: " + ", ".join(
+            f"{s.name}={s.target:g} fps ({len(s.ladder)} steps)" for s in streams), flush=True)
+    print(f"Launching {args.script} with {len(meters)} streams", flush=True)
+
+    loop = GLib.MainLoop()
+    state = {"rc": 0, "last": time.monotonic(), "stopping": False}
+
+    def report():
+        now = time.monotonic()
+        elapsed = now - state["last"]
+        state["last"] = now
+        for stage in rate_stages.values():
+            stage.sample()
+        values = [meter.sample(elapsed) for meter in meters]
+        source_values = {}
+        for meter, value in zip(meters, values):
+            if value is not None:
+                source_values[meter.name] = source_equivalent_fps(value, stage_counts(meter.name, elapsed))
+                meter.record(source_values[meter.name])
+        if controller:
+            # Judged at the source rate, so decimated and gated streams compare against the camera fps
+            for line in controller.update(now, source_values):
+                print(line, flush=True)
+        active = [v for v in values if v is not None]
+        if active:
+            total = sum(active)
+            per_stream = ", ".join(f"{v:.2f}" for v in active)
+            print(f"FpsCounter(last {elapsed:.2f}sec): total={total:.2f} fps, number-streams={len(active)}, "
+                  f"per-stream={total / len(active):.2f} fps ({per_stream})", flush=True)
+        sources = [f"{name}={stage.interval[0] / elapsed:.2f}" for name, stage in rate_stages.items()
+                   if name.startswith("analysis_") and stage.received.started is not None and elapsed > 0]
+        if sources:
+            print(f"SourceFps(last {elapsed:.2f}sec): {', '.join(sources)}", flush=True)
+        gates = [f"{name}={stage.interval[0] - stage.interval[1]}/{stage.interval[0]}" for name, stage in rate_stages.items()
+                 if name.startswith("motion_") and stage.interval[0]]
+        if gates:
+            print(f"MotionGate(last {elapsed:.2f}sec) skipped/frames: {', '.join(gates)}", flush=True)
+        overruns = [(watch, watch.sample()) for watch in queue_watches]
+        overruns = [f"{watch.name}>{watch.stage}={count} {'dropped' if watch.leaky else 'blocked'}"
+                    for watch, count in overruns if count]
+        if overruns:
+            print(f"QueueOverruns(last {elapsed:.2f}sec): {', '.join(overruns)}", flush=True)
+        if scheduler:
+            print(f"InferenceBudget(last {elapsed:.2f}sec): {scheduler.update(now, elapsed)}", flush=True)
+        return True
+
+    def on_message(bus, message):
+        if message.type == Gst.MessageType.EOS:
+            loop.quit()
+        elif message.type == Gst.MessageType.ERROR:
+            err, debug = message.parse_error()
+            print(f"ERROR: from element {message.src.get_name()}: {err.message}\n{debug or ''}", file=sys.stderr, flush=True)
+            state["rc"] = 1
+            loop.quit()
+        elif message.type == Gst.MessageType.WARNING:
+            warn, _ = message.parse_warning()
+            print(f"WARNING: from element {message.src.get_name()}: {warn.message}", file=sys.stderr, flush=True)
+
+    def on_signal():
+        # First signal drains the pipeline with EOS, a second one stops immediately
+        if state["stopping"]:
+            loop.quit()
+        else:
+            state["stopping"] = True
+            pipeline.send_event(Gst.Event.new_eos())
+        return True
+
+    bus = pipeline.get_bus()
+    bus.add_signal_watch()
+    bus.connect("message", on_message)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, sig, on_signal)
+    GLib.timeout_add(int(args.interval * 1000), report)
+
+    if pipeline.set_state(Gst.State.PLAYING) == Gst.StateChangeReturn.FAILURE:
+        print(f"ERROR: Could not start pipeline from {args.script}", file=sys.stderr)
+        pipeline.set_state(Gst.State.NULL)
+        return 1
+    try:
+        loop.run()
+    finally:
+        pipeline.set_state(Gst.State.NULL)
+        now = time.monotonic()
+        for meter in meters:
+            print(f"FPS average: stream={meter.name} frames={meter.frames} fps={meter.average(now):.2f}", flush=True)
+        for name, stage in rate_stages.items():
+            received, passed = stage.received, stage.passed
+            if name.startswith("analysis_"):
+                print(f"Source FPS average: source={name} frames={received.frames} fps={received.average(now):.2f}", flush=True)
+            else:
+                skipped = received.frames - passed.frames
+                share = 100.0 * skipped / received.frames if received.frames else 0.0
+                print(f"Motion gate: gate={name} frames={received.frames} skipped={skipped} ({share:.0f}%)", flush=True)
+        if controller:
+            for stream in controller.streams:
+                print(f"FPS SLO: stream={stream.name} target={stream.target:g} level={stream.level}/{len(stream.ladder)} "
+                      f"degrades={stream.degrades} restores={stream.restores}", flush=True)
+        for watch in queue_watches:
+            if watch.overruns:
+                print(f"Queue overruns: queue={watch.name} stage={watch.stage} overruns={watch.overruns} "
+                      f"({'dropped' if watch.leaky else 'blocked'})", flush=True)
+    return state["rc"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a generated pipeline script in-process and record per-stream FPS")
+    parser.add_argument("script", help="Generated pipeline script (pipeline.sh or a shard script)")
+    parser.add_argument("--results-dir", default="", help="Directory for the pipeline_stream<i>_<cid>.log files")
+    parser.add_argument("--cid", default="", help="Run id used in the per-stream log names")
+    parser.add_argument("--first-stream", type=int, default=0, help="Stream index of the script's first gvafpscounter")
+    parser.add_argument("--interval", type=float, default=1.0, help="FPS reporting interval in seconds")
+    args = parser.parse_args()
+    try:
+        sys.exit(run(args))
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
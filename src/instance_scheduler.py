@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Cost-aware model-instance scheduler for generated pipelines.
+
+Every gvadetect/gvaclassify/gvainference element in the pipeline graph carries the
+camera it serves (fps, resolution, region_of_interest) in its meta. The scheduler
+estimates the inference load each element adds, bin-packs the elements of every
+(element, device, model, precision) pool onto model instances so the instances carry
+a balanced load, and derives nireq from what each instance serves. An explicit
+BATCH_SIZE_DETECT/BATCH_SIZE_CLASSIFY is kept as the batch-size of every instance;
+with auto the batch size of each instance is computed from the combined frame
+rate of its streams, capped by a batching latency.
+
+Run as a script it acts as a simulator: it builds the graph for a config pair with
+the pipeline generator and prints the per-instance load without starting GStreamer.
+"""
+
+import argparse
+import importlib.util
+import math
+import os
+import sys
+
+SCHEDULED_ELEMENTS = ("gvadetect", "gvaclassify", "gvainference")
+INSTANCE_PREFIX = {"gvadetect": "detect", "gvaclassify": "classify", "gvainference": "inference"}
+
+# Full HD frame used as the reference for pre-processing cost
+REFERENCE_PIXELS = 1920 * 1080
+# Pre-processing (resize/colour conversion) cost of a full reference frame relative to one inference
+PIXEL_WEIGHT = 0.25
+MAX_NIREQ = 8
+
+try:
+    BATCH_LATENCY_MS = float(os.getenv("BATCH_LATENCY_MS", "100"))
+except ValueError:
+    print(f"Warning: Invalid BATCH_LATENCY_MS value '{os.getenv('BATCH_LATENCY_MS')}', using default 100", file=sys.stderr)
+    BATCH_LATENCY_MS = 100.0
+
+try:
+    MAX_BATCH_SIZE = max(1, int(os.getenv("MAX_BATCH_SIZE", "8")))
+except ValueError:
+    print(f"Warning: Invalid MAX_BATCH_SIZE value '{os.getenv('MAX_BATCH_SIZE')}', using default 8", file=sys.stderr)
+    MAX_BATCH_SIZE = 8
+
+try:
+    OBJECTS_PER_FRAME = float(os.getenv("SCHEDULER_OBJECTS_PER_FRAME", "1"))
+except ValueError:
+    print(f"Warning: Invalid SCHEDULER_OBJECTS_PER_FRAME value '{os.getenv('SCHEDULER_OBJECTS_PER_FRAME')}', using default 1", file=sys.stderr)
+    OBJECTS_PER_FRAME = 1.0
+
+
+def roi_pixels(meta):
+    roi = meta.get("region_of_interest")
+    if roi:
+        return max(0, roi["x2"] - roi["x"]) * max(0, roi["y2"] - roi["y"])
+    return int(meta.get("width") or 1920) * int(meta.get("height") or 1080)
+
+
+def inference_rate(element, reclassify=True):
+    """
+    Inference requests per second an element sends to its model instance. Detection
+    runs every inference-interval frames; classification runs on the tracked objects
+    of every frame, or every reclassify-interval frames of a track (reclassify=False
+    ignores it).
+    """
+    fps = float(element.meta.get("fps") or 15)
+    interval = max(1, int(element.props.get("inference-interval", 1)))
+    rate = fps / interval
+    if element.factory == "gvadetect":
+        return rate
+    reclassify_interval = int(element.props.get("reclassify-interval", 1)) if reclassify else 1
+    if reclassify_interval == 0:
+        # Classified once per track: estimated as one classification per object and second
+        return OBJECTS_PER_FRAME * min(rate, 1.0)
+    return rate / reclassify_interval * OBJECTS_PER_FRAME
+
+
+def estimate_load(element):
+    """Inference rate of an element weighted by the pre-processing cost of its ROI (or full frame)."""
+    rate = inference_rate(element)
+    if element.factory == "gvadetect":
+        return rate * (1.0 + PIXEL_WEIGHT * roi_pixels(element.meta) / REFERENCE_PIXELS)
+    return rate
+
+
+def auto_batch_size(inst, latency_ms=None):
+    """
+    Largest batch the instance can fill within the latency cap from the combined
+    request rate of its streams. Detection never batches more frames than it has
+    streams, since one stream only has one frame in flight per interval.
+    """
+    latency_ms = BATCH_LATENCY_MS if latency_ms is None else latency_ms
+    batch = int(inst["rate"] * latency_ms / 1000.0)
+    if inst["element"] == "gvadetect":
+        batch = min(batch, len(inst["elements"]))
+    return max(1, min(MAX_BATCH_SIZE, batch))
+
+
+def pool_key(element):
+    props = element.props
+    return (element.factory, str(props.get("device", "CPU")).upper(), str(props.get("model", "")))
+
+
+def instance_id(factory, device, index):
+    return f"{INSTANCE_PREFIX[factory]}_shared_{device.lower().replace('.', '_')}{index}"
+
+
+def schedule_model_instances(graph, max_instances):
+    """
+    Assign model-instance-id, batch-size and nireq to every inference element in the
+    graph. Each pool gets up to max_instances instances; elements are placed largest
+    load first onto the least loaded instance. Returns a list of instance summaries.
+    """
+    pools = {}
+    for element in graph.nodes.values():
+        if element.factory in SCHEDULED_ELEMENTS:
+            pools.setdefault(pool_key(element), []).append(element)
+
+    # Instance ids must stay unique when several models run on one device
+    next_index = {}
+    instances = []
+    for (factory, device, model), elements in pools.items():
+        count = min(max_instances, len(elements))
+        first = next_index.get((factory, device), 0)
+        next_index[(factory, device)] = first + count
+        pool_instances = [
+            {"id": instance_id(factory, device, first + i), "element": factory, "device": device,
+             "model": os.path.basename(model), "load": 0.0, "rate": 0.0, "streams": [], "elements": []}
+            for i in range(count)
+        ]
+        loads = sorted(((estimate_load(e), e) for e in elements), key=lambda item: (-item[0], item[1].id))
+        for load, element in loads:
+            target = min(pool_instances, key=lambda inst: inst["load"])
+            target["load"] += load
+            target["rate"] += inference_rate(element)
+            target["elements"].append(element)
+            target["streams"].append(element.meta.get("stream") or element.name or str(element.id))
+        for inst in pool_instances:
+            streams = len(inst["elements"])
+            if any(e.meta.get("auto_batch") for e in inst["elements"]):
+                inst["batch-size"] = auto_batch_size(inst)
+            else:
+                # An explicit BATCH_SIZE_DETECT/BATCH_SIZE_CLASSIFY is kept as given: gvaclassify
+                # batches regions, not streams, and the user may size for more streams to come
+                inst["batch-size"] = max(1, int(inst["elements"][0].props.get("batch-size", 1)))
+            # Time to collect one batch at the instance's combined request rate
+            inst["fill_ms"] = 1000.0 * inst["batch-size"] / inst["rate"] if inst["rate"] else 0.0
+            inst["nireq"] = max(2, min(MAX_NIREQ, math.ceil(streams / inst["batch-size"]) + 1))
+            for element in inst["elements"]:
+                element.props["model-instance-id"] = inst["id"]
+                if "batch-size" in element.props:
+                    element.props["batch-size"] = inst["batch-size"]
+                element.props["nireq"] = inst["nireq"]
+        instances.extend(pool_instances)
+    return instances
+
+
+def format_schedule(instances):
+    """Render the per-instance schedule as a text table."""
+    rows = [("instance", "model", "streams", "rate(inf/s)", "load", "batch", "fill(ms)", "nireq")]
+    for inst in instances:
+        rows.append((inst["id"], inst["model"], str(len(inst["streams"])), f"{inst['rate']:.2f}",
+                     f"{inst['load']:.2f}", str(inst["batch-size"]), f"{inst['fill_ms']:.0f}", str(inst["nireq"])))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join("  ".join(cell.ljust(widths[i]) for i, cell in enumerate(row)).rstrip() for row in rows)
+
+
+def load_generator():
+    """Import gst-pipeline-generator.py (its file name is not a valid module name)."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gst-pipeline-generator.py")
+    spec = importlib.util.spec_from_file_location("gst_pipeline_generator", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate model-instance scheduling for a camera/workload config")
+    parser.add_argument("--camera-config", default="configs/camera_to_workload.json",
+                        help="Path to camera_to_workload.json")
+    parser.add_argument("--pipeline-config", default="configs/workload_to_pipeline.json",
+                        help="Path to workload_to_pipeline.json")
+    parser.add_argument("--pipelines", type=int, default=1, help="Number of pipeline copies (PIPELINE_COUNT)")
+    parser.add_argument("--instances", type=int, default=None,
+                        help="Maximum model instances per pool (default: ROUND_ROBIN_COUNT)")
+    parser.add_argument("--show-streams", action="store_true", help="List the streams assigned to every instance")
+    args = parser.parse_args()
+
+    generator = load_generator()
+    generator.CONFIG_CAMERA_TO_WORKLOAD = args.camera_config
+    generator.CONFIG_WORKLOAD_TO_PIPELINE = args.pipeline_config
+    graph = generator.build_pipeline_graph(args.pipelines, timestamp="simulation")
+    instances = schedule_model_instances(graph, args.instances or generator.ROUND_ROBIN_COUNT)
+    print(format_schedule(instances))
+    if args.show_streams:
+        for inst in instances:
+            print(f"{inst['id']}: {', '.join(inst['streams'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Compact binary metadata sink for generated pipelines.
+
+With metadata_format "binary" a workload branch publishes its gvametaconvert
+output through the MetadataWriter gvapython class instead of gvametapublish
+json-lines. Each frame becomes one MessagePack record appended to an rs-*.mpk
+file, which is a plain MessagePack stream that standard msgpack tools can read.
+Floats are stored as float64, so every value reads back exactly as the JSONL
+sink writes it. The msgpack package (C packer) is used when it is installed,
+with a pure-Python packer as fallback; the writer reports its cost per record
+at exit, and "bench" compares it with writing the same messages as JSONL.
+
+The same module is the reader: iter_records() streams the records back as the
+dicts gvametaconvert produced, and the command line converts files to today's
+JSONL shape or reports the bytes written per stream:
+
+    python3 metadata_sink.py convert results/rs-*.mpk
+    python3 metadata_sink.py stats results/
+    python3 metadata_sink.py bench results/rs-1_1__1_<timestamp>.jsonl
+"""
+
+import argparse
+import atexit
+import glob
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+FILE_SUFFIX = ".mpk"
+# Flush the writer buffer at least every this many records
+FLUSH_RECORDS = 64
+
+
+# -----------------------------
+# MessagePack subset
+# -----------------------------
+
+def _pack(value, out):
+    if value is None:
+        out.append(0xC0)
+    elif value is True:
+        out.append(0xC3)
+    elif value is False:
+        out.append(0xC2)
+    elif isinstance(value, int):
+        if 0 <= value < 0x80:
+            out.append(value)
+        elif -32 <= value < 0:
+            out.append(value & 0xFF)
+        elif 0 <= value <= 0xFFFFFFFF:
+            out += struct.pack(">BI", 0xCE, value) if value > 0xFFFF else struct.pack(">BH", 0xCD, value)
+        elif value >= 0:
+            out += struct.pack(">BQ", 0xCF, value)
+        else:
+            out += struct.pack(">Bq", 0xD3, value)
+    elif isinstance(value, float):
+        out += struct.pack(">Bd", 0xCB, value)
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        if len(data) < 32:
+            out.append(0xA0 | len(data))
+        elif len(data) <= 0xFF:
+            out += struct.pack(">BB", 0xD9, len(data))
+        elif len(data) <= 0xFFFF:
+            out += struct.pack(">BH", 0xDA, len(data))
+        else:
+            out += struct.pack(">BI", 0xDB, len(data))
+        out += data
+    elif isinstance(value, (list, tuple)):
+        if len(value) < 16:
+            out.append(0x90 | len(value))
+        elif len(value) <= 0xFFFF:
+            out += struct.pack(">BH", 0xDC, len(value))
+        else:
+            out += struct.pack(">BI", 0xDD, len(value))
+        for item in value:
+            _pack(item, out)
+    elif isinstance(value, dict):
+        if len(value) < 16:
+            out.append(0x80 | len(value))
+        elif len(value) <= 0xFFFF:
+            out += struct.pack(">BH", 0xDE, len(value))
+        else:
+            out += struct.pack(">BI", 0xDF, len(value))
+        for key, item in value.items():
+            _pack(str(key), out)
+            _pack(item, out)
+    else:
+        _pack(str(value), out)
+
+
+_packer = msgpack.Packer(use_bin_type=True, use_single_float=False) if msgpack else None
+
+
+def pack(value):
+    """Encode a JSON-compatible value as MessagePack bytes (with msgpack's C packer when installed)."""
+    if _packer is not None:
+        return _packer.pack(value)
+    out = bytearray()
+    _pack(value, out)
+    return bytes(out)
+
+
+class _Reader:
+    def __init__(self, f):
+        self.f = f
+
+    def read(self, size):
+        data = self.f.read(size)
+        if len(data) != size:
+            raise EOFError
+        return data
+
+    def unpack(self):
+        first = self.f.read(1)
+        if not first:
+            raise StopIteration
+        return self._value(first[0])
+
+    def _value(self, tag):
+        if tag < 0x80:
+            return tag
+        if tag >= 0xE0:
+            return tag - 0x100
+        if 0x80 <= tag <= 0x8F:
+            return self._map(tag & 0x0F)
+        if 0x90 <= tag <= 0x9F:
+            return self._array(tag & 0x0F)
+        if 0xA0 <= tag <= 0xBF:
+            return self.read(tag & 0x1F).decode("utf-8")
+        fixed = {
+            0xC0: lambda: None, 0xC2: lambda: False, 0xC3: lambda: True,
+            # float32 (files written before float64) back to its shortest decimal form
+            0xCA: lambda: float(f"{struct.unpack('>f', self.read(4))[0]:.7g}"),
+            0xCB: lambda: struct.unpack(">d", self.read(8))[0],
+            0xCC: lambda: self.read(1)[0],
+            0xCD: lambda: struct.unpack(">H", self.read(2))[0],
+            0xCE: lambda: struct.unpack(">I", self.read(4))[0],
+            0xCF: lambda: struct.unpack(">Q", self.read(8))[0],
+            0xD0: lambda: struct.unpack(">b", self.read(1))[0],
+            0xD1: lambda: struct.unpack(">h", self.read(2))[0],
+            0xD2: lambda: struct.unpack(">i", self.read(4))[0],
+            0xD3: lambda: struct.unpack(">q", self.read(8))[0],
+            0xD9: lambda: self.read(self.read(1)[0]).decode("utf-8"),
+            0xDA: lambda: self.read(struct.unpack(">H", self.read(2))[0]).decode("utf-8"),
+            0xDB: lambda: self.read(struct.unpack(">I", self.read(4))[0]).decode("utf-8"),
+            0xDC: lambda: self._array(struct.unpack(">H", self.read(2))[0]),
+            0xDD: lambda: self._array(struct.unpack(">I", self.read(4))[0]),
+            0xDE: lambda: self._map(struct.unpack(">H", self.read(2))[0]),
+            0xDF: lambda: self._map(struct.unpack(">I", self.read(4))[0]),
+        }
+        if tag not in fixed:
+            raise ValueError(f"unsupported MessagePack type 0x{tag:02x}")
+        return fixed[tag]()
+
+    def _array(self, size):
+        return [self._value(self.read(1)[0]) for _ in range(size)]
+
+    def _map(self, size):
+        result = {}
+        for _ in range(size):
+            key = self._value(self.read(1)[0])
+            result[key] = self._value(self.read(1)[0])
+        return result
+
+
+def iter_records(path):
+    """Stream the records of an .mpk metadata file. A truncated last record (writer still running) is skipped."""
+    with open(path, "rb") as f:
+        reader = _Reader(f)
+        while True:
+            try:
+                yield reader.unpack()
+            except (StopIteration, EOFError):
+                return
+
+
+# -----------------------------
+# gvapython writer
+# -----------------------------
+
+class MetadataWriter:
+    """gvapython class: append the frame's gvametaconvert JSON messages to path as MessagePack records."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, "ab", buffering=1 << 16)
+        self.records = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        atexit.register(self.close)
+
+    def process_frame(self, frame):
+        start = time.perf_counter()
+        for message in frame.messages():
+            self.write(message)
+        self.seconds += time.perf_counter() - start
+        return True
+
+    def write(self, message):
+        try:
+            record = pack(json.loads(message))
+        except ValueError:
+            return
+        self.file.write(record)
+        self.records += 1
+        self.bytes += len(record)
+        if self.records % FLUSH_RECORDS == 0:
+            self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+            cost = 1e6 * self.seconds / self.records if self.records else 0.0
+            print(f"[metadata_sink] {os.path.basename(self.path)}: {self.records} records, {self.bytes} bytes, "
+                  f"{cost:.1f} us/record ({'msgpack' if msgpack else 'pure-Python packer'})", flush=True)
+
+
+# -----------------------------
+# Converter / stats
+# -----------------------------
+
+def convert_to_jsonl(path, out_path=None):
+    """Write the records of an .mpk file as JSON lines. Returns (output path, record count)."""
+    out_path = out_path or path[:-len(FILE_SUFFIX)] + ".jsonl"
+    count = 0
+    with open(out_path, "w") as out:
+        for record in iter_records(path):
+            out.write(json.dumps(record) + "\n")
+            count += 1
+    return out_path, count
+
+
+def stream_stats(paths):
+    """Records and bytes per metadata file (.jsonl or .mpk)."""
+    rows = []
+    for path in sorted(paths):
+        size = os.path.getsize(path)
+        if path.endswith(FILE_SUFFIX):
+            records = sum(1 for _ in iter_records(path))
+        else:
+            with open(path, "rb") as f:
+                records = sum(1 for _ in f)
+        rows.append({"file": os.path.basename(path), "records": records, "bytes": size,
+                     "bytes_per_record": size / records if records else 0.0})
+    return rows
+
+
+def bench(path, repeat=3):
+    """
+    Per-record cost of the binary writer against the JSONL sink for the gvametaconvert
+    messages of a JSONL file. The JSONL figure is the Python write of the message;
+    gvametapublish does the same write in C, so it is a lower bound of what it replaces.
+    """
+    with open(path) as f:
+        messages = [line.rstrip("\n") for line in f if line.strip()]
+    if not messages:
+        raise ValueError(f"{path}: no records")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("jsonl", "binary"):
+            best = None
+            for _ in range(repeat):
+                out = os.path.join(tmp, f"bench_{name}")
+                if os.path.exists(out):
+                    os.remove(out)
+                start = time.perf_counter()
+                if name == "jsonl":
+                    with open(out, "w", buffering=1 << 16) as f:
+                        for message in messages:
+                            f.write(message + "\n")
+                else:
+                    writer = MetadataWriter(out)
+                    for message in messages:
+                        writer.write(message)
+                    writer.file.close()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[name] = (1e6 * best / len(messages), os.path.getsize(out) / len(messages))
+    return len(messages), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read, convert and measure pipeline metadata files")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="Convert .mpk files to .jsonl")
+    convert.add_argument("files", nargs="+")
+    stats = sub.add_parser("stats", help="Report records and bytes written per stream")
+    stats.add_argument("paths", nargs="+", help="Metadata files or results directories")
+    bench_parser = sub.add_parser("bench", help="Per-record cost of the binary writer against JSONL")
+    bench_parser.add_argument("file", help="JSONL metadata file to replay")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        try:
+            count, results = bench(args.file)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"{count} records, packer: {'msgpack' if msgpack else 'pure-Python'}")
+        for name, (cost, size) in results.items():
+            print(f"{name:<7} {cost:>8.1f} us/record {size:>8.1f} bytes/record")
+        return
+
+    if args.command == "convert":
+        for path in args.files:
+            out_path, count = convert_to_jsonl(path)
+            print(f"{path} -> {out_path} ({count} records)")
+        return
+    files = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            files += glob.glob(os.path.join(path, "rs-*.jsonl")) + glob.glob(os.path.join(path, f"rs-*{FILE_SUFFIX}"))
+        else:
+            files.append(path)
+    rows = stream_stats(files)
+    if not rows:
+        print("No metadata files found", file=sys.stderr)
+        sys.exit(1)
+    width = max(len(row["file"]) for row in rows)
+    print(f"{'file'.ljust(width)}  {'records':>8}  {'bytes':>12}  {'bytes/record':>12}")
+    for row in rows:
+        print(f"{row['file'].ljust(width)}  {row['records']:>8}  {row['bytes']:>12}  {row['bytes_per_record']:>12.1f}")
+    print(f"{'total'.ljust(width)}  {sum(r['records'] for r in rows):>8}  {sum(r['bytes'] for r in rows):>12}")
+
+
+if __name__ == "__main__":
+    main()
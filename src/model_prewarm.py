@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Pre-warm the OpenVINO compiled-model cache for generated pipeline scripts.
+
+Every gvadetect/gvaclassify/gvainference of the scripts is reduced to the
+properties that decide what DLStreamer compiles (model, model-proc, device,
+batch-size, nireq, ie-config, pre-processing). Each combination is pre-rolled
+in a short gst-launch pipeline with the same element, fed a few test frames
+at every camera resolution of the config, so the blobs written to the
+ie-config CACHE_DIR are the ones the pipeline looks up: the model with
+DLStreamer's pre-processing and settings, not the raw IR.
+
+For every combination the cold pre-roll (empty cache) is compared with the
+warm one (filled cache), and the warm run must not write new blobs. The times
+cover starting one inference element and its first frames, not the pipeline's
+time to first frame (sources, decoders and the other elements come on top).
+The blobs present after the pre-warm are recorded in the cache directory;
+--check run after the launch reports whether the pipeline compiled anything
+the pre-warm missed.
+
+Usage: model_prewarm.py [--skip-cold] [--check] [--cache-dir DIR] SCRIPT [SCRIPT ...]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from pipeline_script import INFERENCE_FACTORIES, LAUNCH_COMMAND, read_pipeline_script
+
+CAMERA_STREAM = os.environ.get("CAMERA_STREAM", "camera_to_workload.json")
+CONFIG_CAMERA_TO_WORKLOAD = f"/home/pipeline-server/configs/{CAMERA_STREAM}"
+# Element properties that change the compiled model or how it is compiled
+COMPILE_PROPS = ("model", "model-proc", "device", "batch-size", "nireq", "ie-config",
+                 "pre-process-backend", "pre-process-config")
+# Blobs in the cache after the pre-warm, for --check
+MANIFEST_FILE = ".prewarm_blobs.json"
+PREROLL_FRAMES = 4
+PREROLL_TIMEOUT = 300
+
+
+def inference_elements(args):
+    """{factory, props} of every inference element in a gst-launch argument list."""
+    elements = []
+    current = None
+    for token in args:
+        if token == "!":
+            current = None
+        elif token in INFERENCE_FACTORIES:
+            current = {"factory": token, "props": {}}
+            elements.append(current)
+        elif current is not None and "=" in token:
+            key, value = token.split("=", 1)
+            current["props"][key] = value
+    return elements
+
+
+def parse_ie_config(text):
+    config = {}
+    for item in str(text or "").split(","):
+        key, sep, value = item.partition("=")
+        if sep and key.strip():
+            config[key.strip()] = value.strip()
+    return config
+
+
+def with_cache_dir(props, cache_dir):
+    """Element properties with the ie-config CACHE_DIR set to cache_dir."""
+    config = {k: v for k, v in parse_ie_config(props.get("ie-config")).items() if k != "CACHE_DIR"}
+    config["CACHE_DIR"] = cache_dir
+    return dict(props, **{"ie-config": ",".join(f"{k}={v}" for k, v in config.items())})
+
+
+def collect_combinations(scripts):
+    """
+    Unique element configurations with the number of model instances using each;
+    elements sharing a model-instance-id load the model once.
+    """
+    combos = {}
+    for script in scripts:
+        _, _, args = read_pipeline_script(script)
+        for element in inference_elements(args):
+            props = element["props"]
+            if "model" not in props:
+                continue
+            compile_props = {k: props[k] for k in COMPILE_PROPS if k in props}
+            key = (element["factory"], tuple(sorted(compile_props.items())))
+            combo = combos.setdefault(key, {"factory": element["factory"], "props": compile_props,
+                                            "model": props["model"], "device": props.get("device", "CPU").upper(),
+                                            "config": parse_ie_config(props.get("ie-config")), "instances": set()})
+            combo["instances"].add(props.get("model-instance-id") or f"{script}:{len(combo['instances'])}")
+    return list(combos.values())
+
+
+def camera_resolutions(config_path):
+    """Distinct (width, height) of the cameras; the pre-processing compiled into a blob depends on it."""
+    try:
+        with open(config_path) as f:
+            cameras = json.load(f)["lane_config"]["cameras"]
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Warning: Could not read {config_path}: {e}, pre-warming for 1920x1080", file=sys.stderr)
+        cameras = []
+    return sorted({(int(cam.get("width", 1920)), int(cam.get("height", 1080))) for cam in cameras}) or [(1920, 1080)]
+
+
+def preroll_command(combo, width, height, cache_dir):
+    """gst-launch arguments that feed a few test frames through the element of the combination."""
+    props = with_cache_dir(combo["props"], cache_dir)
+    source = ["videotestsrc", f"num-buffers={PREROLL_FRAMES}", "!"]
+    if props.get("pre-process-backend", "").startswith("va"):
+        # VA pre-processing only accepts frames in GPU memory, as in the pipeline
+        source += [f"video/x-raw,format=NV12,width={width},height={height}", "!", "vapostproc", "!",
+                   "video/x-raw(memory:VAMemory)", "!"]
+    else:
+        source += [f"video/x-raw,format=BGR,width={width},height={height}", "!"]
+    return [LAUNCH_COMMAND, "-q"] + source + [combo["factory"]] + [f"{k}={v}" for k, v in props.items()] + ["!", "fakesink"]
+
+
+def cache_blobs(cache_dir):
+    return {name for name in os.listdir(cache_dir) if name != MANIFEST_FILE} if os.path.isdir(cache_dir) else set()
+
+
+def preroll(combo, resolutions, cache_dir):
+    """Pre-roll the combination at every resolution. Returns (elapsed seconds, blobs written)."""
+    before = cache_blobs(cache_dir)
+    start = time.perf_counter()
+    for width, height in resolutions:
+        result = subprocess.run(preroll_command(combo, width, height, cache_dir), capture_output=True, text=True,
+                                timeout=PREROLL_TIMEOUT)
+        if result.returncode != 0:
+            output = (result.stderr or result.stdout).strip().splitlines()
+            raise RuntimeError(output[-1] if output else f"{LAUNCH_COMMAND} exited with status {result.returncode}")
+    return time.perf_counter() - start, cache_blobs(cache_dir) - before
+
+
+def check_cache(cache_dirs):
+    """Compare each cache with the blobs the pre-warm left there. Returns the number of new blobs."""
+    missed = 0
+    for cache_dir in sorted(cache_dirs):
+        manifest = os.path.join(cache_dir, MANIFEST_FILE)
+        try:
+            with open(manifest) as f:
+                warmed = set(json.load(f))
+        except (OSError, ValueError):
+            print(f"Warning: No pre-warm record in {cache_dir}, cannot check it", file=sys.stderr)
+            continue
+        new = cache_blobs(cache_dir) - warmed
+        missed += len(new)
+        if new:
+            print(f"Model cache {cache_dir}: the pipeline compiled {len(new)} blob(s) the pre-warm did not: "
+                  f"{', '.join(sorted(new))}")
+        else:
+            print(f"Model cache {cache_dir}: every model the pipeline loaded was a cache hit")
+    return missed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile every model of the pipeline scripts into the OpenVINO cache")
+    parser.add_argument("scripts", nargs="+", help="Generated pipeline scripts (pipeline.sh or shard scripts)")
+    parser.add_argument("--cache-dir", default="",
+                        help="Compiled-model cache (default: the ie-config CACHE_DIR of each element, else OV_CACHE_DIR)")
+    parser.add_argument("--camera-config", default=CONFIG_CAMERA_TO_WORKLOAD, help="Camera config for the frame sizes")
+    parser.add_argument("--skip-cold", action="store_true", help="Only fill the cache, do not measure cold pre-rolls")
+    parser.add_argument("--check", action="store_true",
+                        help="After a launch: report blobs the pipeline compiled that the pre-warm did not")
+    args = parser.parse_args()
+
+    try:
+        combos = collect_combinations(args.scripts)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not combos:
+        print("No inference elements found", file=sys.stderr)
+        return
+    for combo in combos:
+        combo["cache_dir"] = args.cache_dir or combo["config"].get("CACHE_DIR") or os.getenv("OV_CACHE_DIR", "")
+    if args.check:
+        sys.exit(1 if check_cache({combo["cache_dir"] for combo in combos if combo["cache_dir"]}) else 0)
+    if not shutil.which(LAUNCH_COMMAND):
+        print(f"Error: {LAUNCH_COMMAND} is required to pre-warm models", file=sys.stderr)
+        sys.exit(1)
+
+    resolutions = camera_resolutions(args.camera_config)
+    rows = []
+    failed = 0
+    for combo in combos:
+        cache_dir = combo["cache_dir"]
+        if not cache_dir:
+            print(f"Warning: No CACHE_DIR for {combo['model']} on {combo['device']}, skipping", file=sys.stderr)
+            continue
+        os.makedirs(cache_dir, exist_ok=True)
+        cold_dir = None if args.skip_cold else tempfile.mkdtemp(prefix="ov_cold_")
+        try:
+            cold = None if cold_dir is None else preroll(combo, resolutions, cold_dir)[0]
+            # The first cached pre-roll fills the cache (if needed), the second one must only hit it
+            preroll(combo, resolutions, cache_dir)
+            warm, written = preroll(combo, resolutions, cache_dir)
+        except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+            print(f"Error: Could not pre-roll {combo['factory']} {combo['model']} on {combo['device']}: {e}",
+                  file=sys.stderr)
+            failed += 1
+            continue
+        finally:
+            if cold_dir:
+                shutil.rmtree(cold_dir, ignore_errors=True)
+        if written:
+            print(f"Warning: {os.path.basename(combo['model'])} on {combo['device']} wrote {len(written)} new blob(s) "
+                  f"on a warm pre-roll; its cache entry is not reused", file=sys.stderr)
+            failed += 1
+        rows.append((combo, cold, warm, not written))
+
+    print(f"{'model':<32} {'device':<6} {'batch':>5} {'inst':>4} {'cold(ms)':>9} {'warm(ms)':>9} {'hit':>4}")
+    for combo, cold, warm, hit in rows:
+        cold_text = "-" if cold is None else f"{cold * 1000:.0f}"
+        print(f"{os.path.basename(combo['model']):<32} {combo['device']:<6} {combo['props'].get('batch-size', '1'):>5} "
+              f"{len(combo['instances']):>4} {cold_text:>9} {warm * 1000:>9.0f} {'yes' if hit else 'no':>4}")
+    warm_total = sum(warm * len(combo["instances"]) for combo, _, warm, _ in rows)
+    if not args.skip_cold and rows:
+        cold_total = sum(cold * len(combo["instances"]) for combo, cold, _, _ in rows)
+        print(f"Inference element start-up: cold {cold_total:.2f}s, warm {warm_total:.2f}s "
+              f"({cold_total / warm_total if warm_total else 0:.1f}x faster with the cache; "
+              f"not the pipeline's time to first frame)")
+    else:
+        print(f"Inference element start-up: warm {warm_total:.2f}s")
+    for cache_dir in {combo["cache_dir"] for combo, _, _, _ in rows}:
+        with open(os.path.join(cache_dir, MANIFEST_FILE), "w") as f:
+            json.dump(sorted(cache_blobs(cache_dir)), f)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
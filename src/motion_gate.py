@@ -0,0 +1,125 @@
+"""
+gvapython module for motion-gated detection.
+
+A workload whose steps start with {"type": "motion_gate"} gets MotionGate in
+front of its gvadetect. Each frame is reduced to a downscaled grayscale copy of
+the camera's region of interest (about `scale` pixels on the long side) and
+compared with the previous frame; when fewer than `threshold` of the sampled
+pixels changed by more than `pixel_delta` grey levels the frame is dropped from
+the branch, so detection, tracking, classification and publishing skip it.
+
+After motion the gate stays open for `hold_frames` frames so detection sees the
+scene settle, and it never skips more than `max_skip_frames` frames in a row, so
+tracks and metadata are refreshed on idle lanes too. Frames that cannot be
+mapped to system memory (e.g. VA surfaces) always pass.
+
+The gate prints its skipped-frame counter at exit; the in-process launcher
+reports the frames arriving at and leaving each gate per interval. Under
+gst-launch the gate prints those counters itself every
+MOTION_GATE_REPORT_INTERVAL seconds, for run-pipeline.sh to log the stream
+at the source rate:
+
+    [motion_gate] motion_cam1_2: frames=15 passed=4 seconds=1.00
+"""
+
+import atexit
+import os
+import time
+
+import numpy as np
+
+try:
+    MOTION_GATE_REPORT_INTERVAL = float(os.getenv("MOTION_GATE_REPORT_INTERVAL", "1"))
+except ValueError:
+    MOTION_GATE_REPORT_INTERVAL = 1.0
+
+
+class MotionGate:
+    def __init__(self, name="motion", roi=None, threshold=0.01, pixel_delta=16, scale=64,
+                 hold_frames=5, max_skip_frames=30):
+        self.name = name
+        self.roi = roi
+        self.threshold = float(threshold)
+        self.pixel_delta = int(pixel_delta)
+        self.scale = max(8, int(scale))
+        self.hold_frames = int(hold_frames)
+        self.max_skip_frames = int(max_skip_frames)
+        self.previous = None
+        self.open_frames = 0
+        self.skipped_run = 0
+        self.frames = 0
+        self.skipped = 0
+        self.disabled = False
+        self.interval_start = None
+        self.interval_frames = 0
+        self.interval_passed = 0
+        atexit.register(self.report)
+
+    def luma(self, frame):
+        """Downscaled grayscale ROI of the frame as int16, or None if the frame cannot be mapped."""
+        info = frame.video_info()
+        width, height = info.width, info.height
+        x, y, x2, y2 = 0, 0, width, height
+        if self.roi:
+            x, y = max(0, int(self.roi["x"])), max(0, int(self.roi["y"]))
+            x2, y2 = min(width, int(self.roi["x2"])), min(height, int(self.roi["y2"]))
+        step = max(1, max(x2 - x, y2 - y) // self.scale)
+        with frame.data() as data:
+            if data.ndim == 2:
+                # Planar YUV (NV12, I420): the first rows are the luma plane
+                plane = data[:height]
+            else:
+                # Packed RGB/BGR(x): the green channel is close enough to luma for change detection
+                plane = data[..., 1]
+            return plane[y:y2:step, x:x2:step].astype(np.int16)
+
+    def changed(self, current):
+        if self.previous is None or self.previous.shape != current.shape:
+            return True
+        moving = np.count_nonzero(np.abs(current - self.previous) > self.pixel_delta)
+        return moving >= self.threshold * current.size
+
+    def process_frame(self, frame):
+        passed = self.gate(frame)
+        if MOTION_GATE_REPORT_INTERVAL > 0:
+            self.count(passed)
+        return passed
+
+    def count(self, passed):
+        now = time.monotonic()
+        if self.interval_start is None:
+            self.interval_start = now
+        self.interval_frames += 1
+        self.interval_passed += int(passed)
+        if now - self.interval_start >= MOTION_GATE_REPORT_INTERVAL:
+            print(f"[motion_gate] {self.name}: frames={self.interval_frames} passed={self.interval_passed} "
+                  f"seconds={now - self.interval_start:.2f}", flush=True)
+            self.interval_start = now
+            self.interval_frames = self.interval_passed = 0
+
+    def gate(self, frame):
+        self.frames += 1
+        if self.disabled:
+            return True
+        try:
+            current = self.luma(frame)
+        except Exception as e:
+            print(f"[motion_gate] {self.name}: cannot read frames ({e}), gate disabled", flush=True)
+            self.disabled = True
+            return True
+        if self.changed(current):
+            self.open_frames = self.hold_frames
+        self.previous = current
+        if self.open_frames > 0 or self.skipped_run >= self.max_skip_frames:
+            # A frame let through by max_skip_frames alone must not eat into the next hold
+            self.open_frames = max(0, self.open_frames - 1)
+            self.skipped_run = 0
+            return True
+        self.skipped_run += 1
+        self.skipped += 1
+        return False
+
+    def report(self):
+        if self.frames:
+            print(f"[motion_gate] {self.name}: skipped {self.skipped} of {self.frames} frames "
+                  f"({100.0 * self.skipped / self.frames:.0f}%)", flush=True)
@@ -3,10 +3,16 @@ import uuid
 import json
 import math
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from track_cache import TrackCache
 
 frame_counter = 0
 # In-memory person DB: {person_id: bbox}
 person_db = {}
+# Person id assigned to each gvatrack object id, so tracked persons skip the IoU search
+track_ids = TrackCache("person_reid")
 
 def iou(b1, b2):
     # Intersection over Union for two bboxes
@@ -23,6 +29,7 @@ def iou(b1, b2):
 def process_frame(frame):
     global frame_counter, person_db
     frame_counter += 1
+    track_ids.next_frame()
 
     # Load camera_id and workload from camera_to_workload.json    
     camera_id = "camera_001"
@@ -61,17 +68,17 @@ def process_frame(frame):
         rect = roi.rect()  # returns normalized bbox
         person_id = roi.object_id() # person_id
         bbox = [rect.x, rect.y, rect.x + rect.w, rect.y + rect.h]
-        assigned_id = None
-        # Check for matching person in DB (simple IoU threshold)
-        for pid, prev_bbox in person_db.items():
-            if iou(bbox, prev_bbox) > 0.5:
-                assigned_id = pid
-                break
+        assigned_id = track_ids.get(person_id, roi.confidence())
         if assigned_id is None:
-            assigned_id = f"anon_{person_id}"
-            person_db[assigned_id] = bbox
-        else:
-            person_db[assigned_id] = bbox  # update position
+            # Check for matching person in DB (simple IoU threshold)
+            for pid, prev_bbox in person_db.items():
+                if iou(bbox, prev_bbox) > 0.5:
+                    assigned_id = pid
+                    break
+            if assigned_id is None:
+                assigned_id = f"anon_{person_id}"
+            track_ids.put(person_id, assigned_id, roi.confidence())
+        person_db[assigned_id] = bbox  # update position
         output["persons"].append({
             "bbox": {
                 "x": rect.x,
@@ -0,0 +1,385 @@
+"""
+Intermediate representation for generated GStreamer pipelines.
+
+The generator builds a PipelineGraph of element nodes with typed properties,
+runs optimization passes over it and only renders the gst-launch string at the end.
+The same graph can be exported as JSON so tooling can inspect a pipeline plan
+without parsing shell text.
+"""
+
+import json
+import re
+import shlex
+
+# Characters that can appear in a property value without quoting in the generated shell script
+_SAFE_VALUE_RE = re.compile(r"^[A-Za-z0-9_\-./,+@%=]+$")
+_INT_RE = re.compile(r"^-?\d+$")
+_FLOAT_RE = re.compile(r"^-?\d+\.\d*$")
+
+
+def parse_value(raw):
+    """Convert a gst-launch property value to a typed Python value."""
+    value = raw.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in ("'", '"'):
+        return value[1:-1]
+    if value in ("true", "false"):
+        return value == "true"
+    if _INT_RE.match(value):
+        return int(value)
+    if _FLOAT_RE.match(value):
+        return float(value)
+    return value
+
+
+def format_value(value):
+    """Render a typed property value for gst-launch."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    text = str(value)
+    if _SAFE_VALUE_RE.match(text):
+        return text
+    return '"' + text.replace('"', '\\"') + '"'
+
+
+def parse_properties(text):
+    """
+    Parse a "key=value key=value" fragment (as found in res/*.env files) into an
+    ordered dict of typed values. Repeated keys are collected into a list.
+    """
+    props = {}
+    if not text:
+        return props
+    for token in shlex.split(text, posix=False):
+        if "=" not in token:
+            continue
+        key, raw = token.split("=", 1)
+        value = parse_value(raw)
+        if key in props:
+            existing = props[key]
+            props[key] = existing + [value] if isinstance(existing, list) else [existing, value]
+        else:
+            props[key] = value
+    return props
+
+
+class Element:
+    """A single GStreamer element (or caps filter) in the pipeline graph."""
+
+    def __init__(self, factory, props=None, node_id=None):
+        self.factory = factory
+        self.props = dict(props or {})
+        self.id = node_id
+        # Generator bookkeeping (camera, pipeline instance, ...) that is not rendered
+        self.meta = {}
+        self.children = []
+        self.parents = []
+
+    @property
+    def name(self):
+        return self.props.get("name")
+
+    def signature(self, ignore=("name",)):
+        """Structural identity of the element, ignoring the given properties."""
+        props = {k: v for k, v in self.props.items() if k not in ignore}
+        return json.dumps([self.factory, props], sort_keys=True, default=str)
+
+    def render(self):
+        if self.factory == "capsfilter" and list(self.props) == ["caps"]:
+            return format_value(self.props["caps"])
+        parts = [self.factory]
+        # Keep name first so the run scripts can find it right after the factory
+        ordered = sorted(self.props.items(), key=lambda item: item[0] != "name")
+        for key, value in ordered:
+            values = value if isinstance(value, list) else [value]
+            for v in values:
+                parts.append(f"{key}={format_value(v)}")
+        return " ".join(parts)
+
+    def to_dict(self):
+        data = {"id": self.id, "factory": self.factory, "props": self.props}
+        if self.meta:
+            data["meta"] = self.meta
+        return data
+
+    def __repr__(self):
+        return f"Element({self.id}, {self.render()!r})"
+
+
+def parse_element(text):
+    """Parse a single gst-launch element description such as 'vapostproc' or '"video/x-raw(...)"'."""
+    text = text.strip()
+    if text.startswith('"') or text.startswith("'") or "/" in text.split(" ", 1)[0]:
+        return Element("capsfilter", {"caps": parse_value(text)})
+    factory, _, rest = text.partition(" ")
+    return Element(factory, parse_properties(rest))
+
+
+def parse_chain(text):
+    """Parse a 'a ! b ! "caps"' fragment (e.g. the DECODE setting) into a list of Elements."""
+    return [parse_element(part) for part in text.split("!") if part.strip()]
+
+
+class PipelineGraph:
+    """Directed graph of pipeline elements. Tees are the only nodes with several children."""
+
+    def __init__(self):
+        self.nodes = {}
+        self.meta = {}
+        self._next_id = 0
+
+    def add(self, factory, props=None):
+        element = factory if isinstance(factory, Element) else Element(factory, props)
+        element.id = self._next_id
+        self._next_id += 1
+        self.nodes[element.id] = element
+        return element
+
+    def link(self, src, dst):
+        src.children.append(dst)
+        dst.parents.append(src)
+        return dst
+
+    def unlink(self, src, dst):
+        src.children.remove(dst)
+        dst.parents.remove(src)
+
+    def append(self, tail, factory, props=None):
+        """Add an element and link it after tail (if any). Returns the new element as the new tail."""
+        element = self.add(factory, props)
+        if tail is not None:
+            self.link(tail, element)
+        return element
+
+    def append_chain(self, tail, elements):
+        for element in elements:
+            tail = self.append(tail, element)
+        return tail
+
+    def remove(self, element):
+        """Remove an element with at most one parent, splicing its children onto that parent."""
+        parent = element.parents[0] if element.parents else None
+        children = list(element.children)
+        for child in children:
+            self.unlink(element, child)
+        if parent is not None:
+            index = parent.children.index(element)
+            self.unlink(parent, element)
+            for offset, child in enumerate(children):
+                parent.children.insert(index + offset, child)
+                child.parents.append(parent)
+        del self.nodes[element.id]
+
+    def sources(self):
+        return [node for node in self.nodes.values() if not node.parents]
+
+    def find(self, factory):
+        return [node for node in self.nodes.values() if node.factory == factory]
+
+    def _ensure_name(self, element):
+        if not element.name:
+            element.props["name"] = f"{element.factory}_{element.id}"
+        return element.name
+
+    def _render_from(self, element):
+        text = element.render()
+        if element.factory == "tee":
+            tee_name = self._ensure_name(element)
+            text = element.render()
+            for child in element.children:
+                text += f"    {tee_name}. ! {self._render_from(child)}"
+            return text
+        if element.children:
+            text += f" ! {self._render_from(element.children[0])}"
+        return text
+
+    def render_branches(self):
+        """Render one gst-launch description per source, in insertion order."""
+        return [self._render_from(source) for source in self.sources()]
+
+    def reachable(self, sources):
+        """All elements reachable from the given sources."""
+        seen = {}
+        stack = list(sources)
+        while stack:
+            node = stack.pop()
+            if node.id not in seen:
+                seen[node.id] = node
+                stack.extend(node.children)
+        return seen
+
+    def subgraph(self, sources):
+        """
+        A graph holding the given sources and everything downstream of them. Elements
+        are shared with this graph, so the sources must not be linked to elements
+        outside the subgraph.
+        """
+        sub = PipelineGraph()
+        keep = self.reachable(sources)
+        sub.nodes = {node_id: node for node_id, node in self.nodes.items() if node_id in keep}
+        sub.meta = dict(self.meta)
+        sub._next_id = self._next_id
+        return sub
+
+    def to_dict(self):
+        links = [[node.id, child.id] for node in self.nodes.values() for child in node.children]
+        return {
+            "meta": self.meta,
+            "nodes": [node.to_dict() for node in self.nodes.values()],
+            "links": links,
+        }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent)
+
+
+# -----------------------------
+# Optimization passes
+# -----------------------------
+
+def remove_redundant_queues(graph):
+    """Collapse queue ! queue runs into a single queue. Returns the number of queues removed."""
+    removed = 0
+    for node in list(graph.nodes.values()):
+        if node.id not in graph.nodes or node.factory != "queue":
+            continue
+        while len(node.children) == 1 and node.children[0].factory == "queue" and len(node.children[0].parents) == 1:
+            graph.remove(node.children[0])
+            removed += 1
+    return removed
+
+
+def merge_tees(graph):
+    """
+    Fold a tee that feeds another tee into its parent and drop tees with a single
+    output. Returns the number of tees removed.
+    """
+    removed = 0
+    for node in list(graph.nodes.values()):
+        if node.id not in graph.nodes or node.factory != "tee":
+            continue
+        for child in list(node.children):
+            inner = child
+            # Look through the queue at the head of the tee branch
+            if inner.factory == "queue" and len(inner.children) == 1:
+                inner = inner.children[0]
+            if inner.factory != "tee" or len(inner.parents) != 1:
+                continue
+            if inner is not child:
+                graph.remove(child)
+            index = node.children.index(inner)
+            grandchildren = list(inner.children)
+            for grandchild in grandchildren:
+                graph.unlink(inner, grandchild)
+            graph.unlink(node, inner)
+            del graph.nodes[inner.id]
+            for offset, grandchild in enumerate(grandchildren):
+                node.children.insert(index + offset, grandchild)
+                grandchild.parents.append(node)
+            removed += 1
+        if len(node.children) == 1 and node.parents:
+            graph.remove(node)
+            removed += 1
+    return removed
+
+
+def _branch_head_queue(graph, element, queue_props):
+    """Make sure a tee branch starts with a queue so each branch gets its own streaming thread."""
+    if element.factory == "queue":
+        return element
+    parent = element.parents[0]
+    index = parent.children.index(element)
+    graph.unlink(parent, element)
+    queue = graph.add("queue", dict(queue_props))
+    parent.children.insert(index, queue)
+    queue.parents.append(parent)
+    graph.link(queue, element)
+    return queue
+
+
+def fan_out(graph, element, branches, queue_props):
+    """
+    Attach branches after element through a tee, creating the tee if element is not one.
+    A queue in front of the new tee is dropped: every branch starts with its own queue.
+    """
+    if element.factory == "queue" and len(element.parents) == 1:
+        parent = element.parents[0]
+        if parent.factory != "tee" and len(parent.children) == 1:
+            graph.remove(element)
+            element = parent
+    if element.factory == "tee":
+        tee = element
+    else:
+        tee = graph.add("tee")
+        for child in list(element.children):
+            graph.unlink(element, child)
+            graph.link(tee, child)
+        graph.link(element, tee)
+    for branch in branches:
+        graph.link(tee, branch)
+    for child in list(tee.children):
+        _branch_head_queue(graph, child, queue_props)
+    return tee
+
+
+def _detach(graph, element):
+    children = list(element.children)
+    for child in children:
+        graph.unlink(element, child)
+    for parent in list(element.parents):
+        graph.unlink(parent, element)
+    del graph.nodes[element.id]
+    return children
+
+
+def merge_chains(graph, keep, drop, queue_props):
+    """
+    Merge the chain starting at drop into the equivalent chain at keep.
+    Downstream elements are shared while they are identical (names included) until
+    the chains diverge; a tee then fans out to the remaining branches.
+    Returns the number of elements merged away.
+    """
+    merged = 0
+    while True:
+        drop_children = _detach(graph, drop)
+        merged += 1
+        if (
+            keep.factory != "tee"
+            and len(keep.children) == 1
+            and len(drop_children) == 1
+            and keep.children[0].signature(ignore=()) == drop_children[0].signature(ignore=())
+        ):
+            keep, drop = keep.children[0], drop_children[0]
+            continue
+        break
+    if drop_children:
+        fan_out(graph, keep, drop_children, queue_props)
+    return merged
+
+
+def share_sources(graph, queue_props, group_key=None):
+    """
+    Merge source chains that read the same media. Sources are grouped by factory and
+    properties (ignoring name), optionally narrowed by group_key(source); each group
+    keeps one chain that is shared for as long as the downstream elements are identical.
+    Returns the number of source chains merged away.
+    """
+    groups = {}
+    for source in graph.sources():
+        key = (source.signature(), group_key(source) if group_key else None)
+        groups.setdefault(key, []).append(source)
+    merged = 0
+    for sources in groups.values():
+        for drop in sources[1:]:
+            merge_chains(graph, sources[0], drop, queue_props)
+            merged += 1
+    return merged
+
+
+DEFAULT_PASSES = (remove_redundant_queues, merge_tees)
+
+
+def optimize(graph, passes=DEFAULT_PASSES):
+    """Run optimization passes in order. Returns {pass_name: changes}."""
+    return {p.__name__: p(graph) for p in passes}
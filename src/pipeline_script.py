@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Reading generated pipeline scripts, shared by the generator and the tools that
+work on its output (gst_launcher.py, queue_profile.py, model_prewarm.py,
+roi_learner.py). Only the standard library is imported here, so loading it
+does not pull in the launcher or its environment settings.
+"""
+
+import math
+import os
+import re
+import shlex
+
+LAUNCH_COMMAND = "gst-launch-1.0"
+_ASSIGNMENT_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*=")
+INFERENCE_FACTORIES = ("gvadetect", "gvaclassify", "gvainference")
+# Bounds of a sized queue, in buffers
+QUEUE_MIN_BUFFERS = 2
+QUEUE_MAX_BUFFERS = 64
+# "# stream <name> stages=<stage>[:<ratio>],..." written by the generator for decimated streams
+STREAM_STAGES_RE = re.compile(r"^# stream (\S+) stages=(\S+)$")
+
+
+def read_pipeline_script(path):
+    """
+    Split a generated pipeline script into the environment assignments, the launch
+    prefix (taskset/numactl) and the gst-launch arguments. Raises ValueError if the
+    script has no gst-launch command.
+    """
+    with open(path) as f:
+        text = f.read()
+    # Join the continuation lines of the command
+    text = re.sub(r"\\\n", " ", text)
+    for line in text.splitlines():
+        if LAUNCH_COMMAND in line and not line.lstrip().startswith("#"):
+            head, _, tail = line.partition(LAUNCH_COMMAND)
+            break
+    else:
+        raise ValueError(f"{path}: no {LAUNCH_COMMAND} command found")
+    env = {}
+    prefix = []
+    for token in shlex.split(head):
+        if not prefix and _ASSIGNMENT_RE.match(token):
+            key, value = token.split("=", 1)
+            env[key] = value
+        else:
+            prefix.append(token)
+    args = [arg for arg in shlex.split(tail) if arg not in ("--verbose", "-v", "-e", "--eos-on-shutdown")]
+    return env, prefix, args
+
+
+def stream_names(args, factory="gvafpscounter", prefix=""):
+    """Names of the factory's elements (gvafpscounter by default) in pipeline order."""
+    names = []
+    for idx, arg in enumerate(args):
+        if arg == factory and idx + 1 < len(args) and args[idx + 1].startswith(f"name={prefix}"):
+            names.append(args[idx + 1].split("=", 1)[1])
+    return names
+
+
+def stream_stages(path):
+    """
+    {stream name: [(stage name, ratio)]} of the streams behind an analysis_* videorate or a
+    motion gate, nearest stage first. A videorate carries its nominal frames in per frame
+    out; a gate has ratio None, as only its frame counts at runtime tell.
+    """
+    stages = {}
+    with open(path) as f:
+        for line in f:
+            match = STREAM_STAGES_RE.match(line.strip())
+            if match:
+                stages[match.group(1)] = [(name, float(ratio) if ratio else None)
+                                          for name, _, ratio in (item.partition(":") for item in match.group(2).split(","))]
+    return stages
+
+
+def source_equivalent_fps(fps, stages):
+    """
+    FPS of a stream at the source rate: the analyzed fps scaled by the frames in per frame
+    out of every stage (frames_in, frames_out, seconds) in front of it, nearest first. A
+    stage that let no frame through stands in with its input rate.
+    """
+    for frames_in, frames_out, seconds in stages:
+        if frames_out:
+            fps *= frames_in / frames_out
+        elif seconds > 0:
+            fps = frames_in / seconds
+    return fps
+
+
+def pipeline_scripts(pipelines_dir, pipeline_file):
+    """Shard scripts listed in the .shards manifest of the pipeline, or the pipeline script itself."""
+    manifest = os.path.join(pipelines_dir, f"{os.path.splitext(pipeline_file)[0]}.shards")
+    if os.path.exists(manifest):
+        with open(manifest) as f:
+            # The manifest holds container paths; the scripts sit next to it
+            return [os.path.join(pipelines_dir, os.path.basename(line.strip())) for line in f if line.strip()]
+    return [os.path.join(pipelines_dir, pipeline_file)]
+
+
+def stage_key(factory, props):
+    """Profile key of an element: factory, with model and device for inference and the class for gvapython."""
+    if factory in INFERENCE_FACTORIES and props.get("model"):
+        model = os.path.splitext(os.path.basename(str(props["model"])))[0]
+        return f"{factory}/{model}/{str(props.get('device', 'CPU')).upper()}"
+    if factory == "gvapython" and props.get("class"):
+        return f"gvapython/{props['class']}"
+    return factory
+
+
+def queue_limits(latency_ms, fps, parallel=1, batch=1, headroom=2.0, load_fps=None):
+    """
+    (max-size-buffers, leaky) of a queue fed at fps in front of a stage that takes latency_ms
+    per request with parallel requests in flight. load_fps is the request rate the stage
+    serves in total (all streams of a shared model instance, after inference-interval;
+    default fps). A stage that keeps up gets room for headroom times the frames arriving
+    during one call (at least a batch) and blocks instead of dropping; a stage that cannot
+    keep up stays leaky with a short queue, as buffering more would only add latency.
+    """
+    load = latency_ms * (fps if load_fps is None else load_fps) / 1000.0
+    if load >= parallel:
+        buffers = math.ceil(headroom * parallel)
+        leaky = True
+    else:
+        buffers = math.ceil(headroom * max(latency_ms * fps / 1000.0, batch))
+        leaky = False
+    return min(QUEUE_MAX_BUFFERS, max(QUEUE_MIN_BUFFERS, buffers)), leaky
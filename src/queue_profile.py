@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Per-stage latency profile for sizing the generated queues.
+
+Every queue of a generated pipeline feeds one stage, the element right after
+it. A calibration run (QUEUE_CALIBRATE=1) switches the latency tracer to
+element mode; this script reads the per-element latencies from the gst-launch
+logs of the latest run and writes the average latency of every stage:
+
+    {"stages": {"gvadetect/yolo11n/CPU": {"latency_ms": 21.4, "samples": 5210, "elements": 4}, ...}}
+
+Stages are keyed by factory, and inference elements also by model and device,
+so a profile carries over to configs with other cameras or pipeline counts.
+With QUEUE_PROFILE_FILE set the generator sizes each queue from the stage it
+feeds (pipeline_script.queue_limits); queues in front of stages missing from the profile keep
+the default size.
+
+Unnamed elements are matched by the names GStreamer gives them: the factory
+name and a per-factory counter in the order of the gst-launch description.
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+
+from pipeline_script import pipeline_scripts, read_pipeline_script, stage_key
+
+# DLStreamer latency_tracer(flags=element): running average per element in ms
+DLSTREAMER_LATENCY_RE = re.compile(
+    r"latency_tracer_element,\s*name=\(string\)([^,\s]+),.*?\bavg=\(double\)([0-9.eE+-]+)(?:.*?frame_num=\(uint\)(\d+))?")
+# GStreamer latency(flags=element): one line per buffer in ns
+CORE_LATENCY_RE = re.compile(r"element-latency,.*?\belement=\(string\)([^,\s]+),.*?\btime=\(guint64\)(\d+)")
+# gst-launch_<cid>.log or gst-launch_<cid>_shard<i>.log
+LAUNCH_LOG_RE = re.compile(r"^gst-launch_(.+?)(?:_shard(\d+))?\.log$")
+
+
+def script_elements(args):
+    """{element name: (factory, props)} of a gst-launch description, naming unnamed elements like GStreamer."""
+    parsed = []
+    current = None
+    for arg in args:
+        head = arg.split("=", 1)[0]
+        if arg == "!" or (head == arg and arg.endswith(".")):
+            # A link or a pad reference such as t1_1_3.
+            current = None
+        elif "/" in head:
+            current = ("capsfilter", {})
+            parsed.append(current)
+        elif head != arg:
+            if current is not None:
+                current[1][head] = arg.split("=", 1)[1].strip('"')
+        else:
+            current = (arg, {})
+            parsed.append(current)
+    counters = {}
+    elements = {}
+    for factory, props in parsed:
+        index = counters.get(factory, 0)
+        counters[factory] = index + 1
+        name = props.get("name") or f"{factory}{'-' if factory[-1].isdigit() else ''}{index}"
+        elements[name] = (factory, props)
+    return elements
+
+
+def parse_latencies(path):
+    """{element name: (latency_ms, samples)} from the latency tracer lines of a gst-launch log."""
+    latest = {}
+    totals = {}
+    with open(path, errors="replace") as f:
+        for line in f:
+            match = DLSTREAMER_LATENCY_RE.search(line)
+            if match:
+                samples = int(match.group(3)) if match.group(3) else latest.get(match.group(1), (0, 0))[1] + 1
+                latest[match.group(1)] = (float(match.group(2)), samples)
+                continue
+            match = CORE_LATENCY_RE.search(line)
+            if match:
+                total, count = totals.get(match.group(1), (0, 0))
+                totals[match.group(1)] = (total + int(match.group(2)) / 1e6, count + 1)
+    latencies = {name: (total / count, count) for name, (total, count) in totals.items()}
+    latencies.update(latest)
+    return latencies
+
+
+def build_profile(runs):
+    """Stage profile from (log, script) pairs; latencies are averaged over the elements of a stage by samples."""
+    stages = {}
+    for log, script in runs:
+        _, _, args = read_pipeline_script(script)
+        elements = script_elements(args)
+        for name, (latency_ms, samples) in parse_latencies(log).items():
+            if name not in elements or elements[name][0] == "queue" or samples <= 0:
+                continue
+            stage = stages.setdefault(stage_key(*elements[name]), {"weighted": 0.0, "samples": 0, "elements": 0})
+            stage["weighted"] += latency_ms * samples
+            stage["samples"] += samples
+            stage["elements"] += 1
+    return {key: {"latency_ms": round(s["weighted"] / s["samples"], 3), "samples": s["samples"], "elements": s["elements"]}
+            for key, s in sorted(stages.items())}
+
+
+def latest_run_logs(results_dir):
+    """gst-launch logs of the most recent run, one per shard in shard order."""
+    runs = {}
+    for path in glob.glob(os.path.join(results_dir, "gst-launch_*.log")):
+        match = LAUNCH_LOG_RE.match(os.path.basename(path))
+        if match:
+            runs.setdefault(match.group(1), []).append((int(match.group(2) or 0), path))
+    if not runs:
+        return []
+    latest = max(runs.values(), key=lambda logs: max(os.path.getmtime(path) for _, path in logs))
+    return [path for _, path in sorted(latest)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a per-stage latency profile for QUEUE_PROFILE_FILE from a calibration run")
+    parser.add_argument("--results-dir", default="results", help="Directory with the gst-launch_<cid>.log files")
+    parser.add_argument("--pipelines-dir", default="src/pipelines", help="Directory with the generated pipeline scripts")
+    parser.add_argument("--pipeline", default="pipeline.sh", help="Pipeline script name")
+    parser.add_argument("--logs", nargs="*", default=None, help="Logs to read instead of the latest run, one per script")
+    parser.add_argument("--output", default="configs/queue_profile.json", help="Profile file for QUEUE_PROFILE_FILE")
+    args = parser.parse_args()
+
+    logs = args.logs or latest_run_logs(args.results_dir)
+    scripts = pipeline_scripts(args.pipelines_dir, args.pipeline)
+    if not logs:
+        print(f"Error: no gst-launch logs in {args.results_dir}", file=sys.stderr)
+        sys.exit(1)
+    if len(logs) != len(scripts):
+        print(f"Error: {len(logs)} log(s) for {len(scripts)} pipeline script(s); run the calibration with the "
+              f"current pipeline or pass --logs in script order", file=sys.stderr)
+        sys.exit(1)
+    try:
+        stages = build_profile(zip(logs, scripts))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not stages:
+        print("No element latencies found; run the calibration with QUEUE_CALIBRATE=1", file=sys.stderr)
+        sys.exit(1)
+    for key, stage in stages.items():
+        print(f"{key}: {stage['latency_ms']:.2f} ms over {stage['samples']} frames ({stage['elements']} element(s))")
+    with open(args.output, "w") as f:
+        json.dump({"logs": [os.path.basename(log) for log in logs], "stages": stages}, f, indent=2)
+    print(f"Queue profile written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
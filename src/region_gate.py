@@ -0,0 +1,44 @@
+"""
+gvapython module for gated classification.
+
+gvaclassify only filters regions by label (object-class). A gvaclassify step with
+"min_area" or "min_confidence" in workload_to_pipeline.json gets RegionGate right
+before it: regions smaller than min_area pixels or detected below min_confidence
+are removed from the frame of that branch, so the classifier skips tiny, partial
+or uncertain boxes and the workload does not publish them. With "labels" only
+regions of those labels are gated; the others are left to object-class.
+"""
+
+import atexit
+
+
+class RegionGate:
+    def __init__(self, min_area=0, min_confidence=0.0, labels=None):
+        self.min_area = float(min_area or 0)
+        self.min_confidence = float(min_confidence or 0)
+        self.labels = set(labels) if labels else None
+        self.kept = 0
+        self.dropped = 0
+        atexit.register(self.report)
+
+    def passes(self, region):
+        rect = region.rect()
+        if rect.w * rect.h < self.min_area:
+            return False
+        return region.confidence() >= self.min_confidence
+
+    def process_frame(self, frame):
+        for region in list(frame.regions()):
+            if self.labels is not None and region.label() not in self.labels:
+                continue
+            if self.passes(region):
+                self.kept += 1
+            else:
+                frame.remove_region(region)
+                self.dropped += 1
+        return True
+
+    def report(self):
+        total = self.kept + self.dropped
+        if total:
+            print(f"[region_gate] {self.dropped} of {total} regions gated before classification", flush=True)
@@ -0,0 +1,47 @@
+"""
+gvapython module for ROI_CROP pipelines.
+
+With ROI crop the detector sees only the crop of the camera's regions of
+interest, so gvametaconvert reports coordinates relative to that crop. RoiOffset
+runs right after gvametaconvert and moves every object back to full-frame space
+(pixel x/y, normalized bounding boxes and the reported resolution), so consumers
+of the published JSON see the same output as without cropping.
+"""
+
+import json
+
+
+class RoiOffset:
+    def __init__(self, x=0, y=0, width=1920, height=1080):
+        self.x = int(x)
+        self.y = int(y)
+        self.width = int(width)
+        self.height = int(height)
+
+    def translate(self, data):
+        resolution = data.get("resolution") or {}
+        crop_w = resolution.get("width") or self.width
+        crop_h = resolution.get("height") or self.height
+        for obj in data.get("objects", []):
+            if "x" in obj:
+                obj["x"] += self.x
+            if "y" in obj:
+                obj["y"] += self.y
+            box = (obj.get("detection") or {}).get("bounding_box")
+            if box:
+                box["x_min"] = (box["x_min"] * crop_w + self.x) / self.width
+                box["x_max"] = (box["x_max"] * crop_w + self.x) / self.width
+                box["y_min"] = (box["y_min"] * crop_h + self.y) / self.height
+                box["y_max"] = (box["y_max"] * crop_h + self.y) / self.height
+        data["resolution"] = {"width": self.width, "height": self.height}
+        return data
+
+    def process_frame(self, frame):
+        for message in list(frame.messages()):
+            try:
+                data = json.loads(message)
+            except ValueError:
+                continue
+            frame.remove_message(message)
+            frame.add_message(json.dumps(self.translate(data)))
+        return True
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Learn tighter regions of interest from published detections.
+
+Hand-set region_of_interest rectangles are usually generous. After a warm-up
+run, the learner reads the rs-*.jsonl (or binary rs-*.mpk) metadata files of
+every camera, accumulates a detection-density heatmap on a grid of cells and
+shrinks the bounding rectangle of all detections edge by edge, always trimming
+the edge that loses the fewest detections per pixel saved, for as long as the
+rectangle still fully contains TARGET share of them. The result, padded by a
+margin and kept inside the configured ROI, is written as a JSON file that the
+generator applies with ADAPTIVE_ROI_FILE:
+
+    {"cam1": {"region_of_interest": {"x": .., "y": .., "x2": .., "y2": ..},
+              "run_roi": {"x": .., "y": .., "x2": .., "y2": ..},
+              "coverage": 0.98, "detections": 5312, "pixel_share": 0.41}}
+
+run_roi is the ROI the warm-up run detected in (null: the full frame). Only
+runs with the configured ROI are learned from: a run that already used a
+learned ROI only sees detections inside it, so learning from it again would
+shrink the ROI further on every iteration. The generator notes learned ROIs
+in the pipeline script ("# adaptive_roi <camera_id> x,y,x2,y2"); cameras that
+ran with one keep their previous entry in the output file.
+
+Metadata files are matched to cameras by the branch index in their name
+(rs-<camera index>_...), in the order the generator processes the cameras.
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import re
+import sys
+
+from metadata_sink import FILE_SUFFIX, iter_records
+from pipeline_script import pipeline_scripts
+
+# rs-<camera index>_<workload index>__<n>_<timestamp>.jsonl|.mpk
+METADATA_FILE_RE = re.compile(r"^rs-(\d+)_\d+__")
+# Heatmap cells along the long side of the frame
+GRID_CELLS = 64
+# Learned ROI a camera ran with, noted in the generated script
+ADAPTIVE_ROI_RE = re.compile(r"^# adaptive_roi (\S+) (\d+),(\d+),(\d+),(\d+)$")
+
+
+def camera_files(results_dir, cameras):
+    """Metadata files per camera_id, matched by the camera index in their names."""
+    files = {}
+    paths = glob.glob(os.path.join(results_dir, "rs-*.jsonl")) + glob.glob(os.path.join(results_dir, f"rs-*{FILE_SUFFIX}"))
+    for path in sorted(paths):
+        match = METADATA_FILE_RE.match(os.path.basename(path))
+        if match and 0 < int(match.group(1)) <= len(cameras):
+            camera = cameras[int(match.group(1)) - 1]
+            files.setdefault(camera.get("camera_id", f"cam{match.group(1)}"), []).append(path)
+    return files
+
+
+def run_adaptive_rois(scripts):
+    """{camera_id: learned ROI} the run of the scripts used, or None if no script is readable."""
+    rois = None
+    for script in scripts:
+        try:
+            with open(script) as f:
+                lines = f.read().splitlines()
+        except OSError:
+            continue
+        rois = rois or {}
+        for line in lines:
+            match = ADAPTIVE_ROI_RE.match(line.strip())
+            if match:
+                rois[match.group(1)] = dict(zip(("x", "y", "x2", "y2"), map(int, match.groups()[1:])))
+    return rois
+
+
+def iter_file_records(path):
+    if path.endswith(FILE_SUFFIX):
+        yield from iter_records(path)
+        return
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def detection_boxes(paths, width, height, warmup_seconds=0):
+    """Pixel boxes (x, y, x2, y2) of the detections in the first warmup_seconds of every file (0: all)."""
+    boxes = []
+    for path in paths:
+        first = None
+        for record in iter_file_records(path):
+            timestamp = record.get("timestamp")
+            if warmup_seconds and isinstance(timestamp, (int, float)):
+                first = timestamp if first is None else first
+                if timestamp - first > warmup_seconds * 1e9:
+                    break
+            resolution = record.get("resolution") or {}
+            res_w = resolution.get("width") or width
+            res_h = resolution.get("height") or height
+            for obj in record.get("objects", []):
+                detection = obj.get("detection")
+                if not detection:
+                    continue
+                if "x" in obj and "w" in obj:
+                    x, y, w, h = obj["x"], obj["y"], obj["w"], obj["h"]
+                else:
+                    box = detection.get("bounding_box") or {}
+                    x, y = box.get("x_min", 0) * res_w, box.get("y_min", 0) * res_h
+                    w, h = box.get("x_max", 0) * res_w - x, box.get("y_max", 0) * res_h - y
+                if w > 0 and h > 0:
+                    boxes.append((max(0, x), max(0, y), min(width, x + w), min(height, y + h)))
+    return boxes
+
+
+def heatmap(boxes, width, height, cell):
+    """Detections covering each grid cell, as rows of counts."""
+    cols, rows = math.ceil(width / cell), math.ceil(height / cell)
+    grid = [[0] * cols for _ in range(rows)]
+    for x, y, x2, y2 in boxes:
+        for row in range(int(y // cell), min(rows, math.ceil(y2 / cell))):
+            for col in range(int(x // cell), min(cols, math.ceil(x2 / cell))):
+                grid[row][col] += 1
+    return grid
+
+
+def tightest_rect(boxes, width, height, cell, target):
+    """
+    Cell rectangle (left, top, right, bottom) that fully contains at least target of
+    the boxes, found by trimming the edge with the fewest boxes lost per cell of area.
+    """
+    cells = [(int(x // cell), int(y // cell), math.ceil(x2 / cell), math.ceil(y2 / cell)) for x, y, x2, y2 in boxes]
+    left = min(c[0] for c in cells)
+    top = min(c[1] for c in cells)
+    right = max(c[2] for c in cells)
+    bottom = max(c[3] for c in cells)
+    # Boxes that leave the rectangle when an edge moves past their cell, per edge and cell
+    buckets = {edge: {} for edge in ("left", "top", "right", "bottom")}
+    for idx, (c1, r1, c2, r2) in enumerate(cells):
+        buckets["left"].setdefault(c1, []).append(idx)
+        buckets["top"].setdefault(r1, []).append(idx)
+        buckets["right"].setdefault(c2, []).append(idx)
+        buckets["bottom"].setdefault(r2, []).append(idx)
+    alive = [True] * len(cells)
+    contained = len(cells)
+    required = math.ceil(target * len(cells))
+    while right - left > 1 or bottom - top > 1:
+        options = []
+        position = {"left": left, "top": top, "right": right, "bottom": bottom}
+        for edge in buckets:
+            horizontal = edge in ("left", "right")
+            if (right - left if horizontal else bottom - top) <= 1:
+                continue
+            lost = [idx for idx in buckets[edge].get(position[edge], []) if alive[idx]]
+            if contained - len(lost) < required:
+                continue
+            saved = bottom - top if horizontal else right - left
+            options.append((len(lost) / saved, edge, lost))
+        if not options:
+            break
+        _, edge, lost = min(options, key=lambda option: option[0])
+        for idx in lost:
+            alive[idx] = False
+        contained -= len(lost)
+        if edge == "left":
+            left += 1
+        elif edge == "top":
+            top += 1
+        elif edge == "right":
+            right -= 1
+        else:
+            bottom -= 1
+    return (left, top, right, bottom), contained / len(cells)
+
+
+def learn_roi(camera, boxes, target=0.98, margin=16):
+    """Learned ROI entry for a camera, or None without detections."""
+    if not boxes:
+        return None
+    width, height = int(camera.get("width", 1920)), int(camera.get("height", 1080))
+    cell = max(8, math.ceil(max(width, height) / GRID_CELLS))
+    (left, top, right, bottom), coverage = tightest_rect(boxes, width, height, cell, target)
+    roi = {
+        "x": max(0, left * cell - margin) // 2 * 2,
+        "y": max(0, top * cell - margin) // 2 * 2,
+        "x2": (min(width, right * cell + margin) + 1) // 2 * 2,
+        "y2": (min(height, bottom * cell + margin) + 1) // 2 * 2,
+    }
+    configured = camera.get("region_of_interest")
+    if configured:
+        # Detections only come from inside the configured ROI; never grow beyond it
+        roi = {
+            "x": max(roi["x"], configured["x"]), "y": max(roi["y"], configured["y"]),
+            "x2": min(roi["x2"], configured["x2"]), "y2": min(roi["y2"], configured["y2"]),
+        }
+        if roi["x2"] <= roi["x"] or roi["y2"] <= roi["y"]:
+            return None
+    return {
+        "region_of_interest": roi,
+        "run_roi": configured or None,
+        "coverage": round(coverage, 4),
+        "detections": len(boxes),
+        "pixel_share": round((roi["x2"] - roi["x"]) * (roi["y2"] - roi["y"]) / float(width * height), 4),
+    }
+
+
+def write_pgm(path, grid):
+    """Heatmap as a plain PGM image (brighter cells have more detections)."""
+    peak = max(max(row) for row in grid) or 1
+    with open(path, "w") as f:
+        f.write(f"P2\n{len(grid[0])} {len(grid)}\n255\n")
+        for row in grid:
+            f.write(" ".join(str(round(255 * value / peak)) for value in row) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Learn tighter camera ROIs from published detections")
+    parser.add_argument("--camera-config", default="configs/camera_to_workload.json", help="Path to camera_to_workload.json")
+    parser.add_argument("--results-dir", default="results", help="Directory with the rs-*.jsonl / rs-*.mpk metadata files")
+    parser.add_argument("--pipelines-dir", default="src/pipelines", help="Directory with the generated pipeline scripts of the run")
+    parser.add_argument("--pipeline", default="pipeline.sh", help="Pipeline script name")
+    parser.add_argument("--output", default="configs/learned_rois.json", help="Learned ROI file for ADAPTIVE_ROI_FILE")
+    parser.add_argument("--target", type=float, default=0.98, help="Share of detections the ROI must fully contain")
+    parser.add_argument("--margin", type=int, default=16, help="Pixels added around the learned ROI")
+    parser.add_argument("--warmup-seconds", type=float, default=0, help="Only use the first seconds of every file (0: all)")
+    parser.add_argument("--heatmap-dir", default="", help="Also write a heatmap_<camera>.pgm per camera here")
+    args = parser.parse_args()
+    if not 0 < args.target <= 1:
+        parser.error("--target must be in (0, 1]")
+
+    try:
+        with open(args.camera_config) as f:
+            cameras = json.load(f)["lane_config"]["cameras"]
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    # Same camera order as the generator, which leaves out the VLM lanes
+    cameras = [cam for cam in cameras if "lp_vlm" not in [str(w).strip().lower() for w in cam.get("workloads", [])]]
+    by_id = {cam.get("camera_id", f"cam{idx + 1}"): cam for idx, cam in enumerate(cameras)}
+    adaptive = run_adaptive_rois(pipeline_scripts(args.pipelines_dir, args.pipeline))
+    if adaptive is None:
+        print(f"Warning: No pipeline script in {args.pipelines_dir}, cannot tell whether the run used learned ROIs; "
+              f"learn only from runs without ADAPTIVE_ROI_FILE", file=sys.stderr)
+        adaptive = {}
+    previous = {}
+    if adaptive and os.path.exists(args.output):
+        try:
+            with open(args.output) as f:
+                previous = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read {args.output}: {e}", file=sys.stderr)
+    learned = {}
+    for camera_id, paths in camera_files(args.results_dir, cameras).items():
+        camera = by_id[camera_id]
+        if camera_id in adaptive:
+            roi = adaptive[camera_id]
+            print(f"Warning: {camera_id} ran with the learned ROI {roi['x']},{roi['y']},{roi['x2']},{roi['y2']}, "
+                  f"not its configured one; not learning from it (rerun without ADAPTIVE_ROI_FILE)", file=sys.stderr)
+            if camera_id in previous:
+                learned[camera_id] = previous[camera_id]
+            continue
+        width, height = int(camera.get("width", 1920)), int(camera.get("height", 1080))
+        boxes = detection_boxes(paths, width, height, args.warmup_seconds)
+        entry = learn_roi(camera, boxes, args.target, args.margin)
+        if entry is None:
+            print(f"{camera_id}: no detections in {len(paths)} file(s), keeping the configured ROI")
+            continue
+        learned[camera_id] = entry
+        roi = entry["region_of_interest"]
+        print(f"{camera_id}: {roi['x']},{roi['y']},{roi['x2']},{roi['y2']} covers {100 * entry['coverage']:.1f}% of "
+              f"{entry['detections']} detections with {100 * entry['pixel_share']:.0f}% of the frame")
+        if args.heatmap_dir:
+            os.makedirs(args.heatmap_dir, exist_ok=True)
+            cell = max(8, math.ceil(max(width, height) / GRID_CELLS))
+            write_pgm(os.path.join(args.heatmap_dir, f"heatmap_{camera_id}.pgm"), heatmap(boxes, width, height, cell))
+    if not learned:
+        print("No ROIs learned", file=sys.stderr)
+        sys.exit(1)
+    with open(args.output, "w") as f:
+        json.dump(learned, f, indent=2)
+    print(f"Learned ROIs written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
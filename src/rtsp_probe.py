@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Lightweight RTSP availability prober.
+
+Checks stream URIs with a plain RTSP OPTIONS + DESCRIBE exchange over a TCP
+socket instead of starting a gst-launch rtspsrc pipeline per stream. All URIs
+are probed concurrently and the results are kept in a small JSON cache for a
+short TTL, so repeated startups do not probe the same streams again.
+
+Only a definite "not found" (RTSP 404) marks a stream unavailable. When the
+server cannot be reached or answers unexpectedly the stream is reported as
+available, so a flaky check never drops a camera.
+
+Usage: rtsp_probe.py [--timeout S] [--no-cache] URI [URI ...]
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, urlunparse
+
+RTSP_DEFAULT_PORT = 554
+USER_AGENT = "loss-prevention-rtsp-probe"
+PROBE_CACHE_FILE = os.getenv("RTSP_PROBE_CACHE", "/tmp/rtsp_probe_cache.json")
+try:
+    PROBE_CACHE_TTL = float(os.getenv("RTSP_PROBE_TTL", "30"))
+except ValueError:
+    print(f"Warning: Invalid RTSP_PROBE_TTL value '{os.getenv('RTSP_PROBE_TTL')}', using default 30", file=sys.stderr)
+    PROBE_CACHE_TTL = 30.0
+MAX_WORKERS = 32
+
+# Probe results
+AVAILABLE = "available"
+NOT_FOUND = "not_found"
+UNREACHABLE = "unreachable"
+ERROR = "error"
+
+
+def _read_response(sock):
+    """Read one RTSP response (headers and body). Returns (status code, headers)."""
+    data = b""
+    while b"\r\n\r\n" not in data:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    head, _, body = data.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split(" ", 2)
+    if len(parts) < 2 or not parts[0].startswith("RTSP/") or not parts[1].isdigit():
+        raise ValueError(f"unexpected response: {lines[0]!r}")
+    headers = {}
+    for line in lines[1:]:
+        key, sep, value = line.partition(":")
+        if sep:
+            headers[key.strip().lower()] = value.strip()
+    # Drain the body (the SDP of a DESCRIBE) so the connection stays in sync
+    remaining = int(headers.get("content-length", 0) or 0) - len(body)
+    while remaining > 0:
+        chunk = sock.recv(min(remaining, 4096))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+    return int(parts[1]), headers
+
+
+def _strip_credentials(stream_uri):
+    parsed = urlparse(stream_uri)
+    if not parsed.hostname:
+        return stream_uri
+    netloc = parsed.hostname if parsed.port is None else f"{parsed.hostname}:{parsed.port}"
+    return urlunparse(parsed._replace(netloc=netloc))
+
+
+def probe_rtsp_stream(stream_uri, timeout=2.0):
+    """
+    Probe one rtsp:// URI. Returns (result, detail) where result is one of
+    AVAILABLE, NOT_FOUND, UNREACHABLE or ERROR.
+    """
+    parsed = urlparse(stream_uri)
+    if parsed.scheme.lower() not in ("rtsp", "rtspt") or not parsed.hostname:
+        return ERROR, "not an rtsp:// URI"
+    # Credentials stay out of the request line
+    request_uri = _strip_credentials(stream_uri)
+    try:
+        with socket.create_connection((parsed.hostname, parsed.port or RTSP_DEFAULT_PORT), timeout=timeout) as sock:
+            sock.settimeout(timeout)
+            status = None
+            for cseq, method, extra in ((1, "OPTIONS", ""), (2, "DESCRIBE", "Accept: application/sdp\r\n")):
+                request = f"{method} {request_uri} RTSP/1.0\r\nCSeq: {cseq}\r\nUser-Agent: {USER_AGENT}\r\n{extra}\r\n"
+                sock.sendall(request.encode())
+                status, _ = _read_response(sock)
+                if status == 404:
+                    return NOT_FOUND, f"{method} returned 404"
+            # 401 means the path exists behind authentication
+            if status in (200, 401):
+                return AVAILABLE, f"DESCRIBE returned {status}"
+            return ERROR, f"DESCRIBE returned {status}"
+    except (OSError, socket.timeout) as e:
+        return UNREACHABLE, str(e)
+    except ValueError as e:
+        return ERROR, str(e)
+
+
+def _load_cache(path):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _store_cache(path, cache):
+    try:
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, path)
+    except OSError as e:
+        print(f"Warning: Could not write RTSP probe cache {path}: {e}", file=sys.stderr)
+
+
+def probe_rtsp_streams(stream_uris, timeout=2.0, cache_file=None, ttl=None):
+    """
+    Probe several URIs concurrently. Returns {uri: {"available": bool, "result": .., "detail": ..}}.
+    Results younger than ttl seconds are served from cache_file; pass cache_file="" to disable it.
+    """
+    cache_file = PROBE_CACHE_FILE if cache_file is None else cache_file
+    ttl = PROBE_CACHE_TTL if ttl is None else ttl
+    uris = list(dict.fromkeys(stream_uris))
+    now = time.time()
+    cache = _load_cache(cache_file) if cache_file else {}
+    results = {}
+    pending = []
+    for uri in uris:
+        # Cache entries are keyed without credentials so none end up on disk
+        entry = cache.get(_strip_credentials(uri))
+        if entry and now - entry.get("checked", 0) < ttl:
+            results[uri] = dict(entry, cached=True)
+        else:
+            pending.append(uri)
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(pending))) as pool:
+            for uri, (result, detail) in zip(pending, pool.map(lambda u: probe_rtsp_stream(u, timeout), pending)):
+                entry = {"available": result != NOT_FOUND, "result": result, "detail": detail, "checked": now}
+                results[uri] = dict(entry, cached=False)
+                # Only definite answers are cached; an unreachable server is probed again next time
+                if result in (AVAILABLE, NOT_FOUND):
+                    cache[_strip_credentials(uri)] = entry
+        if cache_file:
+            _store_cache(cache_file, {u: e for u, e in cache.items() if now - e.get("checked", 0) < ttl})
+    return results
+
+
+def check_rtsp_stream_exists(stream_uri, timeout=3):
+    """
+    Check if a specific RTSP stream path is available.
+    Returns True if the stream is accessible, False otherwise.
+    """
+    return probe_rtsp_streams([stream_uri], timeout=timeout)[stream_uri]["available"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Probe RTSP stream availability with OPTIONS/DESCRIBE")
+    parser.add_argument("uris", nargs="+", help="rtsp:// URIs to probe")
+    parser.add_argument("--timeout", type=float, default=2.0, help="Per-stream socket timeout in seconds")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore and do not update the probe cache")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    results = probe_rtsp_streams(args.uris, timeout=args.timeout, cache_file="" if args.no_cache else None)
+    for uri, entry in results.items():
+        cached = " (cached)" if entry["cached"] else ""
+        print(f"{entry['result']:<12} {uri}: {entry['detail']}{cached}")
+    print(f"Probed {len(results)} streams in {(time.perf_counter() - start) * 1000:.0f}ms", file=sys.stderr)
+    sys.exit(0 if all(entry["available"] for entry in results.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,13 @@ if [ "${VLM_WORKLOAD_ENABLED}" = "0" ]; then
     echo "################# Using pipeline file name: $pipeline_file_name ###################"
     echo "################# Using number of pipelines: $num_of_pipelines ###################"
     
+    # QUEUE_CALIBRATE=1 records per-element latencies for the queue profile (make queue-profile);
+    # the generator embeds the tracer settings in the pipeline script
+    if [ "${QUEUE_CALIBRATE:-0}" = "1" ]; then
+        export GST_TRACERS="latency_tracer(flags=pipeline+element)"
+        echo "################# Queue calibration run: GST_TRACERS=$GST_TRACERS ###################"
+    fi
+
     # First, create the pipeline
     echo "################# Step 1: Creating Pipeline ###################"
     bash "$(dirname "$0")/create-pipeline.sh" "$pipelines_dir" "$pipeline_file_name" "$num_of_pipelines"
@@ -57,9 +64,27 @@ if [ "${VLM_WORKLOAD_ENABLED}" = "0" ]; then
     results_dir="/home/pipeline-server/results"
     mkdir -p "$results_dir"
 
-    # Count source elements (filesrc or rtspsrc) to determine number of streams
-    source_count=$(grep -E -i -c "(filesrc|rtspsrc)" "$pipeline_file" || echo "0")
-    echo "Found $source_count source elements in $pipeline_file"
+    # A sharded pipeline (PIPELINE_SHARDS) runs one gst-launch process per shard script
+    # listed in the .shards manifest; otherwise the pipeline file is the only script.
+    shard_manifest="${pipeline_file%.sh}.shards"
+    declare -a script_files
+    if [ -f "$shard_manifest" ]; then
+        mapfile -t script_files < "$shard_manifest"
+        echo "Found ${#script_files[@]} pipeline shards in $shard_manifest"
+    else
+        script_files=("$pipeline_file")
+    fi
+
+    # Count gvafpscounter elements to determine number of streams. With SHARE_SOURCES=1 one
+    # decoded source can feed several workload branches, so sources no longer map 1:1 to streams.
+    declare -a script_stream_counts
+    source_count=0
+    for script in "${script_files[@]}"; do
+        count=$(grep -o -E "gvafpscounter[[:space:]]+name=" "$script" | wc -l)
+        script_stream_counts+=("$count")
+        source_count=$((source_count + count))
+        echo "Found $count streams in $script"
+    done
     
     # DEBUG: Print first few lines of pipeline file to understand format
     echo "===== DEBUG: First 5 lines of pipeline file ====="
@@ -68,16 +93,11 @@ if [ "${VLM_WORKLOAD_ENABLED}" = "0" ]; then
     grep -i -E "(rtspsrc|filesrc)" "$pipeline_file" || echo "No matches found"
     echo "================================================="
 
-    # Extract stream identifiers from source elements
+    # Extract stream identifiers from the gvafpscounter elements (one per workload branch)
     declare -a source_names
-    while IFS= read -r line; do
-        # Match rtspsrc name=... or filesrc name=... (name comes before location)
-        if [[ "$line" =~ (rtspsrc|filesrc)[[:space:]]+name=([^[:space:]]+) ]]; then
-            # Extract the name value
-            name="${BASH_REMATCH[2]}"
-            source_names+=("$name")
-        fi
-    done < "$pipeline_file"
+    while IFS= read -r name; do
+        source_names+=("$name")
+    done < <(grep -h -o -E "gvafpscounter[[:space:]]+name=[^[:space:]]+" "${script_files[@]}" | sed -E 's/.*name=//')
 
     echo "Extracted stream names: ${source_names[*]}"
     # Create per-stream pipeline log files using extracted names
@@ -108,48 +128,108 @@ if [ "${VLM_WORKLOAD_ENABLED}" = "0" ]; then
     # -----------------------------
     # Run pipeline and capture FPS
     # -----------------------------
-    gst_log="$results_dir/gst-launch_$cid.log"
+    # collect_fps <gst_log> <stream_count> <first_stream_index> [gst_pid]
+    # Follows a gst-launch log and appends the per-stream FPS of its gvafpscounter totals to
+    # the per-stream logs, starting at the given stream index. With a pid it stops once that
+    # process has exited. fps_collector.py logs decimated streams at the source rate with the
+    # same helper as the in-process launcher.
+    collect_fps() {
+        local log_file="$1" stream_count="$2" offset="$3"
+        local tail_args=(-F "$log_file")
+        if [ -n "${4:-}" ]; then
+            tail_args=(--pid="$4" "${tail_args[@]}")
+        fi
+        tail "${tail_args[@]}" | python3 -u "$(dirname "$0")/fps_collector.py" --results-dir "$results_dir" --cid "$cid" \
+            --first-stream "$offset" --stream-count "$stream_count" "${script_files[@]}"
+    }
+
+    # PREWARM_MODELS=1 pre-rolls every inference element of the scripts into the OpenVINO cache
+    # (ie-config CACHE_DIR) before the launch and reports cold versus warm element start-up;
+    # after the launch it reports whether the pipeline compiled any model the pre-warm missed
+    if [ "${PREWARM_MODELS:-0}" = "1" ]; then
+        echo "################# Pre-warming model cache ###################"
+        python3 "$(dirname "$0")/model_prewarm.py" "${script_files[@]}" || echo "WARNING: Model pre-warm incomplete"
+    fi
+
+    # gst-launch (default) runs the scripts and scrapes their logs. PIPELINE_LAUNCHER=python
+    # builds each script in-process (gst_launcher.py) and records per-stream FPS from pad
+    # probes; it is opt-in until its numbers are shown to match the gst-launch baseline.
+    PIPELINE_LAUNCHER="${PIPELINE_LAUNCHER:-gst-launch}"
+    launcher_py="$(dirname "$0")/gst_launcher.py"
+    if [ "$PIPELINE_LAUNCHER" = "python" ] && ! python3 -c "import gi; gi.require_version('Gst', '1.0'); from gi.repository import Gst" 2>/dev/null; then
+        echo "WARNING: GStreamer Python bindings not available, falling back to gst-launch"
+        PIPELINE_LAUNCHER="gst-launch"
+    fi
+    if [ "$PIPELINE_LAUNCHER" != "python" ] && [ -n "${FPS_SLO:-}${INFERENCE_BUDGET:-}" ]; then
+        echo "WARNING: FPS_SLO and INFERENCE_BUDGET change element properties at runtime and need PIPELINE_LAUNCHER=python; ignored"
+    fi
+
     echo "################# Running Pipeline ###################"
-    echo "GST_DEBUG=\"$GST_DEBUG\" GST_TRACERS='$GST_TRACERS' bash $pipeline_file"
-
-    gst_log="$results_dir/gst-launch_$cid.log"
-
-    # Run gst-launch in background and tee to log
-    stdbuf -oL bash "$pipeline_file" 2>&1 | tee "$gst_log" &
-    GST_PID=$!
-
-    # Read the gst log file in "tail -F" mode
-    tail -F "$gst_log" | while read -r line; do
-        # Match only FpsCounter(last ...) lines (ignore 'average' lines)
-        if [[ "$line" =~ FpsCounter\(last.*number-streams=([0-9]+) ]]; then
-            num_streams="${BASH_REMATCH[1]}"
-            if [[ "$num_streams" -eq "$source_count" ]]; then
-                if [[ "$num_streams" -eq 1 ]]; then
-                    if [[ "$line" =~ per-stream=([0-9]+\.[0-9]+) ]]; then
-                        fps_array=("${BASH_REMATCH[1]}")
-                    else
-                        continue
-                    fi
-                else
-                    multi_pattern='fps[[:space:]]*\(([^)]+)\)'
-                    if [[ "$line" =~ $multi_pattern ]]; then
-                        fps_values="${BASH_REMATCH[1]}"
-                        IFS=',' read -ra fps_array <<< "$(echo "$fps_values" | tr -d ' ')"
-                    else
-                        continue
-                    fi
-                fi
-                for idx in "${!fps_array[@]}"; do
-                    fps="${fps_array[idx]}"
-                    if [[ idx -lt ${#pipeline_logs[@]} ]]; then
-                        echo "$fps" >> "${pipeline_logs[idx]}"
-                    fi
-                done
+    if [ "$PIPELINE_LAUNCHER" = "python" ]; then
+        echo "GST_DEBUG=\"$GST_DEBUG\" GST_TRACERS='$GST_TRACERS' python3 $launcher_py ${script_files[*]}"
+    else
+        echo "GST_DEBUG=\"$GST_DEBUG\" GST_TRACERS='$GST_TRACERS' bash $pipeline_file"
+    fi
+
+    if [ "$PIPELINE_LAUNCHER" != "python" ] && [ "${#script_files[@]}" -eq 1 ] && [ "${script_files[0]}" = "$pipeline_file" ]; then
+        gst_log="$results_dir/gst-launch_$cid.log"
+
+        # Run gst-launch in background and tee to log
+        stdbuf -oL bash "$pipeline_file" 2>&1 | tee "$gst_log" &
+        GST_PID=$!
+
+        collect_fps "$gst_log" "$source_count" 0
+
+        wait $GST_PID
+    else
+        # Launch every shard with its own log. The in-process launcher writes the per-stream logs
+        # itself; with gst-launch a collector per shard scrapes them from the shard log. Both write
+        # at the shard's stream offset, so the results look like one run.
+        declare -a shard_pids collector_pids
+        trap 'kill "${shard_pids[@]}" 2>/dev/null || true' INT TERM
+        offset=0
+        for i in "${!script_files[@]}"; do
+            if [ "${#script_files[@]}" -eq 1 ]; then
+                shard_log="$results_dir/gst-launch_$cid.log"
+            else
+                shard_log="$results_dir/gst-launch_${cid}_shard${i}.log"
+            fi
+            > "$shard_log"
+            if [ "$PIPELINE_LAUNCHER" = "python" ]; then
+                (python3 -u "$launcher_py" "${script_files[i]}" --results-dir "$results_dir" --cid "$cid" \
+                    --first-stream "$offset" 2>&1 | tee "$shard_log") &
+                shard_pids+=($!)
+            else
+                (stdbuf -oL bash "${script_files[i]}" 2>&1 | tee "$shard_log") &
+                shard_pids+=($!)
+                collect_fps "$shard_log" "${script_stream_counts[i]}" "$offset" "${shard_pids[i]}" &
+                collector_pids+=($!)
             fi
+            echo "Started shard $i (pid ${shard_pids[i]}, ${script_stream_counts[i]} streams): ${script_files[i]}"
+            offset=$((offset + script_stream_counts[i]))
+        done
+
+        shard_status=0
+        for i in "${!shard_pids[@]}"; do
+            if wait "${shard_pids[i]}"; then
+                echo "Shard $i completed"
+            else
+                rc=$?
+                echo "################# ERROR: Shard $i (${script_files[i]}) exited with status $rc ###################"
+                shard_status=$rc
+            fi
+        done
+        if [ "${#collector_pids[@]}" -gt 0 ]; then
+            wait "${collector_pids[@]}" || true
         fi
-    done
+        if [ "$shard_status" -ne 0 ]; then
+            exit "$shard_status"
+        fi
+    fi
 
-    wait $GST_PID
+    if [ "${PREWARM_MODELS:-0}" = "1" ]; then
+        python3 "$(dirname "$0")/model_prewarm.py" --check "${script_files[@]}" || echo "WARNING: Model cache missed by the pre-warm"
+    fi
 
     echo "############# GST COMMAND COMPLETED SUCCESSFULLY #############"
 else
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Topology plan for running the generated pipeline as several gst-launch processes.
+
+A single gst-launch process runs every camera on one set of streaming threads
+and one Python interpreter for all gvapython calls. With PIPELINE_SHARDS > 1
+the generator splits the cameras over several processes; each shard is pinned
+to a CPU range and, when known, a NUMA node. The plan comes from a JSON file
+(PIPELINE_SHARD_PLAN) or is derived from the CPUs available to this process:
+
+    {"shards": [{"cpus": "0-15", "numa_node": 0}, {"cpus": "16-31", "numa_node": 1}]}
+
+Run as a script it prints the plan that would be used.
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import shutil
+import sys
+
+NODE_DIR = "/sys/devices/system/node"
+
+
+def parse_cpulist(text):
+    """Parse a kernel cpulist such as '0-3,8,10-11' into a sorted list of CPU ids."""
+    cpus = set()
+    for part in str(text).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            cpus.update(range(int(start), int(end) + 1))
+        else:
+            cpus.add(int(part))
+    return sorted(cpus)
+
+
+def format_cpulist(cpus):
+    """Render CPU ids as a compact cpulist ('0-3,8')."""
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+
+def available_cpus():
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def numa_nodes(node_dir=NODE_DIR):
+    """{node: [cpus]} for the NUMA nodes of this machine, limited to the CPUs available to us."""
+    allowed = set(available_cpus())
+    nodes = {}
+    for path in glob.glob(os.path.join(node_dir, "node[0-9]*", "cpulist")):
+        node = int(re.search(r"node(\d+)", path).group(1))
+        try:
+            with open(path) as f:
+                cpus = [c for c in parse_cpulist(f.read()) if c in allowed]
+        except (OSError, ValueError):
+            continue
+        if cpus:
+            nodes[node] = cpus
+    return dict(sorted(nodes.items()))
+
+
+def _node_of(cpus, nodes):
+    for node, node_cpus in nodes.items():
+        if set(cpus) <= set(node_cpus):
+            return node
+    return None
+
+
+def load_shard_plan(path):
+    """Read a shard plan JSON file. Raises ValueError if it is malformed."""
+    with open(path) as f:
+        data = json.load(f)
+    entries = data.get("shards") if isinstance(data, dict) else data
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"{path}: expected a non-empty 'shards' list")
+    shards = []
+    for idx, entry in enumerate(entries):
+        if not isinstance(entry, dict) or "cpus" not in entry:
+            raise ValueError(f"{path}: shard {idx} needs a 'cpus' cpulist")
+        cpus = parse_cpulist(entry["cpus"])
+        if not cpus:
+            raise ValueError(f"{path}: shard {idx} has an empty cpulist")
+        numa_node = entry.get("numa_node")
+        if numa_node is not None and (not isinstance(numa_node, int) or numa_node < 0):
+            raise ValueError(f"{path}: shard {idx} numa_node must be a non-negative integer")
+        shards.append({"index": idx, "cpus": format_cpulist(cpus), "numa_node": numa_node})
+    return shards
+
+
+def plan_shards(count, plan_file=""):
+    """
+    Shards to run. A plan file wins; "auto" gives one shard per NUMA node; a number
+    splits the available CPUs into that many contiguous ranges (in NUMA node order),
+    each tagged with its node when it falls inside one.
+    """
+    if plan_file:
+        return load_shard_plan(plan_file)
+    nodes = numa_nodes()
+    if count == "auto":
+        if len(nodes) < 2:
+            return [{"index": 0, "cpus": format_cpulist(available_cpus()), "numa_node": None}]
+        return [{"index": i, "cpus": format_cpulist(cpus), "numa_node": node}
+                for i, (node, cpus) in enumerate(nodes.items())]
+    ordered = [cpu for cpus in nodes.values() for cpu in cpus] or available_cpus()
+    count = max(1, min(int(count), len(ordered)))
+    shards = []
+    for i in range(count):
+        cpus = ordered[i * len(ordered) // count:(i + 1) * len(ordered) // count]
+        shards.append({"index": i, "cpus": format_cpulist(cpus), "numa_node": _node_of(cpus, nodes)})
+    return shards
+
+
+def assign_units(unit_loads, shards):
+    """
+    Spread work units (camera groups) over shards, heaviest first onto the shard with
+    the lowest load per CPU. unit_loads is a list of (unit, load); returns the unit
+    lists and the total load of every shard.
+    """
+    assigned = [[] for _ in shards]
+    loads = [0.0] * len(shards)
+    weights = [len(parse_cpulist(shard["cpus"])) for shard in shards]
+    order = sorted(range(len(unit_loads)), key=lambda i: (-unit_loads[i][1], i))
+    for i in order:
+        unit, load = unit_loads[i]
+        target = min(range(len(shards)), key=lambda s: ((loads[s] + load) / weights[s], s))
+        loads[target] += load
+        assigned[target].append((i, unit))
+    # Keep units in generation order inside each shard
+    return [[unit for _, unit in sorted(units, key=lambda item: item[0])] for units in assigned], loads
+
+
+def launch_prefix(shard):
+    """Command prefix that pins a shard to its CPUs (and memory node, when numactl is available)."""
+    if shard.get("numa_node") is not None and shutil.which("numactl"):
+        return f"numactl --physcpubind={shard['cpus']} --membind={shard['numa_node']}"
+    return f"taskset -c {shard['cpus']}"
+
+
+def topology_signature():
+    """Host topology that shapes an automatic plan; part of the pipeline cache key."""
+    return json.dumps([format_cpulist(available_cpus()),
+                       {n: format_cpulist(c) for n, c in numa_nodes().items()},
+                       bool(shutil.which("numactl"))], sort_keys=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the gst-launch shard plan for this host")
+    parser.add_argument("--shards", default=os.getenv("PIPELINE_SHARDS", "auto"),
+                        help="Number of shards or 'auto' (one per NUMA node)")
+    parser.add_argument("--plan", default=os.getenv("PIPELINE_SHARD_PLAN", ""), help="Shard plan JSON file")
+    args = parser.parse_args()
+    try:
+        shards = plan_shards(args.shards if args.shards == "auto" else int(args.shards), args.plan)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    for shard in shards:
+        node = shard["numa_node"] if shard["numa_node"] is not None else "-"
+        print(f"shard {shard['index']}: cpus={shard['cpus']} numa_node={node} launch='{launch_prefix(shard)}'")
+
+
+if __name__ == "__main__":
+    main()
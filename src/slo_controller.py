@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Closed-loop FPS SLO controller for the in-process launcher.
+
+Every stream (gvafpscounter) with a target fps gets a ladder of degradations,
+cheapest first:
+
+    render      the render branch of the stream stops receiving frames
+    classify    reclassify-interval of its gvaclassify elements doubles (or
+                inference-interval without tracking), up to MAX_DOUBLINGS times
+    detect      inference-interval of its gvadetect elements doubles, up to
+                MAX_DOUBLINGS times
+
+A stream that stays below target * (1 - FPS_SLO_TOLERANCE) for BEHIND_INTERVALS
+reporting intervals moves one rung down the ladder. Once it has held its target
+for FPS_SLO_RESTORE_SECONDS it moves one rung back up; a stream that falls
+behind again right after a restore waits twice as long before the next one,
+until a restore holds for that long.
+Elements shared by several streams follow the most degraded of them. Every
+change is logged.
+
+Targets come from "target_fps" of the camera in camera_to_workload.json, or
+FPS_SLO for cameras without one, capped at the camera fps. Streams are matched
+to cameras by the camera index in their name (stream<camera index>_...).
+
+Streams are judged at the source rate, the fps their pipeline_stream log holds:
+behind an analysis_* videorate or a motion gate, the analyzed fps is scaled by
+the frames each of them received per frame it let through in the interval, and
+a gate that let nothing through stands in with its input rate. A lane whose
+gate holds back an idle scene therefore keeps up as long as frames reach the
+gate at the camera fps, and is only degraded when the pipeline itself falls
+behind.
+"""
+
+import json
+import os
+import re
+import sys
+
+CAMERA_STREAM = os.environ.get("CAMERA_STREAM", "camera_to_workload.json")
+CONFIG_CAMERA_TO_WORKLOAD = f"/home/pipeline-server/configs/{CAMERA_STREAM}"
+
+FPS_SLO = os.getenv("FPS_SLO", "").strip()
+if FPS_SLO:
+    try:
+        FPS_SLO = float(FPS_SLO)
+        if FPS_SLO <= 0:
+            raise ValueError
+    except ValueError:
+        print(f"Warning: Invalid FPS_SLO value '{os.getenv('FPS_SLO')}', using the camera target_fps only", file=sys.stderr)
+        FPS_SLO = None
+else:
+    FPS_SLO = None
+
+try:
+    FPS_SLO_TOLERANCE = float(os.getenv("FPS_SLO_TOLERANCE", "0.05"))
+    if not 0 <= FPS_SLO_TOLERANCE < 1:
+        raise ValueError
+except ValueError:
+    print(f"Warning: Invalid FPS_SLO_TOLERANCE value '{os.getenv('FPS_SLO_TOLERANCE')}', using default 0.05", file=sys.stderr)
+    FPS_SLO_TOLERANCE = 0.05
+
+try:
+    FPS_SLO_RESTORE_SECONDS = float(os.getenv("FPS_SLO_RESTORE_SECONDS", "10"))
+except ValueError:
+    print(f"Warning: Invalid FPS_SLO_RESTORE_SECONDS value '{os.getenv('FPS_SLO_RESTORE_SECONDS')}', using default 10", file=sys.stderr)
+    FPS_SLO_RESTORE_SECONDS = 10.0
+
+# Times a classify or detect interval may double
+MAX_DOUBLINGS = 3
+# Consecutive intervals below target before a stream is degraded
+BEHIND_INTERVALS = 2
+# Seconds after a stream's first frame before it is judged (model load, pre-roll)
+WARMUP_SECONDS = 5.0
+# stream<camera index>_<workload index>_<n>
+STREAM_NAME_RE = re.compile(r"^stream(\d+)_")
+
+
+def stream_targets(names, config_path=CONFIG_CAMERA_TO_WORKLOAD):
+    """{stream name: target fps} for the streams whose camera has a target, at most the camera fps."""
+    try:
+        with open(config_path) as f:
+            cameras = json.load(f)["lane_config"]["cameras"]
+    except (OSError, KeyError, ValueError) as e:
+        if FPS_SLO is None:
+            return {}
+        print(f"Warning: Could not read {config_path}: {e}, using FPS_SLO={FPS_SLO:g} for every stream", file=sys.stderr)
+        cameras = []
+    # Same camera order as the generator, which leaves out the VLM lanes
+    cameras = [cam for cam in cameras if "lp_vlm" not in [str(w).strip().lower() for w in cam.get("workloads", [])]]
+    targets = {}
+    for name in names:
+        match = STREAM_NAME_RE.match(name)
+        index = int(match.group(1)) - 1 if match else -1
+        camera = cameras[index] if 0 <= index < len(cameras) else {}
+        target = camera.get("target_fps", FPS_SLO)
+        if target:
+            targets[name] = min(float(target), float(camera.get("fps") or target))
+    return targets
+
+
+class RenderSwitch:
+    """Pad probe on the tee pad of a render branch that drops its frames while the branch is off."""
+
+    def __init__(self, name, probe_ok, probe_drop):
+        self.name = name
+        self.enabled = True
+        self.probe_ok = probe_ok
+        self.probe_drop = probe_drop
+
+    def probe(self, pad, info):
+        return self.probe_ok if self.enabled else self.probe_drop
+
+
+class Knob:
+    """An interval property of an element, set to its configured value times a factor."""
+
+    def __init__(self, name, element, prop, base):
+        self.name = name
+        self.element = element
+        self.prop = prop
+        self.base = max(1, int(base))
+        self.value = self.base
+
+    def apply(self, factor):
+        """Set the property for the factor. Returns a change description, or None when unchanged."""
+        value = self.base * factor
+        if value == self.value:
+            return None
+        self.element.set_property(self.prop, value)
+        change = f"{self.name}.{self.prop} {self.value}->{value}"
+        self.value = value
+        return change
+
+
+class StreamSlo:
+    """Target, degradation ladder and current rung of one stream."""
+
+    def __init__(self, name, target, render=None, classify=(), detect=()):
+        self.name = name
+        self.target = target
+        self.render = render
+        self.classify = list(classify)
+        self.detect = list(detect)
+        self.ladder = ["render"] if render else []
+        if self.classify:
+            self.ladder += ["classify"] * MAX_DOUBLINGS
+        if self.detect:
+            self.ladder += ["detect"] * MAX_DOUBLINGS
+        self.level = 0
+        self.fps = None
+        self.first_seen = None
+        self.behind = 0
+        self.ok_since = None
+        self.last_change = None
+        self.last_restore = None
+        self.hold = FPS_SLO_RESTORE_SECONDS
+        self.degrades = 0
+        self.restores = 0
+
+    def factor(self, rung):
+        return 2 ** self.ladder[:self.level].count(rung)
+
+    def step(self, now, fps):
+        """Move along the ladder for the fps of the last interval. Returns -1, 0 or 1 (degraded)."""
+        self.fps = fps
+        if self.first_seen is None:
+            self.first_seen = now
+        if now - self.first_seen < WARMUP_SECONDS:
+            return 0
+        if fps < self.target * (1 - FPS_SLO_TOLERANCE):
+            self.ok_since = None
+            self.behind += 1
+            if self.behind < BEHIND_INTERVALS or self.level >= len(self.ladder):
+                return 0
+            if self.last_restore is not None and now - self.last_restore < self.hold:
+                # The rung above could not hold the target: wait longer before the next try
+                self.hold = min(self.hold * 2, FPS_SLO_RESTORE_SECONDS * 8)
+            self.level += 1
+            self.degrades += 1
+            self.behind = 0
+            self.last_change = now
+            return 1
+        self.behind = 0
+        if self.ok_since is None:
+            self.ok_since = now
+        if self.last_restore is not None and self.last_change == self.last_restore and now - self.last_restore >= self.hold:
+            # The last restore held for a full hold period: back to the normal wait
+            self.hold = FPS_SLO_RESTORE_SECONDS
+            self.last_restore = None
+        if self.level == 0 or now - max(self.ok_since, self.last_change or 0) < self.hold:
+            return 0
+        self.level -= 1
+        self.restores += 1
+        self.last_change = self.last_restore = now
+        self.ok_since = None
+        return -1
+
+
+class SloController:
+    """Applies the ladder rung of every stream to the shared elements once per interval."""
+
+    def __init__(self, streams):
+        self.streams = streams
+
+    def update(self, now, samples):
+        """Step every stream with its fps from samples ({name: fps}) and apply the result. Returns the log lines."""
+        lines = []
+        moved = {}
+        for stream in self.streams:
+            fps = samples.get(stream.name)
+            if fps is not None:
+                direction = stream.step(now, fps)
+                if direction:
+                    moved[stream.name] = direction
+        if not moved:
+            return lines
+        changes = {}
+        for stream in self.streams:
+            if stream.render:
+                enabled = "render" not in stream.ladder[:stream.level]
+                if enabled != stream.render.enabled:
+                    stream.render.enabled = enabled
+                    changes.setdefault(stream.name, []).append(f"{stream.render.name} {'on' if enabled else 'off'}")
+        # Shared elements follow the most degraded stream they feed
+        factors = {}
+        for stream in self.streams:
+            for rung, knobs in (("classify", stream.classify), ("detect", stream.detect)):
+                for knob in knobs:
+                    factors[knob] = max(factors.get(knob, 1), stream.factor(rung))
+        for knob, factor in factors.items():
+            change = knob.apply(factor)
+            if change:
+                owner = next((s.name for s in self.streams if s.name in moved and knob in s.classify + s.detect), None)
+                changes.setdefault(owner or "shared", []).append(change)
+        for stream in self.streams:
+            if stream.name in moved:
+                action = "degrade" if moved[stream.name] > 0 else "restore"
+                applied = ", ".join(changes.pop(stream.name, [])) or "no change"
+                lines.append(f"FpsSlo: {stream.name} {stream.fps:.2f}/{stream.target:g} fps, {action} to level "
+                             f"{stream.level}/{len(stream.ladder)}: {applied}")
+        for applied in changes.values():
+            lines.append(f"FpsSlo: shared elements: {', '.join(applied)}")
+        return lines
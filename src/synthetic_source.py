@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Synthetic camera sources for hardware-free density benchmarks.
+
+With SYNTHETIC_SOURCE set the generator replaces every camera's rtspsrc or
+filesrc with a source that needs no sample videos, RTSP server or network,
+at the camera's configured width/height/fps; the inference graph is unchanged:
+
+    pattern  videotestsrc (raw frames, the decoder of the device chain is skipped)
+    clip     a locally generated H.264 clip played through the normal decode chain
+
+Clips are created once with gst-launch under SYNTHETIC_CLIP_DIR and reused.
+Run as a script it creates the clips a camera config needs.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+SYNTHETIC_MODES = ("pattern", "clip")
+SYNTHETIC_CLIP_DIR = os.getenv("SYNTHETIC_CLIP_DIR", "/home/pipeline-server/sample-media/synthetic")
+try:
+    SYNTHETIC_CLIP_SECONDS = int(os.getenv("SYNTHETIC_CLIP_SECONDS", "60"))
+    if SYNTHETIC_CLIP_SECONDS < 1:
+        raise ValueError
+except ValueError:
+    print(f"Warning: Invalid SYNTHETIC_CLIP_SECONDS value '{os.getenv('SYNTHETIC_CLIP_SECONDS')}', using default 60", file=sys.stderr)
+    SYNTHETIC_CLIP_SECONDS = 60
+# videotestsrc pattern; "ball" moves, so trackers and motion-dependent stages see changing frames
+SYNTHETIC_PATTERN = os.getenv("SYNTHETIC_PATTERN", "ball")
+# H.264 encoders tried in order when creating a clip
+CLIP_ENCODERS = ("x264enc tune=zerolatency speed-preset=ultrafast", "openh264enc", "vah264enc")
+
+
+def camera_format(camera):
+    """(width, height, fps) of a camera with the generator's defaults."""
+    return int(camera.get("width", 1920)), int(camera.get("height", 1080)), int(round(float(camera.get("fps", 15))))
+
+
+def raw_caps(width, height, fps):
+    return f"video/x-raw,width={width},height={height},framerate={fps}/1"
+
+
+def clip_path(width, height, fps, clip_dir=None):
+    return os.path.join(clip_dir or SYNTHETIC_CLIP_DIR, f"synthetic-{SYNTHETIC_PATTERN}-{width}x{height}-{fps}.mp4")
+
+
+def is_decoder(factory):
+    """Elements of a decode chain that a raw synthetic source does not need."""
+    return factory.startswith("decodebin") or factory.endswith("parse") or factory.endswith("dec")
+
+
+def ensure_clip(width, height, fps, clip_dir=None, seconds=None):
+    """Create the synthetic clip for this format unless it exists. Returns its path; raises RuntimeError on failure."""
+    path = clip_path(width, height, fps, clip_dir)
+    if os.path.isfile(path) and os.path.getsize(path) > 0:
+        return path
+    if not shutil.which("gst-launch-1.0"):
+        raise RuntimeError("gst-launch-1.0 not found, cannot create synthetic clips")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    frames = (seconds or SYNTHETIC_CLIP_SECONDS) * fps
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    errors = []
+    for encoder in CLIP_ENCODERS:
+        cmd = (f"gst-launch-1.0 -q videotestsrc num-buffers={frames} pattern={SYNTHETIC_PATTERN} ! "
+               f"{raw_caps(width, height, fps)} ! videoconvert ! {encoder} ! h264parse ! mp4mux ! "
+               f"filesink location={tmp_path}")
+        result = subprocess.run(cmd.split(), capture_output=True, text=True)
+        if result.returncode == 0 and os.path.isfile(tmp_path) and os.path.getsize(tmp_path) > 0:
+            os.replace(tmp_path, path)
+            print(f"Synthetic clip created: {path} ({encoder.split()[0]}, {frames} frames)", file=sys.stderr)
+            return path
+        output = (result.stderr or result.stdout).strip().splitlines()
+        errors.append(f"{encoder.split()[0]}: {output[-1] if output else f'exit code {result.returncode}'}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    raise RuntimeError(f"could not create {path} ({'; '.join(errors)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create the synthetic clips a camera config needs")
+    parser.add_argument("--camera-config", default="configs/camera_to_workload.json", help="Path to camera_to_workload.json")
+    parser.add_argument("--clip-dir", default=SYNTHETIC_CLIP_DIR, help="Directory for the generated clips")
+    args = parser.parse_args()
+    try:
+        with open(args.camera_config) as f:
+            cameras = json.load(f)["lane_config"]["cameras"]
+        for fmt in sorted({camera_format(camera) for camera in cameras}):
+            print(ensure_clip(*fmt, clip_dir=args.clip_dir))
+    except (OSError, KeyError, ValueError, RuntimeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Per-track reuse cache for gvapython stages.
+
+gvatrack follows every gvadetect of a generated pipeline, so the regions a
+gvapython stage sees carry stable object ids. A stage that derives something
+per object (a person id, a class, an embedding match) can keep the result per
+track and reuse it on the following frames instead of recomputing it:
+
+    cache = TrackCache("person_reid")
+    value = cache.get(region.object_id(), region.confidence())
+    if value is None:
+        value = expensive(region)
+        cache.put(region.object_id(), value, region.confidence())
+
+An entry is reused until it is TRACK_REUSE_FRAMES frames old or the detection
+confidence of the track moved by more than TRACK_REUSE_CONFIDENCE_DELTA; tracks
+not seen for that many frames are evicted. Hits and misses are printed at exit.
+"""
+
+import atexit
+import os
+import sys
+
+try:
+    TRACK_REUSE_FRAMES = int(os.getenv("TRACK_REUSE_FRAMES", "30"))
+    if TRACK_REUSE_FRAMES < 1:
+        raise ValueError
+except ValueError:
+    print(f"Warning: Invalid TRACK_REUSE_FRAMES value '{os.getenv('TRACK_REUSE_FRAMES')}', using default 30", file=sys.stderr)
+    TRACK_REUSE_FRAMES = 30
+
+try:
+    TRACK_REUSE_CONFIDENCE_DELTA = float(os.getenv("TRACK_REUSE_CONFIDENCE_DELTA", "0.1"))
+except ValueError:
+    print(f"Warning: Invalid TRACK_REUSE_CONFIDENCE_DELTA value '{os.getenv('TRACK_REUSE_CONFIDENCE_DELTA')}', using default 0.1", file=sys.stderr)
+    TRACK_REUSE_CONFIDENCE_DELTA = 0.1
+
+
+class TrackCache:
+    """Values keyed by tracked object id, reused while the track is young and its confidence stable."""
+
+    def __init__(self, name, max_frames=None, confidence_delta=None):
+        self.name = name
+        self.max_frames = max_frames or TRACK_REUSE_FRAMES
+        self.confidence_delta = TRACK_REUSE_CONFIDENCE_DELTA if confidence_delta is None else confidence_delta
+        # {object_id: (value, confidence, frame stored, frame last seen)}
+        self.entries = {}
+        self.frame = 0
+        self.hits = 0
+        self.misses = 0
+        atexit.register(self.report)
+
+    def next_frame(self):
+        """Advance the frame counter and evict tracks not seen for max_frames frames."""
+        self.frame += 1
+        if self.frame % self.max_frames == 0:
+            self.entries = {k: e for k, e in self.entries.items() if self.frame - e[3] < self.max_frames}
+
+    def get(self, object_id, confidence=None):
+        """Cached value of the track, or None when it has to be computed again. Untracked regions (id 0) never hit."""
+        entry = self.entries.get(object_id) if object_id else None
+        if entry is not None:
+            value, stored_confidence, stored_frame, _ = entry
+            stable = confidence is None or stored_confidence is None or abs(confidence - stored_confidence) <= self.confidence_delta
+            if stable and self.frame - stored_frame < self.max_frames:
+                self.entries[object_id] = (value, stored_confidence, stored_frame, self.frame)
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def put(self, object_id, value, confidence=None):
+        if object_id:
+            self.entries[object_id] = (value, confidence, self.frame, self.frame)
+
+    def report(self):
+        lookups = self.hits + self.misses
+        if lookups:
+            print(f"[track_cache] {self.name}: {self.hits} reused, {self.misses} computed "
+                  f"({100.0 * self.hits / lookups:.0f}% reuse over {self.frame} frames)", flush=True)
@@ -82,6 +82,15 @@ class ConfigValidator:
         valid_count = 0
         required_fields = ['type', 'model', 'device', 'precision']
         
+        for workload_name, settings in (config.get('workload_settings') or {}).items():
+            analysis_fps = settings.get('analysis_fps') if isinstance(settings, dict) else None
+            if not isinstance(settings, dict) or (analysis_fps is not None and (
+                    isinstance(analysis_fps, bool) or not isinstance(analysis_fps, (int, float)) or analysis_fps <= 0)):
+                self.add_error(f"Invalid workload_settings for '{workload_name}': 'analysis_fps' must be a positive number")
+            reclassify_interval = settings.get('reclassify_interval') if isinstance(settings, dict) else None
+            if reclassify_interval is not None and not self._is_reclassify_interval(reclassify_interval):
+                self.add_error(f"Invalid workload_settings for '{workload_name}': 'reclassify_interval' must be a non-negative integer")
+
         for workload_name, workload_config in config.items():
             if isinstance(workload_config, list):
                 # Direct array of model configs
@@ -117,6 +126,15 @@ class ConfigValidator:
         if 'type' in model_config and str(model_config['type']).strip().lower() == 'gvapython':
             return 1
 
+        # motion_gate only takes numeric options
+        if 'type' in model_config and str(model_config['type']).strip().lower() == 'motion_gate':
+            for field in ('threshold', 'pixel_delta', 'scale', 'hold_frames', 'max_skip_frames'):
+                value = model_config.get(field)
+                if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0):
+                    self.add_error(f"Field '{field}' must be a non-negative number in {context}")
+                    return 0
+            return 1
+
         for field in required_fields:
             if field not in model_config:
                 self.add_error(f"Missing required field '{field}' in {context}")
@@ -148,7 +166,28 @@ class ConfigValidator:
                 self.add_error(f"Invalid precision value '{model_config['precision']}' in {context}. Supported values: {', '.join(valid_precisions)}")
                 return 0
 
+        if 'reclassify_interval' in model_config and not self._is_reclassify_interval(model_config['reclassify_interval']):
+            self.add_error(f"Field 'reclassify_interval' must be a non-negative integer in {context}")
+            return 0
+
+        labels = model_config.get('labels')
+        if labels is not None and not isinstance(labels, str) and not (
+                isinstance(labels, list) and all(isinstance(label, str) and label.strip() for label in labels)):
+            self.add_error(f"Field 'labels' must be a list of label names or a comma-separated string in {context}")
+            return 0
+        for field, upper in (('min_area', None), ('min_confidence', 1)):
+            value = model_config.get(field)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))
+                                      or value < 0 or (upper is not None and value > upper)):
+                limit = f"between 0 and {upper}" if upper is not None else "a non-negative number"
+                self.add_error(f"Field '{field}' must be {limit} in {context}")
+                return 0
+
         return 1
+
+    @staticmethod
+    def _is_reclassify_interval(value: Any) -> bool:
+        return isinstance(value, int) and not isinstance(value, bool) and value >= 0
     
     def validate_camera_config(self, config_path: str) -> bool:
         """Validate camera_to_workload.json configuration."""
@@ -272,6 +311,35 @@ class ConfigValidator:
                     self.add_error(f"Field '{field}' in region_of_interest must not be empty or 0 in {context}")
                     return False
 
+        # Validate inference cadence settings if present: a positive number, or an object
+        # mapping workload names (or "default") to positive numbers
+        for field in ['inference_hz', 'max_detection_latency_ms']:
+            if field not in camera:
+                continue
+            value = camera[field]
+            values = value.values() if isinstance(value, dict) else [value]
+            for v in values:
+                if isinstance(v, bool) or not isinstance(v, (int, float)) or v <= 0:
+                    self.add_error(f"'{field}' must be a positive number or an object of positive numbers per workload in {context}")
+                    return False
+
+        if 'target_fps' in camera:
+            value = camera['target_fps']
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+                self.add_error(f"'target_fps' must be a positive number in {context}")
+                return False
+
+        if 'roi_crop' in camera and not isinstance(camera['roi_crop'], bool):
+            self.add_error(f"'roi_crop' must be true or false in {context}")
+            return False
+
+        if 'metadata_format' in camera:
+            value = camera['metadata_format']
+            values = value.values() if isinstance(value, dict) else [value]
+            if any(v not in ('json', 'binary') for v in values):
+                self.add_error(f"'metadata_format' must be \"json\" or \"binary\" (or an object of those per workload) in {context}")
+                return False
+
         # Validate workloads
         if 'workloads' not in camera:
             self.add_error(f"Missing 'workloads' field in {context}")